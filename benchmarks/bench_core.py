@@ -0,0 +1,201 @@
+# Core benchmarks: startup, stepping, read/write latency, images (fetch, set, camera rig), multiple instances.
+
+import ctypes as ct
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from harness import benchmark, metric, latency_metrics, time_calls, environment, quiet
+
+SCENES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scenes')
+CART_POLE = os.path.join(SCENES, 'cart_pole.ttt')
+
+
+@benchmark('startup')
+def bench_startup(opts):
+    from vrepper.vrepper import vrepper
+
+    starts, loads = [], []
+    for _ in range(opts.repeat):
+        with quiet(not opts.verbose):
+            t = time.perf_counter()
+            env = vrepper(headless=True).start()
+            starts.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            env.load_scene(CART_POLE)
+            loads.append(time.perf_counter() - t)
+            env.end()
+    return {
+        'start': metric(min(starts), 's', 'lower'),
+        'load_scene': metric(min(loads) * 1e3, 'ms', 'lower'),
+    }
+
+
+def _step_rate(env, steps, body=None):
+    env.start_blocking_simulation()
+    t = time.perf_counter()
+    for _ in range(steps):
+        if body is not None:
+            body()
+        env.step_blocking_simulation()
+    rate = steps / (time.perf_counter() - t)
+    env.stop_simulation()
+    return rate
+
+
+@benchmark('step_rate')
+def bench_step_rate(opts):
+    with environment(CART_POLE, opts.verbose) as env:
+        slider = env.get_object_by_name('slider')
+        cart = env.get_object_by_name('cart')
+        mass = env.get_object_by_name('mass')
+
+        def control_loop():
+            # one write and the reads of test_cartpole.py's observation
+            slider.set_velocity(0.1)
+            cart.get_position()
+            mass.get_position()
+            cart.get_velocity()
+
+        return {
+            'trigger_only': metric(_step_rate(env, opts.steps), 'steps/s'),
+            'control_loop': metric(_step_rate(env, opts.steps, control_loop), 'steps/s'),
+        }
+
+
+@benchmark('read_latency')
+def bench_read_latency(opts):
+    with environment(CART_POLE, opts.verbose) as env:
+        cart = env.get_object_by_name('cart')
+        slider = env.get_object_by_name('slider')
+        env.start_blocking_simulation()
+        results = {}
+        for name, func in [('get_position', cart.get_position),
+                           ('get_velocity', cart.get_velocity),
+                           ('get_joint_angle', slider.get_joint_angle)]:
+            for k, v in latency_metrics(time_calls(func, opts.calls)).items():
+                results[name + '.' + k] = v
+        env.stop_simulation()
+    return results
+
+
+@benchmark('write_latency')
+def bench_write_latency(opts):
+    with environment(CART_POLE, opts.verbose) as env:
+        slider = env.get_object_by_name('slider')
+        env.start_blocking_simulation()
+        results = {}
+        for name, func in [('set_velocity', lambda: slider.set_velocity(0.5)),
+                           ('set_force', lambda: slider.set_force(10.))]:
+            for k, v in latency_metrics(time_calls(func, opts.calls)).items():
+                results[name + '.' + k] = v
+        env.stop_simulation()
+    return results
+
+
+@benchmark('image_fetch')
+def bench_image_fetch(opts):
+    w, h = opts.resolution
+    with environment('standin:cameras=1&resolution={}x{}'.format(w, h), opts.verbose) as env:
+        camera = env.get_object_by_name('camera0', is_joint=False)
+        env.start_blocking_simulation()
+        n = max(1, opts.calls // 10)
+        t = time.perf_counter()
+        for _ in range(n):
+            camera.get_vision_image()
+        elapsed = time.perf_counter() - t
+        env.stop_simulation()
+    return {
+        'images_per_s': metric(n / elapsed, 'img/s'),
+        'throughput': metric(n * w * h * 3 / elapsed / 1e6, 'MB/s'),
+    }
+
+
+@benchmark('image_set')
+def bench_image_set(opts):
+    # the copy of the image into ctypes, the way vrep.py used to do it and as a buffer,
+    # then set_vision_image through the remote API
+    w, h = opts.resolution
+    image = np.random.randint(0, 256, (h, w, 3), np.uint8)
+    values = image.view(np.int8).ravel().tolist()
+    results = {}
+    legacy = time_calls(lambda: (ct.c_byte * len(values))(*values), opts.repeat)
+    buffer = time_calls(lambda: (ct.c_ubyte * image.nbytes).from_buffer(image), opts.repeat)
+    results['convert.legacy'] = metric(min(legacy) * 1e3, 'ms', 'lower')
+    results['convert.buffer'] = metric(min(buffer) * 1e3, 'ms', 'lower')
+    with environment('standin:cameras=1&resolution={}x{}'.format(w, h), opts.verbose) as env:
+        camera = env.get_object_by_name('camera0', is_joint=False)
+        camera.set_vision_image(image)
+        assert (camera.get_vision_image() == image).all()
+        n = max(1, opts.calls // 10)
+        t = time.perf_counter()
+        for _ in range(n):
+            camera.set_vision_image(image)
+        elapsed = time.perf_counter() - t
+    results['images_per_s'] = metric(n / elapsed, 'img/s')
+    results['throughput'] = metric(n * image.nbytes / elapsed / 1e6, 'MB/s')
+    return results
+
+
+@benchmark('camera_rig')
+def bench_camera_rig(opts):
+    # four cameras after every step: get_vision_image one after the other, against a
+    # streamed camerarig (in color, in grayscale, and downsampled by 2)
+    w, h = opts.resolution
+    results = {}
+    with environment('standin:cameras=4&resolution={}x{}'.format(w, h), opts.verbose) as env:
+        cameras = [env.get_object_by_name('camera{}'.format(k), is_joint=False) for k in range(4)]
+        env.start_blocking_simulation()
+        n = max(10, opts.steps // 10)
+
+        def sequential():
+            env.step_blocking_simulation()
+            t = time.perf_counter()
+            for camera in cameras:
+                camera.get_vision_image()
+            return time.perf_counter() - t
+
+        def rig_capture(rig):
+            env.step_blocking_simulation()
+            t = time.perf_counter()
+            rig.capture()
+            return time.perf_counter() - t
+
+        for k, v in latency_metrics([sequential() for _ in range(n)]).items():
+            results['sequential.' + k] = v
+        for name, kwargs in (('rig', {}), ('rig_grayscale', {'grayscale': True}),
+                             ('rig_half', {'resolution': (w // 2, h // 2)})):
+            rig = env.camera_rig(cameras, **kwargs)
+            rig_capture(rig)
+            for k, v in latency_metrics([rig_capture(rig) for _ in range(n)]).items():
+                results[name + '.' + k] = v
+            rig.close()
+        env.stop_simulation()
+    return results
+
+
+def _instance_worker(steps):
+    # runs in a separate process: its own vrepper, its own server
+    with environment(CART_POLE) as env:
+        return _step_rate(env, steps)
+
+
+@benchmark('multi_instance')
+def bench_multi_instance(opts):
+    results = {}
+    single = None
+    for n in opts.instances:
+        pool = multiprocessing.Pool(n)
+        try:
+            rates = pool.map(_instance_worker, [opts.steps] * n)
+        finally:
+            pool.close()
+            pool.join()
+        total = sum(rates)
+        if single is None:
+            single = total / n
+        results['x{}.steps_per_s'.format(n)] = metric(total, 'steps/s')
+        results['x{}.efficiency'.format(n)] = metric(total / (single * n), 'ratio')
+    return results
@@ -0,0 +1,140 @@
+# simxPackFloats / simxUnpackFloats (and the int versions), used to ship trajectories
+# and point clouds through string signals. No simulator involved.
+#
+# signal_read: reading a large string signal, from the copy out of the remoteApi
+# library's memory to the NumPy array.
+#
+# channel: a point cloud sent to the simulation and back every step through a
+# vrepper.channel (channelLoopback is a script function of the stand-in).
+
+import ctypes as ct
+import struct
+import time
+
+import numpy as np
+
+from harness import benchmark, metric, environment, time_calls
+from bench_core import CART_POLE
+
+
+def _legacy_pack_floats(floatList):
+    # what vrep.py used to do: quadratic in the length of the list
+    s = bytes()
+    for i in range(len(floatList)):
+        s = s + struct.pack('<f', floatList[i])
+    return bytearray(s)
+
+
+def _legacy_unpack_floats(floatsPackedInString):
+    b = []
+    for i in range(int(len(floatsPackedInString) / 4)):
+        b.append(struct.unpack('<f', floatsPackedInString[4 * i:4 * (i + 1)])[0])
+    return b
+
+
+def _rate(func, n, repeat):
+    # values per second, best of repeat
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+    return n / best
+
+
+@benchmark('packing')
+def bench_packing(opts):
+    from vrepper import packing
+
+    results = {}
+    # the legacy versions only at a size they can handle
+    n = 10000
+    values = np.random.rand(n).astype(np.float32).tolist()
+    packed = _legacy_pack_floats(values)
+    results['legacy.pack_floats'] = metric(_rate(lambda: _legacy_pack_floats(values), n, opts.repeat), 'values/s')
+    results['legacy.unpack_floats'] = metric(_rate(lambda: _legacy_unpack_floats(packed), n, opts.repeat), 'values/s')
+
+    n = 100000 if opts.quick else 1000000
+    array = np.random.rand(n).astype(np.float32)
+    values = array.tolist()
+    ints = list(range(n))
+    packed = packing.simxPackFloats(values)
+    assert packing.simxUnpackFloats(packed) == values
+    for name, func in [('pack_floats.list', lambda: packing.simxPackFloats(values)),
+                       ('pack_floats.array', lambda: packing.pack_floats(array)),
+                       ('unpack_floats.list', lambda: packing.simxUnpackFloats(packed)),
+                       ('unpack_floats.array', lambda: packing.unpack_floats(packed)),
+                       ('pack_ints.list', lambda: packing.simxPackInts(ints)),
+                       ('unpack_ints.list', lambda: packing.simxUnpackInts(packed))]:
+        results[name] = metric(_rate(func, n, opts.repeat), 'values/s')
+    return results
+
+
+def _legacy_copy(pointer, length):
+    # what vrep.py used to do with the signal value returned by the library
+    a = bytearray()
+    for i in range(length):
+        a.append(pointer[i])
+    return a
+
+
+def _bulk_copy(pointer, length):
+    # vrep._bytearray_at (vrep.py needs the remoteApi library to be imported)
+    a = bytearray(length)
+    ct.memmove((ct.c_ubyte * length).from_buffer(a), pointer, length)
+    return a
+
+
+@benchmark('signal_read')
+def bench_signal_read(opts):
+    from vrepper.vrepper import blocking
+
+    results = {}
+    size = 1 << 20
+    source = (ct.c_ubyte * size).from_buffer_copy(np.random.bytes(size))
+    pointer = ct.cast(source, ct.POINTER(ct.c_ubyte))
+    assert _legacy_copy(pointer, size) == _bulk_copy(pointer, size)
+    results['copy.legacy'] = metric(_rate(lambda: _legacy_copy(pointer, size), size / 1e6, opts.repeat), 'MB/s')
+    results['copy.bulk'] = metric(_rate(lambda: _bulk_copy(pointer, size), size / 1e6, opts.repeat), 'MB/s')
+
+    # a point cloud in a signal, read through the remote API
+    cloud = np.random.rand(100000 if opts.quick else 1000000, 3).astype(np.float32)
+    with environment(CART_POLE, opts.verbose) as env:
+        env.simxSetStringSignal('cloud', bytearray(cloud.tobytes()), blocking)
+        assert np.array_equal(env.get_signal_array('cloud', shape=(3,)), cloud)
+        samples = time_calls(lambda: env.get_signal_array('cloud', shape=(3,)), opts.repeat)
+    results['get_signal_array'] = metric(cloud.nbytes / 1e6 / min(samples), 'MB/s')
+    return results
+
+
+CLOUD_SIZES = [1000, 100000, 1000000]
+
+
+@benchmark('channel')
+def bench_channel(opts):
+    results = {}
+    with environment(CART_POLE, opts.verbose) as env:
+        ch = env.channel('cloud')
+        loopback = ([], [], ['cloud'], bytearray())
+        env.start_blocking_simulation()
+        ch.receive()
+        for points in CLOUD_SIZES[:2] if opts.quick else CLOUD_SIZES:
+            cloud = np.random.rand(points, 3).astype(np.float32)
+
+            def step():
+                ch.send(cloud)
+                env.call_script_function('channelLoopback', loopback)
+                env.step_blocking_simulation()
+                env.simxGetPingTime()
+                return ch.receive()
+
+            frame, = step()
+            assert np.array_equal(np.frombuffer(frame, np.float32).reshape(-1, 3), cloud)
+            samples = time_calls(step, max(10, opts.steps // 10))
+            name = 'points_{}'.format(points)
+            results[name + '.steps_per_s'] = metric(len(samples) / sum(samples), 'steps/s')
+            # both ways
+            results[name + '.throughput'] = metric(2 * cloud.nbytes * len(samples) / sum(samples) / 1e6, 'MB/s')
+        env.stop_simulation()
+        results['frames_lost'] = metric(ch.stats()['frames_lost'], 'frames', 'lower')
+    return results
@@ -0,0 +1,61 @@
+# Simulation time step sweep on cart_pole.ttt: speed against accuracy.
+#
+# For each dt, the cart follows the same open-loop velocity profile for a fixed
+# simulated time. The mass position is sampled every SAMPLE seconds and compared
+# with a reference run at REFERENCE_DT. Pick the largest dt whose error you can live with.
+
+import math
+import time
+
+from harness import benchmark, metric, environment
+from bench_core import CART_POLE
+
+# every dt must divide SAMPLE
+DTS = [0.005, 0.01, 0.02, 0.025, 0.05, 0.1]
+REFERENCE_DT = 0.001
+SAMPLE = 0.1
+
+
+def _velocity(t):
+    return 0.5 * math.sin(2 * math.pi * t)
+
+
+def _run(env, dt, horizon):
+    # returns (mass positions every SAMPLE seconds, wall clock seconds)
+    env.wait_until_stopped()
+    env.set_time_step(dt)
+    slider = env.get_object_by_name('slider')
+    mass = env.get_object_by_name('mass', is_joint=False)
+    every = int(round(SAMPLE / dt))
+    samples = []
+    env.start_blocking_simulation()
+    t = time.perf_counter()
+    for k in range(int(round(horizon / dt))):
+        slider.set_velocity(_velocity(k * dt))
+        env.step_blocking_simulation()
+        if (k + 1) % every == 0:
+            samples.append(mass.get_position())
+    elapsed = time.perf_counter() - t
+    env.stop_simulation()
+    return samples, elapsed
+
+
+def _rms_error(samples, reference):
+    d = [sum((a - b) ** 2 for a, b in zip(p, q)) for p, q in zip(samples, reference)]
+    return math.sqrt(sum(d) / len(d))
+
+
+@benchmark('physics_dt')
+def bench_physics_dt(opts):
+    horizon = 1. if opts.quick else 4.
+    results = {}
+    with environment(CART_POLE, opts.verbose) as env:
+        results['default_substeps'] = metric(env.get_dynamics_substeps(), 'substeps', 'lower')
+        reference, _ = _run(env, REFERENCE_DT, horizon)
+        for dt in DTS:
+            samples, elapsed = _run(env, dt, horizon)
+            name = 'dt_{:g}ms'.format(dt * 1e3)
+            results[name + '.steps_per_s'] = metric(horizon / dt / elapsed, 'steps/s')
+            results[name + '.realtime_factor'] = metric(horizon / elapsed, 'x')
+            results[name + '.error'] = metric(_rms_error(samples, reference) * 1e3, 'mm', 'lower')
+    return results
@@ -0,0 +1,54 @@
+# Latency profiles: steps/s against the CPU used per instance, for each profile
+# of vrepper.latency_profiles.
+#
+# CPU is measured for the client (this process, which includes the remoteApi
+# thread) and for the V-REP (or stand-in) process, and reported in cores:
+# CPU seconds per wall clock second.
+
+import time
+
+from harness import benchmark, metric, environment
+from bench_core import CART_POLE
+
+
+def _cpu(env):
+    usage = env.instance.usage()  # None outside Linux
+    return time.process_time() + (usage['cpu_time'] if usage else 0.)
+
+
+def _cores(env, func):
+    # run func, return (its result, cores used by client and server meanwhile)
+    c, t = _cpu(env), time.perf_counter()
+    result = func()
+    return result, (_cpu(env) - c) / (time.perf_counter() - t)
+
+
+@benchmark('latency_profiles')
+def bench_latency_profiles(opts):
+    from vrepper.vrepper import latency_profiles
+
+    results = {}
+    for name in sorted(latency_profiles):
+        with environment(CART_POLE, opts.verbose, latency=name) as env:
+            slider = env.get_object_by_name('slider')
+            cart = env.get_object_by_name('cart')
+
+            def run():
+                env.start_blocking_simulation()
+                t = time.perf_counter()
+                for _ in range(opts.steps):
+                    slider.set_velocity(0.1)
+                    cart.get_position()
+                    env.step_blocking_simulation()
+                rate = opts.steps / (time.perf_counter() - t)
+                env.stop_simulation()
+                return rate
+
+            rate, cores = _cores(env, run)
+            # connected, simulation stopped, nothing to do
+            _, idle = _cores(env, lambda: time.sleep(0.5 if opts.quick else 2.))
+
+        results[name + '.steps_per_s'] = metric(rate, 'steps/s')
+        results[name + '.cpu'] = metric(cores, 'cores', 'lower')
+        results[name + '.idle_cpu'] = metric(idle, 'cores', 'lower')
+    return results
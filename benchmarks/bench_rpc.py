@@ -0,0 +1,59 @@
+# Script function calls.
+#
+# script_rpc: a path of n 6-DOF states, like findPath_goalIsPose in pathPlanningTest.py,
+# returned as a list of floats (call_script_function) against a float32 array packed
+# in the buffer (remote_function, see vrepper/rpc.py).
+#
+# observation_bundle: an observation of many objects read call by call, against
+# one vrepper.observation read.
+
+import numpy as np
+
+from harness import benchmark, latency_metrics, time_calls, environment
+from bench_core import CART_POLE
+
+SIZES = [10, 300, 3000]
+
+
+@benchmark('script_rpc')
+def bench_script_rpc(opts):
+    results = {}
+    with environment(CART_POLE, opts.verbose) as env:
+        sample_path = env.remote_function('samplePath_packed', args=['int32'], returns=[('float32', (-1, 6))])
+        for n in SIZES:
+            def lists():
+                _, floats, _, _ = env.call_script_function('samplePath', ([n], [], [], bytearray()))
+                return np.array(floats, np.float32).reshape(-1, 6)
+
+            def packed():
+                return sample_path([n])
+
+            assert np.array_equal(lists(), packed())
+            for name, func in (('lists', lists), ('packed', packed)):
+                for k, v in latency_metrics(time_calls(func, opts.calls // 10)).items():
+                    results['{}.n{}.{}'.format(name, n, k)] = v
+    return results
+
+
+@benchmark('observation_bundle')
+def bench_observation_bundle(opts):
+    # position, velocity and joint angle of 14 joints: 42 reads one by one, or one script call
+    with environment('standin:joints=14', opts.verbose) as env:
+        joints = [env.get_object_by_name('joint{}'.format(k)) for k in range(14)]
+        links = [env.get_object_by_name('link{}'.format(k), is_joint=False) for k in range(14)]
+        spec = []
+        for joint, link in zip(joints, links):
+            spec += [(link, 'position'), (link, 'velocity'), (joint, 'joint_angle')]
+        obs = env.observation(spec)
+
+        def individual():
+            for joint, link in zip(joints, links):
+                link.get_position()
+                link.get_velocity()
+                joint.get_joint_angle()
+
+        results = {}
+        for name, func in (('individual', individual), ('bundle', obs.read)):
+            for k, v in latency_metrics(time_calls(func, opts.calls // 10)).items():
+                results['{}.{}'.format(name, k)] = v
+    return results
@@ -0,0 +1,156 @@
+# Small benchmark harness for vrepper.
+#
+# Benchmarks live in benchmarks/bench_*.py and register themselves with
+# @benchmark(name). Each one returns a dict of metrics, built with metric().
+# run.py runs them, saves the results as JSON and compares against a
+# previous run.
+
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+registry = []
+
+
+def benchmark(name):
+    def register(func):
+        registry.append((name, func))
+        return func
+
+    return register
+
+
+def metric(value, unit, better='higher'):
+    """
+    :param float value: measured value
+    :param str unit: unit of the value, for display
+    :param str better: 'higher' or 'lower', which direction is an improvement
+    """
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def percentile(samples, q):
+    s = sorted(samples)
+    if not s:
+        return float('nan')
+    k = min(len(s) - 1, max(0, int(round(q / 100. * (len(s) - 1)))))
+    return s[k]
+
+
+def latency_metrics(samples, unit_scale=1e6, unit='us'):
+    # percentiles of a list of durations (in seconds), lower is better
+    return {
+        'p50': metric(percentile(samples, 50) * unit_scale, unit, 'lower'),
+        'p99': metric(percentile(samples, 99) * unit_scale, unit, 'lower'),
+    }
+
+
+def time_calls(func, n):
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    # vrepper is chatty, keep its prints out of the benchmark report
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def environment(scene, verbose=False, **kwargs):
+    """
+    Start a vrepper instance with the given scene loaded, end it afterwards.
+
+    :param str scene: scene path, or a 'standin:...' synthetic scene description
+    """
+    from vrepper.vrepper import vrepper
+
+    with quiet(not verbose):
+        env = vrepper(headless=True, **kwargs).start()
+        env.load_scene(scene)
+    try:
+        yield env
+    finally:
+        with quiet(not verbose):
+            env.end()
+
+
+def metadata():
+    def git(*args):
+        try:
+            return subprocess.check_output(('git',) + args, stderr=subprocess.STDOUT).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'api': os.environ.get('VREPPER_API', 'native'),
+    }
+
+
+def flatten(results):
+    # {'bench': {'metric': {...}}} -> {'bench.metric': {...}}
+    flat = {}
+    for bench, metrics in results.items():
+        for name, m in metrics.items():
+            flat[bench + '.' + name] = m
+    return flat
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({'meta': metadata(), 'results': flatten(results)}, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.1, out=sys.stdout):
+    """
+    Print the change of every metric present in both runs.
+
+    :param dict baseline: results of a previous run (as loaded from JSON)
+    :param dict current: results of this run (as loaded from JSON)
+    :param float threshold: relative change counted as a regression
+    :returns: list of names of the metrics that regressed
+    """
+    regressions = []
+    base, cur = baseline['results'], current['results']
+    width = max([len(k) for k in cur] + [10])
+    for name in sorted(cur):
+        if name not in base:
+            continue
+        b, c = base[name]['value'], cur[name]['value']
+        if not b:
+            continue
+        change = (c - b) / abs(b)
+        worse = -change if cur[name]['better'] == 'higher' else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif -worse > threshold:
+            flag = '  improved'
+        out.write('{:<{w}} {:>12.4g} -> {:>12.4g} {:<8} {:+7.1%}{}\n'.format(
+            name, b, c, cur[name]['unit'], change, flag, w=width))
+    return regressions
@@ -0,0 +1,96 @@
+# Run the vrepper benchmarks and save the results as JSON.
+#
+# By default everything runs against the local stand-in server
+# (VREPPER_API=standin), so no V-REP install is needed:
+#
+#   $ python benchmarks/run.py -o results.json
+#   $ python benchmarks/run.py -o new.json --baseline results.json
+#   $ python benchmarks/run.py --compare results.json new.json
+#
+# Use --native to benchmark against a real V-REP found in your PATH.
+
+import argparse
+import glob
+import importlib
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='vrepper benchmarks')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('-o', '--output', help='save results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results with this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='only compare two result files')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with 1 if anything regressed')
+    parser.add_argument('--native', action='store_true', help='use V-REP instead of the stand-in server')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, for smoke testing')
+    parser.add_argument('--list', action='store_true', help='list benchmarks and exit')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show vrepper output')
+    opts = parser.parse_args(argv)
+
+    # iteration counts shared by the benchmarks
+    opts.repeat = 1 if opts.quick else 3
+    opts.steps = 100 if opts.quick else 2000
+    opts.calls = 100 if opts.quick else 2000
+    opts.resolution = (128, 128)
+    opts.instances = [1, 2] if opts.quick else [1, 2, 4]
+    return opts
+
+
+def setup(opts):
+    if not opts.native:
+        os.environ['VREPPER_API'] = 'standin'
+    # make vrepper (and the stand-in server it spawns) importable from a checkout
+    os.environ['PYTHONPATH'] = os.pathsep.join([ROOT] + [p for p in [os.environ.get('PYTHONPATH')] if p])
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    for path in sorted(glob.glob(os.path.join(HERE, 'bench_*.py'))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+    sys.path.insert(0, HERE)
+    import harness
+
+    if opts.compare:
+        regressions = harness.compare(harness.load(opts.compare[0]), harness.load(opts.compare[1]),
+                                      opts.threshold)
+        return 1 if regressions and opts.fail_on_regression else 0
+
+    setup(opts)
+    if opts.list:
+        for name, _ in harness.registry:
+            print(name)
+        return 0
+
+    results = {}
+    for name, func in harness.registry:
+        if opts.names and name not in opts.names:
+            continue
+        t = time.time()
+        results[name] = func(opts)
+        print('{} ({:.1f}s)'.format(name, time.time() - t))
+        for k, m in sorted(results[name].items()):
+            print('  {:<32} {:>12.4g} {}'.format(k, m['value'], m['unit']))
+
+    if opts.output:
+        harness.save(opts.output, results)
+        print('results saved to', opts.output)
+
+    if opts.baseline:
+        current = {'results': harness.flatten(results)}
+        regressions = harness.compare(harness.load(opts.baseline), current, opts.threshold)
+        if regressions and opts.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# The tests run against the local stand-in server (vrepper/standin.py), no V-REP needed:
+#   $ python -m pytest -q
+# test_cartpole.py and test_body_joint.py are demos for a real V-REP, run them by hand.
+
+import os
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# before vrepper is imported, it picks its remote API library then
+os.environ['VREPPER_API'] = 'standin'
+# the stand-in runs as "python -m vrepper.standin", make it importable from a checkout
+os.environ['PYTHONPATH'] = os.pathsep.join([ROOT] + [p for p in [os.environ.get('PYTHONPATH')] if p])
+# the instances started by the tests are registered apart from the user's
+os.environ['VREPPER_REGISTRY'] = os.path.join(tempfile.mkdtemp(prefix='vrepper-tests-'), 'registry.json')
+
+collect_ignore = ['test_cartpole.py', 'test_body_joint.py']
+
+SCENE = 'standin:joints=2&cameras=2&resolution=8x6'
+
+
+@pytest.fixture
+def make_env():
+    """
+    make_env(scene=SCENE, **kwargs) starts a vrepper on a stand-in server, ended after the test.
+    """
+    from vrepper.vrepper import vrepper
+
+    envs = []
+
+    def make(scene=SCENE, **kwargs):
+        env = vrepper(headless=True, **kwargs)
+        envs.append(env)
+        env.start()
+        if scene is not None:
+            env.load_scene(scene)
+        return env
+
+    yield make
+    for env in envs:
+        env.end()
+
+
+@pytest.fixture
+def env(make_env):
+    return make_env()
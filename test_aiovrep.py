@@ -0,0 +1,92 @@
+import asyncio
+import random
+import socket
+
+import pytest
+
+from vrepper import aiovrep as vrep
+from vrepper.vrepper import instance, vrep_args
+
+
+@pytest.fixture
+def servers():
+    ports = random.sample(range(21000, 22000), 2)
+    instances = [instance(vrep_args(port, headless=True), port=port).start() for port in ports]
+    yield ports
+    for inst in instances:
+        inst.end()
+
+
+async def _connect(port):
+    cid = await vrep.simxStart('127.0.0.1', port, True, True, 5000, 1)
+    assert cid != -1
+    ret = await vrep.simxLoadScene(cid, 'standin:joints=2', 0, vrep.simx_opmode_blocking)
+    assert ret == vrep.simx_return_ok
+    return cid
+
+
+def test_blocking_calls_on_several_servers(servers):
+    async def main():
+        cids = await asyncio.gather(*[_connect(port) for port in servers])
+        results = await asyncio.gather(*[vrep.simxGetObjectHandle(cid, name, vrep.simx_opmode_blocking)
+                                         for cid in cids for name in ('joint0', 'joint1')])
+        assert [r[0] for r in results] == [vrep.simx_return_ok] * 4
+        assert results[0][1] == results[2][1] and results[0][1] != results[1][1]
+        ret, ms = await vrep.simxGetPingTime(cids[0])
+        assert ret == vrep.simx_return_ok and ms >= 0
+        for cid in cids:
+            await vrep.simxFinish(cid)
+
+    asyncio.run(main())
+
+
+def test_streaming(servers):
+    async def main():
+        cid = await _connect(servers[0])
+        _, handle = await vrep.simxGetObjectHandle(cid, 'joint0', vrep.simx_opmode_blocking)
+        ret, _ = await vrep.simxGetJointPosition(cid, handle, vrep.simx_opmode_streaming)
+        assert ret == vrep.simx_return_novalue_flag
+        await vrep.simxGetPingTime(cid)
+        ret, position = await vrep.simxGetJointPosition(cid, handle, vrep.simx_opmode_buffer)
+        assert ret == vrep.simx_return_ok and position == 0.
+        await vrep.simxFinish(cid)
+
+    asyncio.run(main())
+
+
+def test_not_connected():
+    async def main():
+        ret, _ = await vrep.simxGetObjectHandle(12345, 'joint0', vrep.simx_opmode_blocking)
+        assert ret != vrep.simx_return_ok
+        assert vrep.simxPackInts([1]) == b'\x01\x00\x00\x00'
+
+    asyncio.run(main())
+
+
+def test_blocking_calls_of_one_command_wait_for_each_other(servers):
+    async def main():
+        cid = await _connect(servers[0])
+        results = await asyncio.gather(*[vrep.simxCallScriptFunction(
+            cid, 'remoteApiCommandServer', vrep.sim_scripttype_childscript, 'echo', [i], [], [], b'',
+            vrep.simx_opmode_blocking) for i in range(5)])
+        assert [r[0] for r in results] == [vrep.simx_return_ok] * 5
+        assert [r[1] for r in results] == [[i] for i in range(5)]
+        ret, ms = await vrep.simxGetPingTime(cid)
+        assert ret == vrep.simx_return_ok
+        await vrep.simxFinish(cid)
+
+    asyncio.run(main())
+
+
+def test_socket_buffers(servers):
+    async def main():
+        cid = await vrep.simxStart('127.0.0.1', servers[0], True, True, 5000, 1,
+                                   sendBufferSize=1 << 16, receiveBufferSize=1 << 16)
+        sock = vrep._clients[cid].transport.get_extra_info('socket')
+        # linux doubles the size it is given
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 1 << 16
+        ret, ms = await vrep.simxGetPingTime(cid)
+        assert ret == vrep.simx_return_ok and ms >= 0
+        await vrep.simxFinish(cid)
+
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+def test_reads_are_cached_until_the_next_step(make_env):
+    env = make_env(read_cache=True)
+    joint = env.get_object_by_name('joint0')
+    env.start_blocking_simulation()
+    joint.set_velocity(1.)
+    a = joint.get_position()
+    b = joint.get_position()
+    assert a == b
+    assert env.stats()['read_cache_hits'] == 1 and env.stats()['read_cache_misses'] == 1
+    env.step_blocking_simulation()
+    joint.get_position()
+    assert env.stats()['read_cache_misses'] == 2
+
+
+def test_setters_invalidate_the_object(make_env):
+    env = make_env(read_cache=True)
+    joint = env.get_object_by_name('joint0')
+    env.start_blocking_simulation()
+    joint.get_joint_angle()
+    joint.set_velocity(2.)
+    joint.get_joint_angle()
+    assert env.stats()['read_cache_hits'] == 0
+
+
+def test_no_cache_by_default(env):
+    joint = env.get_object_by_name('joint0')
+    joint.get_position()
+    joint.get_position()
+    assert env.stats()['read_cache_hits'] == 0 and env.stats()['read_cache_misses'] == 0
+
+
+def test_write_tolerance(make_env):
+    env = make_env(write_tolerance=0.01)
+    joint = env.get_object_by_name('joint0')
+    joint.set_velocity(1.)
+    joint.set_velocity(1.005)
+    joint.set_velocity(1.1)
+    assert env.stats()['writes_sent'] == 2 and env.stats()['writes_suppressed'] == 1
+
+
+def test_objects_are_interned(env):
+    a = env.get_object_by_name('joint0')
+    assert env.get_object_by_handle(a.handle) is a
+    assert env.get_object_by_name('joint0', is_joint=False) is not a
+
+
+def test_cached_values_are_copies(make_env):
+    env = make_env(read_cache=True)
+    joint = env.get_object_by_name('joint0')
+    env.start_blocking_simulation()
+    position = joint.get_position()
+    expected = list(position)
+    position[0] = 99.
+    hit = joint.get_position()
+    assert hit == expected
+    hit[1] = 99.
+    assert joint.get_position() == expected
+    linear, angular = joint.get_velocity()
+    linear.append(1.)
+    assert len(joint.get_velocity()[0]) == 3
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from vrepper import pyvrep, vrep
+
+
+def _cameras(env):
+    return [env.get_object_by_name('camera{}'.format(k), is_joint=False) for k in range(2)]
+
+
+def test_capture_matches_get_vision_image(env):
+    cameras = _cameras(env)
+    rig = env.camera_rig(cameras)
+    env.start_blocking_simulation()
+    env.step_blocking_simulation()
+    images = rig.capture()
+    assert images.shape == (2, 6, 8, 3) and images.dtype == np.uint8
+    for k, camera in enumerate(cameras):
+        assert np.array_equal(images[k], camera.get_vision_image())
+    rig.close()
+
+
+def test_capture_double_buffer(env):
+    rig = env.camera_rig(_cameras(env))
+    env.start_blocking_simulation()
+    env.step_blocking_simulation()
+    first = rig.capture()
+    kept = first.copy()
+    env.step_blocking_simulation()
+    second = rig.capture()
+    assert not np.shares_memory(second, first)
+    # the stand-in renders different images every step
+    assert np.array_equal(first, kept) and not np.array_equal(first, second)
+    env.step_blocking_simulation()
+    assert np.shares_memory(rig.capture(), first)
+
+
+def test_grayscale_and_resolution(env):
+    cameras = _cameras(env)
+    rig = env.camera_rig(cameras, grayscale=True, resolution=(4, 3))
+    env.start_blocking_simulation()
+    env.step_blocking_simulation()
+    assert rig.capture().shape == (2, 3, 4, 1)
+    env.stop_simulation()
+    # stopping restores the scene, let it finish first
+    env.wait_until_stopped()
+    rig.close()
+    assert rig._resolution(cameras[0].handle) == [8, 6]
+
+
+def test_set_vision_image(env):
+    camera = _cameras(env)[0]
+    image = np.random.RandomState(0).randint(0, 256, (6, 8, 3)).astype(np.uint8)
+    camera.set_vision_image(image)
+    assert np.array_equal(camera.get_vision_image(), image)
+    with pytest.raises(ValueError):
+        camera.set_vision_image(image.astype(np.float32))
+
+
+@pytest.mark.parametrize('api', [vrep, pyvrep], ids=['vrep', 'pyvrep'])
+@pytest.mark.parametrize('dtype', [np.int64, np.float32, np.uint16])
+def test_image_buffers_of_wider_values_are_refused(api, dtype):
+    with pytest.raises(TypeError):
+        api.simxSetVisionSensorImage(0, 16, np.zeros(6 * 8 * 3, dtype), 0, api.simx_opmode_blocking)
+
+
+def test_image_buffers_and_lists(env):
+    camera = _cameras(env)[0]
+    image = np.arange(6 * 8 * 3, dtype=np.uint8)
+    assert env.simxSetVisionSensorImage(camera.handle, image.view(np.int8), 0, vrep.simx_opmode_blocking) == 0
+    assert env.simxSetVisionSensorImage(camera.handle, image.view(np.int8).tolist(), 0,
+                                        vrep.simx_opmode_blocking) == 0
+    _, _, data = env.simxGetVisionSensorImage(camera.handle, 0, vrep.simx_opmode_blocking)
+    assert np.array_equal(np.array(data, np.int8).view(np.uint8), image)
+
+
+def test_capture_after_a_blocking_read(env):
+    cameras = _cameras(env)
+    rig = env.camera_rig(cameras)
+    env.start_blocking_simulation()
+    env.step_blocking_simulation()
+    rig.capture()
+    # the blocking read takes the stored replies of both cameras
+    for camera in cameras:
+        env.simxGetVisionSensorImage(camera.handle, 0, vrep.simx_opmode_blocking)
+    pings = []
+    ping = env.simxGetPingTime
+    env.simxGetPingTime = lambda: pings.append(1) or ping()
+    images = rig.capture()
+    assert len(pings) == 2  # one more round trip for both cameras, not one per camera
+    assert env.stats()['camera_resubscribes'] == 2
+    for k, camera in enumerate(cameras):
+        assert np.array_equal(images[k], camera.get_vision_image())
+    # streamed again
+    env.step_blocking_simulation()
+    rig.capture()
+    assert env.stats()['camera_resubscribes'] == 2
+
+
+def test_capture_is_traced(make_env, tmp_path):
+    from vrepper import trace
+    path = str(tmp_path / 'rig.trace')
+    env = make_env(trace=path)
+    rig = env.camera_rig(_cameras(env))
+    env.start_blocking_simulation()
+    env.step_blocking_simulation()
+    rig.capture()
+    env.stop_trace()
+    assert [c[0] for c in trace.read_trace(path)].count('_vision_sensor_image') == 2
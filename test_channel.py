@@ -0,0 +1,71 @@
+import numpy as np
+
+LOOPBACK = ([], [], ['cloud'], bytearray())
+
+
+def _round_trip(env, ch, *frames):
+    ch.send(*frames)
+    env.call_script_function('channelLoopback', LOOPBACK)
+    env.step_blocking_simulation()
+    env.simxGetPingTime()
+    return ch.receive()
+
+
+def test_frames_come_back(env):
+    ch = env.channel('cloud')
+    env.start_blocking_simulation()
+    assert ch.receive() == []
+    cloud = np.arange(12, dtype=np.float32).reshape(4, 3)
+    frames = _round_trip(env, ch, cloud, b'hello', bytearray(b''))
+    assert len(frames) == 3
+    assert np.array_equal(np.frombuffer(frames[0], np.float32).reshape(4, 3), cloud)
+    assert bytes(frames[1]) == b'hello'
+    assert bytes(frames[2]) == b''
+    stats = ch.stats()
+    assert stats['frames_sent'] == 3 and stats['frames_received'] == 3 and stats['frames_lost'] == 0
+    assert stats['bytes_sent'] == cloud.nbytes + 5
+
+
+def test_non_contiguous_frames(env):
+    ch = env.channel('cloud')
+    env.start_blocking_simulation()
+    ch.receive()
+    a = np.arange(20, dtype=np.int32).reshape(4, 5)[:, ::2]
+    frame, = _round_trip(env, ch, a)
+    assert np.frombuffer(frame, np.int32).tolist() == a.ravel().tolist()
+
+
+def test_old_frames_are_skipped_and_lost_ones_counted(env):
+    ch = env.channel('cloud')
+    env.start_blocking_simulation()
+    ch.receive()
+    assert len(_round_trip(env, ch, b'a')) == 1
+    # the last reply is kept: nothing new without a new step
+    assert ch.receive() == []
+    # two replies, only the last one is read
+    ch.send(b'b')
+    env.call_script_function('channelLoopback', LOOPBACK)
+    env.step_blocking_simulation()
+    env.simxGetPingTime()
+    env.call_script_function('channelLoopback', LOOPBACK)
+    frames = _round_trip(env, ch, b'c')
+    assert [bytes(f) for f in frames] == [b'c']
+    assert ch.stats()['frames_lost'] == 1
+
+
+def test_frames_are_sent_in_one_write(env, monkeypatch):
+    ch = env.channel('cloud')
+    env.start_blocking_simulation()
+    ch.receive()
+    written = []
+    write = env.simxWriteStringStream
+
+    def record(name, value, opmode):
+        written.append(value)
+        return write(name, value, opmode)
+
+    monkeypatch.setattr(env, 'simxWriteStringStream', record)
+    cloud = np.arange(12, dtype=np.float32)
+    frames = _round_trip(env, ch, cloud, b'hello')
+    assert len(written) == 1
+    assert [bytes(f) for f in frames] == [cloud.tobytes(), b'hello']
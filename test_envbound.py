@@ -0,0 +1,33 @@
+import gc
+
+import pytest
+
+from conftest import SCENE
+from vrepper.vrepper import vrepper
+
+
+def test_objects_do_not_keep_the_vrepper_alive():
+    env = vrepper(headless=True).start()
+    try:
+        env.load_scene(SCENE)
+        joint = env.get_object_by_name('joint0')
+        camera = env.get_object_by_name('camera0', is_joint=False)
+        bound = [joint, env.group(['joint0', 'joint1']), env.observation([(joint, 'position')]),
+                 env.channel('cloud'), env.camera_rig([camera]), env.remote_function('echoArrays'),
+                 env.call_script_function_async('echo', ([1], [], [], bytearray()))]
+        assert all(b.env is env for b in bound)
+    finally:
+        env.end()
+    del env, camera
+    gc.collect()
+    for b in bound:
+        with pytest.raises(RuntimeError):
+            b.env
+
+
+def test_objects_are_interned_per_vrepper(make_env):
+    a, b = make_env(), make_env()
+    ja, jb = a.get_object_by_name('joint0'), b.get_object_by_name('joint0')
+    assert ja.handle == jb.handle and ja is not jb
+    assert ja.env is a and jb.env is b
+    assert b.get_object_by_handle(jb.handle) is jb
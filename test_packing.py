@@ -0,0 +1,58 @@
+import struct
+
+import numpy as np
+import pytest
+
+from vrepper import packing, pyvrep, vrep
+
+
+@pytest.fixture(params=[vrep, pyvrep], ids=['vrep', 'pyvrep'])
+def api(request):
+    return request.param
+
+
+def test_pack_like_struct(api):
+    ints = [0, 1, -1, 2 ** 31 - 1, -2 ** 31]
+    floats = [0., 1.5, -2.25, 1e30]
+    assert api.simxPackInts(ints) == struct.pack('<5i', *ints)
+    assert api.simxPackFloats(floats) == struct.pack('<4f', *floats)
+    assert isinstance(api.simxPackInts(ints), bytearray)
+
+
+def test_pack_arrays_like_lists(api):
+    assert api.simxPackInts(np.arange(5)) == api.simxPackInts(list(range(5)))
+    assert api.simxPackFloats(np.linspace(0, 1, 5)) == api.simxPackFloats(np.linspace(0, 1, 5).tolist())
+
+
+def test_unpack(api):
+    packed = struct.pack('<3i', 1, -2, 3) + b'\x00'  # trailing partial value ignored
+    assert api.simxUnpackInts(packed) == [1, -2, 3]
+    assert api.simxUnpackFloats(struct.pack('<2f', 0.5, -4.)) == [0.5, -4.]
+    assert api.simxUnpackInts(b'') == []
+
+
+def test_unpack_arrays_are_views():
+    packed = bytearray(struct.pack('<2f', 1., 2.))
+    values = packing.unpack_floats(packed)
+    assert values.dtype == np.float32
+    packed[:4] = struct.pack('<f', 3.)
+    assert values[0] == 3.
+
+
+@pytest.mark.parametrize('values', [[1.5], [2 ** 31], [-2 ** 31 - 1], ['3'], np.array([1.5]),
+                                    np.array([2 ** 40]), np.array([2 ** 31], np.uint32)])
+def test_pack_ints_rejects_what_struct_does(api, values):
+    with pytest.raises(struct.error):
+        api.simxPackInts(values)
+
+
+def test_pack_floats_rejects_what_struct_does(api):
+    with pytest.raises(struct.error):
+        api.simxPackFloats(['3'])
+    with pytest.raises(struct.error):
+        api.simxPackFloats([1 + 2j])
+    with pytest.raises(OverflowError):
+        api.simxPackFloats([1e300])
+    assert api.simxPackFloats([float('inf'), 3]) == struct.pack('<2f', float('inf'), 3)
+    assert api.simxPackInts([True, np.int64(-5)]) == struct.pack('<2i', 1, -5)
+    assert api.simxPackInts([]) == b'' and api.simxPackFloats([]) == b''
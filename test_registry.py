@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import subprocess as sp
+import sys
+import time
+
+import pytest
+
+from vrepper import registry
+
+
+@pytest.fixture(autouse=True)
+def registry_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('VREPPER_REGISTRY', str(tmp_path / 'registry.json'))
+
+
+def _group():
+    # a process group standing in for an instance
+    return sp.Popen([sys.executable, '-c', 'import time; time.sleep(60)'], start_new_session=True)
+
+
+def _dead_pid():
+    p = sp.Popen([sys.executable, '-c', 'pass'])
+    p.wait()
+    return p.pid
+
+
+def test_register_unregister():
+    registry.register(1234, 20000, ['vrep.sh'])
+    entry = registry.instances()[1234]
+    assert entry['port'] == 20000 and entry['args'] == ['vrep.sh'] and entry['owner'] == os.getpid()
+    registry.unregister(1234)
+    assert registry.instances() == {}
+
+
+def test_reap_orphans_kills_only_orphans():
+    orphan, owned = _group(), _group()
+    try:
+        registry.register(orphan.pid, 1)
+        registry.register(owned.pid, 2)
+
+        def disown(entries):
+            entries[str(orphan.pid)]['owner'] = _dead_pid()
+            entries[str(orphan.pid)]['owner_start'] = None
+
+        registry._update(disown)
+        assert registry.reap_orphans(timeout=2.) == [(orphan.pid, 1)]
+        assert orphan.wait(5) is not None
+        assert owned.poll() is None
+        assert list(registry.instances()) == [owned.pid]
+    finally:
+        for p in (orphan, owned):
+            if p.poll() is None:
+                p.kill()
+            p.wait()
+
+
+def test_instance_end_kills_its_group(make_env):
+    env = make_env(scene=None)
+    pgid = env.instance.inst.pid
+    assert pgid in registry.instances()
+    env.end()
+    assert not registry._group_exists(pgid)
+    assert pgid not in registry.instances()
+
+
+def test_least_used_core_counts_every_process():
+    a, b, dead = _group(), _group(), _group()
+    try:
+        registry.register(a.pid, 1, cpus=[0])
+        registry.register(b.pid, 2, cpus=[0, 2])
+        registry.register(dead.pid, 3, cpus=[1])
+        dead.kill()
+        dead.wait()
+        assert registry.least_used_core([0, 1, 2]) == 1
+        assert registry.least_used_core([0, 2]) == 2
+    finally:
+        for p in (a, b):
+            p.kill()
+            p.wait()
+
+
+def test_auto_core_is_chosen_on_start(monkeypatch):
+    from vrepper import vrepper as module
+    monkeypatch.setattr(module, 'instance_cores', [0])
+    inst = module.instance([sys.executable, '-c', 'import time; time.sleep(60)'], cpus='auto')
+    assert inst.cpus is None
+    inst.start()
+    try:
+        assert inst.cpus == [0]
+        assert registry.instances()[inst.inst.pid]['cpus'] == [0]
+    finally:
+        inst.end()
+
+
+def test_usage_covers_the_process_group():
+    from vrepper.vrepper import instance
+    # a wrapper shell, like vrep.sh, with the busy process as its child
+    busy = '{} -c "while True: pass"; true'.format(sys.executable)
+    inst = instance(['sh', '-c', busy]).start()
+    try:
+        time.sleep(0.6)
+        usage = inst.usage()
+        assert usage['cpu_time'] > 0.2
+        assert usage['rss'] > 0
+    finally:
+        inst.end()
+
+
+def _reserve(barrier, cores):
+    barrier.wait()
+    core, _ = registry.reserve_core(range(4))
+    cores.put(core)
+    # stay alive, as if spawning the instance
+    time.sleep(0.5)
+
+
+def test_processes_starting_at_once_get_different_cores():
+    ctx = multiprocessing.get_context('fork')
+    barrier, cores = ctx.Barrier(4), ctx.Queue()
+    procs = [ctx.Process(target=_reserve, args=(barrier, cores)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    try:
+        assert sorted(cores.get(timeout=10) for _ in procs) == [0, 1, 2, 3]
+        assert registry.instances() == {}
+    finally:
+        for p in procs:
+            p.join()
+    # the reservations of processes that are gone don't count
+    assert registry.least_used_core([0, 1, 2, 3]) == 0
+    registry.reap_orphans()
+    assert registry._update(dict) == {}
+
+
+def test_register_replaces_the_reservation():
+    core, reservation = registry.reserve_core([0, 1])
+    assert core == 0 and registry.least_used_core([0, 1]) == 1
+    p = _group()
+    try:
+        registry.register(p.pid, cpus=[core], reservation=reservation)
+        assert list(registry._update(dict)) == [str(p.pid)]
+        assert registry.least_used_core([0, 1]) == 1
+    finally:
+        p.kill()
+        p.wait()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from vrepper import rpc
+
+
+def test_pack_arrays_round_trip():
+    arrays = [np.arange(6, dtype=np.uint8).reshape(2, 3), np.array(-7, np.int32),
+              np.zeros((0, 4), np.float32), np.linspace(0, 1, 5)]
+    out = rpc.unpack_arrays(rpc.pack_arrays(arrays))
+    assert len(out) == len(arrays)
+    for a, b in zip(arrays, out):
+        assert a.dtype == b.dtype and a.shape == b.shape
+        assert np.array_equal(a, b)
+
+
+def test_pack_arrays_big_endian():
+    a = np.arange(3, dtype='>i4')
+    b, = rpc.unpack_arrays(rpc.pack_arrays([a]))
+    assert b.dtype == np.dtype('<i4') and b.tolist() == [0, 1, 2]
+
+
+def test_pack_arrays_rejects_other_types():
+    with pytest.raises(ValueError):
+        rpc.pack_arrays([np.arange(3, dtype=np.int64)])
+
+
+def test_unpack_malformed():
+    buf = rpc.pack_arrays([np.arange(10, dtype=np.float64)])
+    with pytest.raises(ValueError):
+        rpc.unpack_arrays(buf[:-1])
+    with pytest.raises(ValueError):
+        rpc.unpack_arrays(b'\x01')
+
+
+def test_remote_function(env):
+    echo = env.remote_function('echoArrays', args=['float32', 'int32'], returns=[('float32', (-1, 3)), 'int32'])
+    points, counts = echo(np.arange(6).reshape(2, 3), [4, 5])
+    assert points.shape == (2, 3) and points.dtype == np.float32
+    assert points.ravel().tolist() == [0., 1., 2., 3., 4., 5.]
+    assert counts.tolist() == [4, 5]
+    with pytest.raises(ValueError):
+        echo([1.])
+
+
+def test_remote_function_async(env):
+    echo = env.remote_function('echoArrays', args=['int32'], returns=['int32'])
+    futures = [echo.call_async([k]) for k in range(3)]
+    assert [f.tolist() for f in env.gather(futures)] == [[0], [1], [2]]
+
+
+def _count_pings(env, monkeypatch):
+    pings = []
+    ping = env.simxGetPingTime
+    monkeypatch.setattr(env, 'simxGetPingTime', lambda: pings.append(1) or ping())
+    return pings
+
+
+def _pose_call(handle):
+    return [handle], [], [], bytearray()
+
+
+def test_calls_of_one_function_wait_without_lanes(env):
+    handles = [env.get_object_handle('joint0'), env.get_object_handle('joint1')]
+    first = env.call_script_function_async('getObjectPose', _pose_call(handles[0]))
+    assert first.ret is None
+    second = env.call_script_function_async('getObjectPose', _pose_call(handles[1]))
+    assert first.ret is not None  # the second call waited for the reply of the first
+    futures = [first, second]
+    poses = [f.result() for f in futures]
+    assert poses[0][1][3] != poses[1][1][3]
+
+
+def test_lanes_pipeline_calls_of_one_function(env, monkeypatch):
+    handles = [env.get_object_handle('joint0'), env.get_object_handle('joint1')] * 2
+    expected = [env.call_script_function('getObjectPose', _pose_call(h))[1] for h in handles]
+    pings = _count_pings(env, monkeypatch)
+    futures = [env.call_script_function_async('getObjectPose', _pose_call(h), lanes=4) for h in handles]
+    assert pings == []
+    assert [r[1] for r in env.gather(futures)] == expected
+    assert len(pings) <= 1
+    # all lanes busy: a fifth call waits for the oldest one only
+    futures = [env.call_script_function_async('getObjectPose', _pose_call(h), lanes=2) for h in handles]
+    assert [f.result()[1] for f in futures] == expected
+
+
+def test_remote_function_lanes(env):
+    echo = env.remote_function('echoArrays', args=['int32'], returns=['int32'], lanes=3)
+    futures = [echo.call_async([k]) for k in range(3)]
+    assert set(env.script_calls) == set([('remoteApiCommandServer', 'echoArrays'),
+                                         ('remoteApiCommandServer', 'echoArrays#1'),
+                                         ('remoteApiCommandServer', 'echoArrays#2')])
+    assert [f.tolist() for f in env.gather(futures)] == [[0], [1], [2]]
@@ -0,0 +1,80 @@
+import socket
+
+import pytest
+
+from vrepper import scheduler
+
+
+@pytest.fixture
+def agents():
+    addresses, instances = scheduler.local_agents(2, cores=1)
+    yield addresses
+    for inst in instances:
+        inst.end()
+
+
+def test_acquire_connect_release(agents):
+    sched = scheduler.scheduler(agents)
+    leases = sched.acquire(2)
+    assert set(l.agent for l in leases) == set(agents)
+    with pytest.raises(RuntimeError):
+        sched.acquire()
+    env = leases[0].vrepper().start()
+    try:
+        env.load_scene('standin:joints=1')
+        assert env.get_object_handle('joint0') > 0
+    finally:
+        env.end()
+    for l in leases:
+        l.release()
+    statuses = sched.status()
+    assert all(s['free_cores'] == 1 and s['instances'] == [] for s in statuses.values())
+
+
+def test_token():
+    addresses, instances = scheduler.local_agents(1, cores=1, token='s3cret')
+    try:
+        assert scheduler.scheduler(addresses).status()[addresses[0]] is None
+        with pytest.raises(RuntimeError, match='PermissionError'):
+            scheduler.request(addresses[0], {'op': 'launch', 'token': 'guess'})
+        status = scheduler.scheduler(addresses, token='s3cret').status()[addresses[0]]
+        assert status['free_cores'] == 1
+    finally:
+        for inst in instances:
+            inst.end()
+
+
+def test_remote_bind_needs_token():
+    with pytest.raises(ValueError):
+        scheduler.agent(port=0).serve_forever('0.0.0.0')
+    with pytest.raises(SystemExit):
+        scheduler.main(['agent', '--bind', '0.0.0.0'])
+
+
+def test_launch_refused_at_capacity():
+    a = scheduler.agent(cores=1)
+    try:
+        a.launch()
+        with pytest.raises(RuntimeError, match='no free core'):
+            a.launch()
+        assert len(a.instances) == 1
+    finally:
+        a.shutdown()
+
+
+def test_launch_retries_taken_port(monkeypatch):
+    # another process binds the port between _free_port and the instance
+    taken = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    taken.bind(('127.0.0.1', 0))
+    taken.listen(1)
+    ports = [taken.getsockname()[1]]
+    free_port = scheduler._free_port
+    monkeypatch.setattr(scheduler, '_free_port', lambda: ports.pop() if ports else free_port())
+    a = scheduler.agent(cores=1)
+    try:
+        reply = a.launch()
+        assert reply['port'] != taken.getsockname()[1]
+        assert list(a.instances) == [reply['port']] and a.instances[reply['port']].isAlive()
+    finally:
+        a.shutdown()
+        taken.close()
@@ -0,0 +1,48 @@
+from vrepper import trace
+from vrepper.vrepper import vrep
+
+
+def test_record_and_replay(make_env, tmp_path):
+    path = str(tmp_path / 'run.trace')
+    env = make_env(trace=path)
+    joint = env.get_object_by_name('joint0')
+    env.start_blocking_simulation()
+    for _ in range(3):
+        joint.set_velocity(1.)
+        env.step_blocking_simulation()
+        joint.get_position()
+    env.stop_simulation()
+    env.stop_trace()
+
+    calls = list(trace.read_trace(path))
+    names = [c[0] for c in calls]
+    assert names.count('simxSynchronousTrigger') == 3
+    assert names.count('simxGetObjectPosition') == 3
+    name, args, kwargs, opmode, start, duration, retcode = calls[names.index('simxGetObjectPosition')]
+    assert args[0] == joint.handle and opmode == args[-1] and retcode == 0 and duration >= 0
+    stats = trace.summarize([(c[0], c[5]) for c in calls])
+    assert stats['simxSetJointTargetVelocity'][0] == 3
+
+    replayed = trace.replay(path, make_env(scene=None))
+    assert [r[0] for r in replayed] == [n for n in names if n not in trace.NOT_REPLAYED]
+
+
+def test_replay_arrays(make_env, tmp_path):
+    import numpy as np
+    path = str(tmp_path / 'images.trace')
+    env = make_env(trace=path)
+    camera = env.get_object_by_name('camera0', is_joint=False)
+    joint = env.get_object_by_name('joint0')
+    image = np.random.RandomState(0).randint(0, 256, (6, 8, 3)).astype(np.uint8)
+    camera.set_vision_image(image)
+    env.simxSetObjectPosition(joint.handle, -1, np.array([1., 2., 3.]), vrep.simx_opmode_blocking)
+    env.stop_trace()
+
+    calls = dict((c[0], c) for c in trace.read_trace(path))
+    recorded = calls['simxSetVisionSensorImage'][1][1]
+    assert isinstance(recorded, np.ndarray) and recorded.dtype == np.uint8 and recorded.shape == (6, 8, 3)
+
+    other = make_env()
+    trace.replay(path, other)
+    assert np.array_equal(other.get_object_by_name('camera0', is_joint=False).get_vision_image(), image)
+    assert other.get_object_by_name('joint0').get_position() == [1., 2., 3.]
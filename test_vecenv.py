@@ -0,0 +1,168 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from vrepper.vecenv import CMD_STEP, vecenv
+from vrepper.vrepper import simulator_fault
+
+
+class counter(object):
+    # observation: (steps since reset, last action). Episodes last `length` steps
+    def __init__(self, length=3, fail_at=None, fault_at=None):
+        self.length = length
+        self.fail_at = fail_at
+        self.fault_at = fault_at
+        self.t = 0
+
+    def reset(self):
+        self.t = 0
+        return np.zeros(2)
+
+    def step(self, action):
+        self.t += 1
+        if self.t == self.fail_at:
+            raise ValueError('step failed')
+        if self.t == self.fault_at:
+            raise simulator_fault('simulator restarted')
+        info = {'t': self.t} if self.t == 2 else {}
+        return np.array([self.t, action]), float(action), self.t >= self.length, info
+
+
+def make_counter():
+    return counter()
+
+
+def make_failing():
+    return counter(fail_at=2)
+
+
+def make_faulty():
+    return counter(fault_at=2)
+
+
+SLOW_RESET = 0.5
+
+
+class slow_reset(counter):
+    # like restarting the simulation, except for the first reset
+    def reset(self):
+        if self.t:
+            time.sleep(SLOW_RESET)
+        return counter.reset(self)
+
+
+def make_slow_reset():
+    return slow_reset()
+
+
+def test_step():
+    envs = vecenv([make_counter] * 3)
+    try:
+        assert len(envs) == 3
+        assert envs.reset().tolist() == [[0., 0.]] * 3
+        obs, rewards, dones, infos = envs.step([1., 2., 3.])
+        assert obs.tolist() == [[1., 1.], [1., 2.], [1., 3.]]
+        assert rewards.tolist() == [1., 2., 3.] and not dones.any()
+        assert infos == [{}, {}, {}]
+        _, _, _, infos = envs.step([0., 0., 0.])
+        assert infos == [{'t': 2}] * 3
+        _, _, dones, _ = envs.step([0., 0., 0.])
+        assert dones.all()
+    finally:
+        envs.close()
+
+
+def test_worker_errors_are_raised():
+    envs = vecenv([make_counter, make_failing])
+    try:
+        envs.reset()
+        envs.step([0., 0.])
+        with pytest.raises(RuntimeError) as e:
+            envs.step([0., 0.])
+        assert 'step failed' in str(e.value)
+    finally:
+        envs.close()
+
+
+def test_simulator_fault_truncates_the_episode():
+    envs = vecenv([make_faulty])
+    try:
+        envs.reset()
+        envs.step([5.])
+        obs, rewards, dones, infos = envs.step([5.])
+        assert dones[0] and rewards[0] == 0.
+        assert obs[0].tolist() == [1., 5.]  # the previous observation
+        assert infos[0]['TimeLimit.truncated']
+    finally:
+        envs.close()
+
+
+def test_auto_reset_final_observation():
+    envs = vecenv([make_counter] * 2, auto_reset=True)
+    try:
+        envs.reset()
+        envs.step([1., 1.])
+        envs.step([1., 1.])
+        obs, _, dones, infos = envs.step([7., 8.])
+        assert dones.all()
+        assert infos[0]['final_observation'].tolist() == [3., 7.]
+        assert infos[1]['final_observation'].tolist() == [3., 8.]
+    finally:
+        envs.close()
+
+
+def test_auto_reset_steps_the_new_episode():
+    envs = vecenv([make_counter], auto_reset=True)
+    try:
+        envs.reset()
+        envs.step([1.])
+        envs.step([1.])
+        obs, rewards, dones, infos = envs.step([7.])
+        assert dones[0] and rewards[0] == 7.
+        assert obs[0].tolist() == [3., 7.]
+        assert infos[0]['final_observation'].tolist() == [3., 7.]
+        # the action after the reset is not lost
+        obs, rewards, dones, infos = envs.step([9.])
+        assert obs[0].tolist() == [1., 9.] and rewards[0] == 9. and not dones[0]
+        assert infos[0]['reset_observation'].tolist() == [0., 0.]
+    finally:
+        envs.close()
+
+
+def test_auto_reset_does_not_hold_up_the_final_step():
+    envs = vecenv([make_slow_reset] * 2, auto_reset=True)
+    try:
+        envs.reset()
+        envs.step([1., 1.])
+        envs.step([1., 1.])
+        t = time.time()
+        _, _, dones, _ = envs.step([1., 1.])
+        assert dones.all() and time.time() - t < SLOW_RESET / 2
+        obs, _, dones, _ = envs.step([2., 2.])
+        assert obs.tolist() == [[1., 2.], [1., 2.]] and not dones.any()
+    finally:
+        envs.close()
+
+
+@pytest.mark.parametrize('context', ['fork', 'spawn'])
+def test_worker_exit_keeps_the_shared_block(context):
+    # workers attach without tracking the block: one exiting must not unlink it under the others
+    envs = vecenv([make_counter, make_failing], context=context)
+    name = envs.shm.name
+    try:
+        envs.reset()
+        envs.step([0., 0.])
+        with pytest.raises(RuntimeError):
+            envs.step([0., 0.])
+        envs.procs[1].join(10)
+        assert not envs.procs[1].is_alive()
+        time.sleep(0.1)
+        assert os.path.exists('/dev/shm/' + name)
+        envs._send(CMD_STEP, [0])
+        envs._wait(0)
+        assert envs.views['obs'][0].tolist() == [3., 0.]
+    finally:
+        envs.close()
+    assert not os.path.exists('/dev/shm/' + name)
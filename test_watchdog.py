@@ -0,0 +1,66 @@
+import os
+import signal
+import time
+
+import pytest
+
+from vrepper.vrepper import simulator_fault, vrep
+
+
+def test_healthy(make_env):
+    env = make_env(watchdog=2.)
+    assert env.check_health() is None
+
+
+def test_restart_after_a_crash(make_env):
+    env = make_env(watchdog=2., latency={'timeout': 500})
+    joint = env.get_object_by_name('joint0')
+    env.start_blocking_simulation()
+    os.killpg(env.instance.inst.pid, signal.SIGKILL)
+    env.instance.inst.wait()
+    with pytest.raises(simulator_fault):
+        joint.get_position()
+    assert env.stats()['restarts'] == 1
+    assert env.instance.isAlive()
+    # the scene is back, with the same handles
+    assert env.get_object_handle('joint0') == joint.handle
+    joint.get_position()
+    assert not env.sim_running
+
+
+def test_no_watchdog(make_env):
+    env = make_env(latency={'timeout': 500})
+    joint = env.get_object_by_name('joint0')
+    os.killpg(env.instance.inst.pid, signal.SIGKILL)
+    env.instance.inst.wait()
+    with pytest.raises(RuntimeError) as e:
+        joint.get_position()
+    assert not isinstance(e.value, simulator_fault)
+
+
+def test_check_health_before_start():
+    from vrepper.vrepper import vrepper
+    assert vrepper(headless=True, watchdog=1.).check_health() == 'the simulator was not started'
+
+
+def test_hung_simulator_is_detected_within_the_watchdog(make_env):
+    env = make_env(watchdog=0.3)
+    pgid = env.instance.inst.pid
+    os.killpg(pgid, signal.SIGSTOP)
+    try:
+        t = time.time()
+        assert env.check_health() == 'the simulator is not responding'
+        assert time.time() - t < 1.
+    finally:
+        os.killpg(pgid, signal.SIGCONT)
+    # it answers again, late replies don't count as the next ping
+    assert env.check_health() is None
+
+
+def test_no_restart_after_end(make_env):
+    env = make_env(watchdog=1.)
+    joint = env.get_object_by_name('joint0')
+    env.end()
+    ret, _ = env.simxGetObjectPosition(joint.handle, -1, vrep.simx_opmode_blocking)
+    assert ret != vrep.simx_return_ok
+    assert env.stats()['restarts'] == 0 and not env.instance.isAlive()
@@ -0,0 +1,265 @@
+# asyncio remote API client: the functions of pyvrep (same names, arguments
+# and return values), as coroutines. Like pyvrep, it speaks the framing of the
+# stand-in server (simxproto), not the one of the remoteApi library, so it works
+# with vrepper.standin only.
+#
+#   from vrepper import aiovrep as vrep
+#
+#   async def main():
+#       cid = await vrep.simxStart('127.0.0.1', 19997, True, True, 5000, 5)
+#       ret, cart = await vrep.simxGetObjectHandle(cid, 'cart', vrep.simx_opmode_blocking)
+#       ...
+#       await vrep.simxFinish(cid)
+#
+# Every connection is served by the running event loop: replies are read as
+# soon as they arrive (streamed values land in the inbox without polling) and a
+# blocking call only suspends the coroutine that made it, so one thread can drive
+# many servers with asyncio.gather(). There is no communication thread;
+# commThreadCycleInMs is ignored.
+#
+# Argument packing, result conversion and the handling of the operation modes are
+# those of pyvrep: every pyvrep function is a generator that hands out its command
+# and gets the result back, which aiovrep awaits instead of reading the socket.
+
+import asyncio
+import functools
+import socket
+import time
+
+from . import pyvrep
+from . import simxproto as proto
+from .vrepConst import *
+
+_clients = {}
+_next_client_id = [0]
+
+
+class _protocol(asyncio.Protocol):
+    def __init__(self, client):
+        self.client = client
+        self.received = bytearray()
+
+    def data_received(self, data):
+        self.received += data
+        for message in proto.split_messages(self.received):
+            self.client.process(message)
+
+    def connection_lost(self, exc):
+        self.client.disconnected()
+
+
+class _client(object):
+    # the state pyvrep._start works on, with data delivered by the event loop
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.transport = None
+        self.connection_id = pyvrep._next_connection_id[0]
+        pyvrep._next_connection_id[0] += 1
+        self.connected = True
+
+        self.message_id = 0
+
+        # replies by (command id, identification), as (status, data, sim_time)
+        self.inbox = {}
+        # blocking calls waiting for their reply, futures by (command id, identification)
+        self.waiting = {}
+        # streaming commands sent to the server, by (command id, identification)
+        self.streams = {}
+
+        self.paused = False
+        self.outbox = []
+
+        self.in_header = None
+        self.out_header = {}
+        self.last_cmd_time = 0
+
+    def send(self, commands):
+        if not self.connected:
+            return
+        self.message_id += 1
+        client_time = pyvrep._now_ms()
+        message = proto.pack_message(commands, message_id=self.message_id, client_time=client_time)
+        self.out_header = {'version': SIMX_VERSION, 'message_id': self.message_id, 'client_time': client_time,
+                           'server_time': 0, 'scene_id': 0, 'server_state': 0}
+        self.transport.write(proto.LENGTH.pack(len(message)) + message)
+
+    def process(self, message):
+        header, commands = proto.unpack_message(message)
+        self.in_header = header
+        for cmd, ident, data, sim_time, status in commands:
+            key = (cmd & proto.CMD_MASK, ident)
+            reply = (status, data, sim_time)
+            self.last_cmd_time = sim_time
+            futures = self.waiting.get(key)
+            if futures:
+                # replies come back in order, the oldest waiting call gets this one
+                future = futures.pop(0)
+                if not futures:
+                    del self.waiting[key]
+                if not future.done():
+                    future.set_result(reply)
+            else:
+                self.inbox[key] = reply
+
+    def disconnected(self):
+        self.connected = False
+        for futures in self.waiting.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+        self.waiting = {}
+
+    def drain(self):
+        pass  # the event loop reads the socket
+
+    async def wait_for(self, key):
+        if not self.connected:
+            return None
+        # no reply is processed before we await it: it can only come in through the event loop
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            futures = self.waiting.get(key, [])
+            if future in futures:
+                futures.remove(future)
+            return None
+
+
+async def _call(clientID, name, ident, inputs, operationMode):
+    # same as pyvrep._call, except that blocking calls await their reply
+    c = _clients.get(clientID)
+    if c is None:
+        return simx_return_initialize_error_flag, None
+    key, result = pyvrep._start(c, name, ident, inputs, operationMode)
+    if key is None:
+        return result
+    return pyvrep._result(name, await c.wait_for(key))
+
+
+def _coroutine(func):
+    # coroutine out of a pyvrep function going through pyvrep._call
+    generator = func.generator
+
+    @functools.wraps(func)
+    async def call(*args, **kwargs):
+        g = generator(*args, **kwargs)
+        result = None
+        try:
+            while True:
+                result = await _call(*g.send(result))
+        except StopIteration as e:
+            return e.value
+
+    return call
+
+
+# functions with their own implementation below
+_LOCAL = ('simxStart', 'simxFinish', 'simxGetLastCmdTime', 'simxPauseCommunication',
+          'simxGetInMessageInfo', 'simxGetOutMessageInfo', 'simxGetConnectionId',
+          'simxCreateBuffer', 'simxReleaseBuffer', 'simxPackInts', 'simxUnpackInts', 'simxPackFloats',
+          'simxUnpackFloats')
+
+for _name in dir(pyvrep):
+    if _name.startswith('simx') and hasattr(getattr(pyvrep, _name), 'generator') and _name not in _LOCAL:
+        globals()[_name] = _coroutine(getattr(pyvrep, _name))
+
+
+async def simxStart(connectionAddress, connectionPort, waitUntilConnected, doNotReconnectOnceDisconnected,
+                    timeOutInMs, commThreadCycleInMs, sendBufferSize=None, receiveBufferSize=None):
+    """
+    Same as vrep.simxStart.
+
+    :param int sendBufferSize: SO_SNDBUF of the socket, None for the system default
+    :param int receiveBufferSize: SO_RCVBUF of the socket, None for the system default
+    """
+    if timeOutInMs < 0:
+        connect_timeout, reply_timeout = 5000, -timeOutInMs
+    else:
+        connect_timeout, reply_timeout = timeOutInMs, pyvrep._REPLY_WAIT_TIMEOUT_IN_MS
+    if isinstance(connectionAddress, bytes):
+        connectionAddress = connectionAddress.decode('utf-8')
+
+    loop = asyncio.get_running_loop()
+    c = _client(reply_timeout / 1000.)
+    deadline = time.time() + connect_timeout / 1000.
+    while True:
+        try:
+            transport, _ = await asyncio.wait_for(
+                loop.create_connection(lambda: _protocol(c), connectionAddress, connectionPort),
+                max(deadline - time.time(), 0.001))
+            break
+        except (OSError, asyncio.TimeoutError):
+            if not waitUntilConnected or time.time() >= deadline:
+                return -1
+            await asyncio.sleep(0.01)
+
+    sock = transport.get_extra_info('socket')
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if sendBufferSize is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sendBufferSize)
+    if receiveBufferSize is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receiveBufferSize)
+    c.transport = transport
+
+    clientID = _next_client_id[0]
+    _next_client_id[0] += 1
+    _clients[clientID] = c
+    return clientID
+
+
+async def simxFinish(clientID):
+    ids = list(_clients.keys()) if clientID == -1 else [clientID]
+    for i in ids:
+        c = _clients.pop(i, None)
+        if c is None:
+            continue
+        c.send(c.outbox + [proto.pack_command(proto.cmd_ids['simxFinish'], b'', b'')])
+        c.transport.close()
+
+
+async def simxGetLastCmdTime(clientID):
+    c = _clients.get(clientID)
+    return c.last_cmd_time if c is not None else 0
+
+
+async def simxPauseCommunication(clientID, enable):
+    c = _clients.get(clientID)
+    if c is None:
+        return simx_return_initialize_error_flag
+    c.paused = bool(enable)
+    if not c.paused and c.outbox:
+        c.send(c.outbox)
+        c.outbox = []
+    return simx_return_ok
+
+
+async def simxGetInMessageInfo(clientID, infoType):
+    c = _clients.get(clientID)
+    if c is None or c.in_header is None or infoType not in proto.header_fields:
+        return -1, 0
+    return 1, c.in_header[proto.header_fields[infoType]]
+
+
+async def simxGetOutMessageInfo(clientID, infoType):
+    c = _clients.get(clientID)
+    if c is None or not c.out_header or infoType not in proto.header_fields:
+        return -1, 0
+    return 1, c.out_header[proto.header_fields[infoType]]
+
+
+async def simxGetConnectionId(clientID):
+    c = _clients.get(clientID)
+    if c is None or not c.connected:
+        return -1
+    return c.connection_id
+
+
+# buffers and packing are plain memory, no need to await them
+simxCreateBuffer = pyvrep.simxCreateBuffer
+simxReleaseBuffer = pyvrep.simxReleaseBuffer
+simxPackInts = pyvrep.simxPackInts
+simxUnpackInts = pyvrep.simxUnpackInts
+simxPackFloats = pyvrep.simxPackFloats
+simxUnpackFloats = pyvrep.simxUnpackFloats
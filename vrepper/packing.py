@@ -0,0 +1,88 @@
+# simxPackInts / simxUnpackInts / simxPackFloats / simxUnpackFloats, shared by
+# vrep.py and pyvrep.py: little-endian int32 / float32 values in a byte string,
+# e.g. to ship trajectories or point clouds through string signals.
+#
+# pack_* take lists or NumPy arrays, unpack_* return NumPy arrays; the simx*
+# functions keep the remote API behaviour (bytearray, lists) on top of them.
+
+import struct
+
+import numpy as np
+
+_int32 = np.dtype('<i4')
+_float32 = np.dtype('<f4')
+_float32_max = float(np.finfo(np.float32).max)
+
+
+def pack_ints(values):
+    """
+    :param values: sequence or array of ints
+    :returns: bytes, 4 per value
+    :raises struct.error: for values that are not ints or don't fit in an int32, like struct.pack
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return b''
+    if values.dtype.kind not in 'biu':
+        raise struct.error('required argument is not an integer')
+    if values.dtype.itemsize > 4 or values.dtype == np.uint32:
+        if values.min() < -2 ** 31 or values.max() > 2 ** 31 - 1:
+            raise struct.error("'i' format requires -2147483648 <= number <= 2147483647")
+    return values.astype(_int32, copy=False).tobytes()
+
+
+def pack_floats(values):
+    """
+    :param values: sequence or array of floats
+    :returns: bytes, 4 per value
+    :raises struct.error: for values that are not numbers, like struct.pack
+    :raises OverflowError: for finite values too large for a float32, like struct.pack
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return b''
+    if values.dtype.kind not in 'biuf':
+        raise struct.error('required argument is not a float')
+    if values.dtype.kind == 'f' and values.dtype.itemsize > 4:
+        finite = values[np.isfinite(values)]
+        if finite.size and np.abs(finite).max() > _float32_max:
+            raise OverflowError('float too large to pack with f format')
+    return values.astype(_float32, copy=False).tobytes()
+
+
+def _values(packed, dtype):
+    # trailing bytes that don't make a whole value are ignored, like the remote API does
+    n = len(packed) // dtype.itemsize
+    return np.frombuffer(packed, dtype, n)
+
+
+def unpack_ints(packed):
+    """
+    :param packed: bytes-like, 4 per value
+    :returns: int32 array (a view of packed)
+    """
+    return _values(packed, _int32)
+
+
+def unpack_floats(packed):
+    """
+    :param packed: bytes-like, 4 per value
+    :returns: float32 array (a view of packed)
+    """
+    return _values(packed, _float32)
+
+
+def simxPackInts(intList):
+    return bytearray(pack_ints(intList))
+
+
+def simxUnpackInts(intsPackedInString):
+    return unpack_ints(intsPackedInString).tolist()
+
+
+def simxPackFloats(floatList):
+    return bytearray(pack_floats(floatList))
+
+
+def simxUnpackFloats(floatsPackedInString):
+    return unpack_floats(floatsPackedInString).tolist()
@@ -0,0 +1,687 @@
+# Pure-Python remote API client, with the same call surface as vrep.py.
+#
+# It talks to vrepper.standin (see simxproto for the framing), so everything
+# above vrep.py can run without V-REP or the remoteApi library installed.
+# There is no communication thread: incoming data is only read when a
+# function is called. Blocking calls wait on the socket directly, or, with a
+# commThreadCycleInMs > 0, check it once per cycle like the remoteApi's thread.
+#
+# Functions that vrepper never needed (UI, dialogs, consoles, ...) are not implemented.
+
+import array
+import functools
+import inspect
+import select
+import socket
+import sys
+import time
+
+from . import simxproto as proto
+from .packing import simxPackInts, simxUnpackInts, simxPackFloats, simxUnpackFloats
+from .vrepConst import *
+
+_clients = {}
+_next_client_id = [0]
+_next_connection_id = [0]
+
+# default timeout of blocking calls, same as the remoteApi library
+_REPLY_WAIT_TIMEOUT_IN_MS = 5000
+
+
+def _now_ms():
+    return int(time.time() * 1000) & 0x7fffffff
+
+
+class _client(object):
+    def __init__(self, sock, timeout, cycle=0.):
+        self.sock = sock
+        self.timeout = timeout
+        self.cycle = cycle
+        self.connection_id = _next_connection_id[0]
+        _next_connection_id[0] += 1
+        self.connected = True
+
+        self.message_id = 0
+        self.received = bytearray()
+
+        # replies by (command id, identification), as (status, data, sim_time)
+        self.inbox = {}
+        # streaming commands sent to the server, by (command id, identification)
+        self.streams = {}
+
+        self.paused = False
+        self.outbox = []
+
+        self.in_header = None
+        self.out_header = {}
+        self.last_cmd_time = 0
+
+    def send(self, commands):
+        self.message_id += 1
+        client_time = _now_ms()
+        message = proto.pack_message(commands, message_id=self.message_id, client_time=client_time)
+        self.out_header = {'version': SIMX_VERSION, 'message_id': self.message_id, 'client_time': client_time,
+                           'server_time': 0, 'scene_id': 0, 'server_state': 0}
+        try:
+            proto.send_message(self.sock, message)
+        except socket.error:
+            self.connected = False
+
+    def receive(self, timeout):
+        # read whatever is on the socket (waiting at most timeout seconds), return True if something came in
+        if not self.connected:
+            return False
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            chunk = self.sock.recv(1 << 20)
+        except socket.error:
+            chunk = b''
+        if not chunk:
+            self.connected = False
+            return False
+        self.received += chunk
+        for message in proto.split_messages(self.received):
+            self.process(message)
+        return True
+
+    def drain(self):
+        while self.receive(0):
+            pass
+
+    def process(self, message):
+        header, commands = proto.unpack_message(message)
+        self.in_header = header
+        for cmd, ident, data, sim_time, status in commands:
+            self.inbox[(cmd & proto.CMD_MASK, ident)] = (status, data, sim_time)
+            self.last_cmd_time = sim_time
+
+    def wait_for(self, key):
+        deadline = time.time() + self.timeout
+        while key not in self.inbox:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self.connected:
+                return None
+            if self.cycle > 0:
+                time.sleep(min(self.cycle, remaining))
+                self.drain()
+            else:
+                self.receive(remaining)
+        return self.inbox.pop(key)
+
+
+def _decode(out_codes, reply):
+    status, data, _ = reply
+    if status & proto.STATUS_ERROR:
+        return simx_return_remote_error_flag, None
+    return simx_return_ok, proto.unpack_fields(out_codes, data)
+
+
+def _start(c, name, ident, inputs, operationMode):
+    # one command in the given operation mode, up to waiting for its reply (shared with aiovrep):
+    # returns (None, result), or (key, None) for a blocking command whose reply has to be waited for
+    ident_codes, in_codes, out_codes = proto.cmd_fields[name]
+    cmd_id = proto.cmd_ids[name]
+    ident = proto.pack_fields(ident_codes, ident)
+    key = (cmd_id, ident)
+    mode = operationMode & proto.OPMODE_MASK
+
+    if mode == simx_opmode_buffer:
+        c.drain()
+        if key not in c.inbox:
+            return None, (simx_return_novalue_flag, None)
+        return None, _decode(out_codes, c.inbox[key])
+
+    if mode == simx_opmode_remove:
+        c.inbox.pop(key, None)
+        return None, (simx_return_ok, None)
+
+    command = proto.pack_command(cmd_id | mode, ident, proto.pack_fields(in_codes, inputs))
+
+    if mode == simx_opmode_blocking:
+        c.inbox.pop(key, None)
+        c.send(c.outbox + [command])
+        c.outbox = []
+        return key, None
+
+    if mode == simx_opmode_discontinue:
+        c.streams.pop(key, None)
+        c.inbox.pop(key, None)
+    elif mode == simx_opmode_streaming:
+        if c.streams.get(key) == command:
+            command = None
+        else:
+            c.streams[key] = command
+
+    if command is not None:
+        if c.paused:
+            c.outbox.append(command)
+        else:
+            c.send([command])
+
+    c.drain()
+    if key not in c.inbox:
+        return None, (simx_return_novalue_flag, None)
+    return None, _decode(out_codes, c.inbox[key])
+
+
+def _result(name, reply):
+    # result of a blocking command from its reply, None if it timed out
+    if reply is None:
+        return simx_return_timeout_flag, None
+    return _decode(proto.cmd_fields[name][2], reply)
+
+
+def _call(clientID, name, ident, inputs, operationMode):
+    """
+    Run one command in the given operation mode.
+
+    :returns: tuple (ret, outputs), outputs is None when no value is available
+    """
+    c = _clients.get(clientID)
+    if c is None:
+        return simx_return_initialize_error_flag, None
+    key, result = _start(c, name, ident, inputs, operationMode)
+    if key is None:
+        return result
+    return _result(name, c.wait_for(key))
+
+
+def _command(func):
+    # API function out of a generator function that yields the arguments of _call once
+    # and gets its result back. aiovrep runs the same generators over asyncio.
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        return _drive(func(*args, **kwargs), _call)
+
+    call.generator = func
+    # vrepper reads the argument names
+    call.__signature__ = inspect.signature(func)
+    return call
+
+
+def _drive(generator, call):
+    result = None
+    try:
+        while True:
+            result = call(*generator.send(result))
+    except StopIteration as e:
+        return e.value
+
+
+def _encode(s):
+    if (sys.version_info[0] == 3) and (type(s) is str):
+        s = s.encode('utf-8')
+    return s
+
+
+# API functions
+
+@_command
+def simxGetJointPosition(clientID, jointHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetJointPosition', (jointHandle,), (), operationMode)
+    return ret, out[0] if out else 0.
+
+
+@_command
+def simxSetJointPosition(clientID, jointHandle, position, operationMode):
+    return (yield clientID, 'simxSetJointPosition', (jointHandle,), (position,), operationMode)[0]
+
+
+@_command
+def simxGetJointMatrix(clientID, jointHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetJointMatrix', (jointHandle,), (), operationMode)
+    return ret, out[0] if out else [0.] * 12
+
+
+@_command
+def simxSetJointTargetVelocity(clientID, jointHandle, targetVelocity, operationMode):
+    return (yield clientID, 'simxSetJointTargetVelocity', (jointHandle,), (targetVelocity,), operationMode)[0]
+
+
+@_command
+def simxSetJointTargetPosition(clientID, jointHandle, targetPosition, operationMode):
+    return (yield clientID, 'simxSetJointTargetPosition', (jointHandle,), (targetPosition,), operationMode)[0]
+
+
+@_command
+def simxGetJointForce(clientID, jointHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetJointForce', (jointHandle,), (), operationMode)
+    return ret, out[0] if out else 0.
+
+
+@_command
+def simxJointGetForce(clientID, jointHandle, operationMode):
+    return (yield from simxGetJointForce.generator(clientID, jointHandle, operationMode))
+
+
+@_command
+def simxSetJointForce(clientID, jointHandle, force, operationMode):
+    return (yield clientID, 'simxSetJointForce', (jointHandle,), (force,), operationMode)[0]
+
+
+@_command
+def simxReadForceSensor(clientID, forceSensorHandle, operationMode):
+    ret, out = (yield clientID, 'simxReadForceSensor', (forceSensorHandle,), (), operationMode)
+    if out is None:
+        return ret, 0, [0.] * 3, [0.] * 3
+    return ret, out[0], out[1], out[2]
+
+
+@_command
+def simxGetObjectHandle(clientID, objectName, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectHandle', (_encode(objectName),), (), operationMode)
+    return ret, out[0] if out else 0
+
+
+@_command
+def simxGetVisionSensorImage(clientID, sensorHandle, options, operationMode):
+    ret, out = (yield clientID, 'simxGetVisionSensorImage', (sensorHandle, options), (), operationMode)
+    if out is None:
+        return ret, [], []
+    # signed bytes, like the c_byte buffer of the remoteApi library
+    return ret, out[0], array.array('b', out[1]).tolist()
+
+
+@_command
+def _vision_sensor_image(clientID, sensorHandle, options, operationMode):
+    # simxGetVisionSensorImage with the image as bytes of unsigned bytes (for vrepper.camerarig)
+    ret, out = (yield clientID, 'simxGetVisionSensorImage', (sensorHandle, options), (), operationMode)
+    if out is None:
+        return ret, [], b''
+    return ret, out[0], out[1]
+
+
+@_command
+def simxSetVisionSensorImage(clientID, sensorHandle, image, options, operationMode):
+    if isinstance(image, (list, tuple)):
+        # signed bytes, as simxGetVisionSensorImage returns them
+        image = array.array('b', image).tobytes()
+    elif memoryview(image).itemsize != 1:
+        raise TypeError('image buffers must have one byte per value, not {} (convert to uint8)'.format(
+            memoryview(image).itemsize))
+    return (yield clientID, 'simxSetVisionSensorImage', (sensorHandle, options), (image,), operationMode)[0]
+
+
+@_command
+def simxGetVisionSensorDepthBuffer(clientID, sensorHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetVisionSensorDepthBuffer', (sensorHandle,), (), operationMode)
+    if out is None:
+        return ret, [], []
+    return ret, out[0], out[1]
+
+
+@_command
+def simxGetObjectChild(clientID, parentObjectHandle, childIndex, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectChild', (parentObjectHandle, childIndex), (), operationMode)
+    return ret, out[0] if out else 0
+
+
+@_command
+def simxGetObjectParent(clientID, childObjectHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectParent', (childObjectHandle,), (), operationMode)
+    return ret, out[0] if out else 0
+
+
+@_command
+def simxReadProximitySensor(clientID, sensorHandle, operationMode):
+    ret, out = (yield clientID, 'simxReadProximitySensor', (sensorHandle,), (), operationMode)
+    if out is None:
+        return ret, False, [0.] * 3, 0, [0.] * 3
+    return ret, bool(out[0] != 0), out[1], out[2], out[3]
+
+
+@_command
+def simxLoadScene(clientID, scenePathAndName, options, operationMode):
+    return (yield clientID, 'simxLoadScene', (_encode(scenePathAndName),), (options,), operationMode)[0]
+
+
+@_command
+def simxStartSimulation(clientID, operationMode):
+    return (yield clientID, 'simxStartSimulation', (), (), operationMode)[0]
+
+
+@_command
+def simxPauseSimulation(clientID, operationMode):
+    return (yield clientID, 'simxPauseSimulation', (), (), operationMode)[0]
+
+
+@_command
+def simxStopSimulation(clientID, operationMode):
+    return (yield clientID, 'simxStopSimulation', (), (), operationMode)[0]
+
+
+@_command
+def simxAddStatusbarMessage(clientID, message, operationMode):
+    return (yield clientID, 'simxAddStatusbarMessage', (), (_encode(message),), operationMode)[0]
+
+
+@_command
+def simxGetObjectOrientation(clientID, objectHandle, relativeToObjectHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectOrientation', (objectHandle, relativeToObjectHandle), (),
+                     operationMode)
+    return ret, out[0] if out else [0.] * 3
+
+
+@_command
+def simxGetObjectPosition(clientID, objectHandle, relativeToObjectHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectPosition', (objectHandle, relativeToObjectHandle), (), operationMode)
+    return ret, out[0] if out else [0.] * 3
+
+
+@_command
+def simxSetObjectOrientation(clientID, objectHandle, relativeToObjectHandle, eulerAngles, operationMode):
+    return (yield clientID, 'simxSetObjectOrientation', (objectHandle, relativeToObjectHandle),
+                 (list(eulerAngles),), operationMode)[0]
+
+
+@_command
+def simxSetObjectPosition(clientID, objectHandle, relativeToObjectHandle, position, operationMode):
+    return (yield clientID, 'simxSetObjectPosition', (objectHandle, relativeToObjectHandle),
+                 (list(position),), operationMode)[0]
+
+
+@_command
+def simxSetObjectParent(clientID, objectHandle, parentObject, keepInPlace, operationMode):
+    return (yield clientID, 'simxSetObjectParent', (objectHandle,), (parentObject, keepInPlace), operationMode)[0]
+
+
+@_command
+def simxGetArrayParameter(clientID, paramIdentifier, operationMode):
+    ret, out = (yield clientID, 'simxGetArrayParameter', (paramIdentifier,), (), operationMode)
+    return ret, out[0] if out else [0.] * 3
+
+
+@_command
+def simxSetArrayParameter(clientID, paramIdentifier, paramValues, operationMode):
+    return (yield clientID, 'simxSetArrayParameter', (paramIdentifier,), (list(paramValues),), operationMode)[0]
+
+
+@_command
+def simxGetBooleanParameter(clientID, paramIdentifier, operationMode):
+    ret, out = (yield clientID, 'simxGetBooleanParameter', (paramIdentifier,), (), operationMode)
+    return ret, bool(out[0] != 0) if out else False
+
+
+@_command
+def simxSetBooleanParameter(clientID, paramIdentifier, paramValue, operationMode):
+    return (yield clientID, 'simxSetBooleanParameter', (paramIdentifier,), (int(paramValue),), operationMode)[0]
+
+
+@_command
+def simxGetIntegerParameter(clientID, paramIdentifier, operationMode):
+    ret, out = (yield clientID, 'simxGetIntegerParameter', (paramIdentifier,), (), operationMode)
+    return ret, out[0] if out else 0
+
+
+@_command
+def simxSetIntegerParameter(clientID, paramIdentifier, paramValue, operationMode):
+    return (yield clientID, 'simxSetIntegerParameter', (paramIdentifier,), (paramValue,), operationMode)[0]
+
+
+@_command
+def simxGetFloatingParameter(clientID, paramIdentifier, operationMode):
+    ret, out = (yield clientID, 'simxGetFloatingParameter', (paramIdentifier,), (), operationMode)
+    return ret, out[0] if out else 0.
+
+
+@_command
+def simxSetFloatingParameter(clientID, paramIdentifier, paramValue, operationMode):
+    return (yield clientID, 'simxSetFloatingParameter', (paramIdentifier,), (paramValue,), operationMode)[0]
+
+
+@_command
+def simxGetStringParameter(clientID, paramIdentifier, operationMode):
+    ret, out = (yield clientID, 'simxGetStringParameter', (paramIdentifier,), (), operationMode)
+    return ret, out[0].decode('utf-8') if out else ''
+
+
+@_command
+def simxRemoveObject(clientID, objectHandle, operationMode):
+    return (yield clientID, 'simxRemoveObject', (objectHandle,), (), operationMode)[0]
+
+
+@_command
+def simxCloseScene(clientID, operationMode):
+    return (yield clientID, 'simxCloseScene', (), (), operationMode)[0]
+
+
+@_command
+def simxGetObjects(clientID, objectType, operationMode):
+    ret, out = (yield clientID, 'simxGetObjects', (objectType,), (), operationMode)
+    return ret, out[0] if out else []
+
+
+@_command
+def simxClearFloatSignal(clientID, signalName, operationMode):
+    return (yield clientID, 'simxClearFloatSignal', (_encode(signalName),), (), operationMode)[0]
+
+
+@_command
+def simxClearIntegerSignal(clientID, signalName, operationMode):
+    return (yield clientID, 'simxClearIntegerSignal', (_encode(signalName),), (), operationMode)[0]
+
+
+@_command
+def simxClearStringSignal(clientID, signalName, operationMode):
+    return (yield clientID, 'simxClearStringSignal', (_encode(signalName),), (), operationMode)[0]
+
+
+@_command
+def simxGetFloatSignal(clientID, signalName, operationMode):
+    ret, out = (yield clientID, 'simxGetFloatSignal', (_encode(signalName),), (), operationMode)
+    return ret, out[0] if out else 0.
+
+
+@_command
+def simxGetIntegerSignal(clientID, signalName, operationMode):
+    ret, out = (yield clientID, 'simxGetIntegerSignal', (_encode(signalName),), (), operationMode)
+    return ret, out[0] if out else 0
+
+
+@_command
+def simxGetStringSignal(clientID, signalName, operationMode):
+    ret, out = (yield clientID, 'simxGetStringSignal', (_encode(signalName),), (), operationMode)
+    return ret, bytearray(out[0]) if out else bytearray()
+
+
+@_command
+def simxGetAndClearStringSignal(clientID, signalName, operationMode):
+    ret, out = (yield clientID, 'simxGetAndClearStringSignal', (_encode(signalName),), (), operationMode)
+    return ret, bytearray(out[0]) if out else bytearray()
+
+
+@_command
+def simxReadStringStream(clientID, signalName, operationMode):
+    ret, out = (yield clientID, 'simxReadStringStream', (_encode(signalName),), (), operationMode)
+    return ret, bytearray(out[0]) if out else bytearray()
+
+
+@_command
+def simxSetFloatSignal(clientID, signalName, signalValue, operationMode):
+    return (yield clientID, 'simxSetFloatSignal', (_encode(signalName),), (signalValue,), operationMode)[0]
+
+
+@_command
+def simxSetIntegerSignal(clientID, signalName, signalValue, operationMode):
+    return (yield clientID, 'simxSetIntegerSignal', (_encode(signalName),), (signalValue,), operationMode)[0]
+
+
+@_command
+def simxSetStringSignal(clientID, signalName, signalValue, operationMode):
+    return (yield clientID, 'simxSetStringSignal', (_encode(signalName),), (_encode(signalValue),),
+                 operationMode)[0]
+
+
+@_command
+def simxAppendStringSignal(clientID, signalName, signalValue, operationMode):
+    return (yield clientID, 'simxAppendStringSignal', (_encode(signalName),), (_encode(signalValue),),
+                 operationMode)[0]
+
+
+@_command
+def simxWriteStringStream(clientID, signalName, signalValue, operationMode):
+    return (yield clientID, 'simxWriteStringStream', (_encode(signalName),), (_encode(signalValue),),
+                 operationMode)[0]
+
+
+@_command
+def simxGetObjectFloatParameter(clientID, objectHandle, parameterID, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectFloatParameter', (objectHandle, parameterID), (), operationMode)
+    return ret, out[0] if out else 0.
+
+
+@_command
+def simxSetObjectFloatParameter(clientID, objectHandle, parameterID, parameterValue, operationMode):
+    return (yield clientID, 'simxSetObjectFloatParameter', (objectHandle, parameterID), (parameterValue,),
+                 operationMode)[0]
+
+
+@_command
+def simxGetObjectIntParameter(clientID, objectHandle, parameterID, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectIntParameter', (objectHandle, parameterID), (), operationMode)
+    return ret, out[0] if out else 0
+
+
+@_command
+def simxSetObjectIntParameter(clientID, objectHandle, parameterID, parameterValue, operationMode):
+    return (yield clientID, 'simxSetObjectIntParameter', (objectHandle, parameterID), (parameterValue,),
+                 operationMode)[0]
+
+
+@_command
+def simxGetObjectGroupData(clientID, objectType, dataType, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectGroupData', (objectType, dataType), (), operationMode)
+    if out is None:
+        return ret, [], [], [], []
+    return ret, out[0], out[1], out[2], out[3]
+
+
+@_command
+def simxGetObjectVelocity(clientID, objectHandle, operationMode):
+    ret, out = (yield clientID, 'simxGetObjectVelocity', (objectHandle,), (), operationMode)
+    if out is None:
+        return ret, [0.] * 3, [0.] * 3
+    return ret, out[0], out[1]
+
+
+@_command
+def simxCallScriptFunction(clientID, scriptDescription, options, functionName, inputInts, inputFloats,
+                           inputStrings, inputBuffer, operationMode):
+    ret, out = (yield clientID, 'simxCallScriptFunction',
+                     (_encode(scriptDescription), options, _encode(functionName)),
+                     (list(inputInts), list(inputFloats), list(inputStrings), _encode(inputBuffer)),
+                     operationMode)
+    if out is None:
+        return ret, [], [], [], bytearray()
+    return ret, out[0], out[1], out[2], bytearray(out[3])
+
+
+def simxStart(connectionAddress, connectionPort, waitUntilConnected, doNotReconnectOnceDisconnected, timeOutInMs,
+              commThreadCycleInMs):
+    # like the remoteApi library: a negative timeOutInMs is the timeout of blocking calls
+    # (the connection timeout is then 5 s), a positive one is the connection timeout.
+    if timeOutInMs < 0:
+        connect_timeout, reply_timeout = 5000, -timeOutInMs
+    else:
+        connect_timeout, reply_timeout = timeOutInMs, _REPLY_WAIT_TIMEOUT_IN_MS
+    if isinstance(connectionAddress, bytes):
+        connectionAddress = connectionAddress.decode('utf-8')
+    # keep trying until the timeout if we were asked to wait (the server may still be starting up)
+    deadline = time.time() + connect_timeout / 1000.
+    while True:
+        try:
+            sock = socket.create_connection((connectionAddress, connectionPort), connect_timeout / 1000.)
+            break
+        except socket.error:
+            if not waitUntilConnected or time.time() >= deadline:
+                return -1
+            time.sleep(0.01)
+    sock.settimeout(None)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    clientID = _next_client_id[0]
+    _next_client_id[0] += 1
+    _clients[clientID] = _client(sock, reply_timeout / 1000., commThreadCycleInMs / 1000.)
+    return clientID
+
+
+def simxFinish(clientID):
+    ids = list(_clients.keys()) if clientID == -1 else [clientID]
+    for i in ids:
+        c = _clients.pop(i, None)
+        if c is None:
+            continue
+        c.send(c.outbox + [proto.pack_command(proto.cmd_ids['simxFinish'], b'', b'')])
+        c.sock.close()
+
+
+@_command
+def simxGetPingTime(clientID):
+    t = time.time()
+    ret, _ = (yield clientID, 'simxGetPingTime', (), (), simx_opmode_blocking)
+    return ret, int((time.time() - t) * 1000)
+
+
+def simxGetLastCmdTime(clientID):
+    c = _clients.get(clientID)
+    return c.last_cmd_time if c is not None else 0
+
+
+@_command
+def simxSynchronousTrigger(clientID):
+    return (yield clientID, 'simxSynchronousTrigger', (), (), simx_opmode_blocking)[0]
+
+
+@_command
+def simxSynchronous(clientID, enable):
+    return (yield clientID, 'simxSynchronous', (), (int(enable),), simx_opmode_blocking)[0]
+
+
+def simxPauseCommunication(clientID, enable):
+    c = _clients.get(clientID)
+    if c is None:
+        return simx_return_initialize_error_flag
+    c.paused = bool(enable)
+    if not c.paused and c.outbox:
+        c.send(c.outbox)
+        c.outbox = []
+    return simx_return_ok
+
+
+def simxGetInMessageInfo(clientID, infoType):
+    c = _clients.get(clientID)
+    if c is None or c.in_header is None or infoType not in proto.header_fields:
+        return -1, 0
+    return 1, c.in_header[proto.header_fields[infoType]]
+
+
+def simxGetOutMessageInfo(clientID, infoType):
+    c = _clients.get(clientID)
+    if c is None or not c.out_header or infoType not in proto.header_fields:
+        return -1, 0
+    return 1, c.out_header[proto.header_fields[infoType]]
+
+
+def simxGetConnectionId(clientID):
+    c = _clients.get(clientID)
+    if c is None or not c.connected:
+        return -1
+    return c.connection_id
+
+
+def _inbox_stats(clientID):
+    # (number of replies stored, their size in bytes), for vrepper.inbox_stats
+    c = _clients.get(clientID)
+    if c is None:
+        return 0, 0
+    return len(c.inbox), sum(len(data) for _, data, _ in c.inbox.values())
+
+
+def simxCreateBuffer(bufferSize):
+    return bytearray(bufferSize)
+
+
+def simxReleaseBuffer(buffer):
+    pass
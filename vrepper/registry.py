@@ -0,0 +1,241 @@
+# Registry of the V-REP instances started on this machine, so that the ones
+# leaked by a crashed (or SIGKILLed) session can be found and killed later, and
+# so that instances pinned by different processes spread over the cores.
+#
+# Every instance runs in its own process group. The registry is a JSON file
+# (VREPPER_REGISTRY, default <tmp>/vrepper-<uid>.json) mapping the group id to
+# the port, the command line, the cores it is pinned to and the owning python process. An entry whose owner
+# is gone is an orphan: reap_orphans() kills its process group. vrepper does it
+# before starting its first instance; it can also be run by hand:
+#   $ python -m vrepper.registry list
+#   $ python -m vrepper.registry reap
+#
+# Process ids are recycled, so owner and group leader are recorded with their
+# start time, and an entry is only acted upon if they still match. POSIX only,
+# elsewhere every function is a no-op.
+#
+# A core is reserved when it is chosen, with a placeholder entry (keyed
+# 'reserved-<owner pid>-<n>', counted as long as its owner lives) that register()
+# replaces once the instance runs: instances started at the same moment by
+# different processes see each other's choice.
+
+import argparse
+import itertools
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+RESERVED = 'reserved-'
+_reservations = itertools.count()
+
+
+def registry_path():
+    return os.environ.get('VREPPER_REGISTRY') or os.path.join(
+        tempfile.gettempdir(), 'vrepper-{}.json'.format(os.getuid()))
+
+
+def _start_time(pid):
+    # start time of a process in clock ticks since boot, None if it doesn't exist
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+
+
+def _exists(pid, start_time):
+    # is pid still the process that was recorded?
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return start_time is None or _start_time(pid) in (None, start_time)
+
+
+def _group_exists(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _update(func):
+    # func(entries) under an exclusive lock, entries by str(pgid), saved afterwards
+    if fcntl is None:
+        return None
+    fd = os.open(registry_path(), os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, 'r+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            entries = json.loads(f.read() or '{}')
+        except ValueError:
+            entries = {}
+        result = func(entries)
+        f.seek(0)
+        f.truncate()
+        json.dump(entries, f, indent=1, sort_keys=True)
+        return result
+
+
+def _is_reservation(key):
+    return key.startswith(RESERVED)
+
+
+def register(pgid, port=None, args=(), cpus=None, reservation=None):
+    """
+    :param str reservation: placeholder entry of reserve_core() this instance replaces
+    """
+    def add(entries):
+        if reservation is not None:
+            entries.pop(reservation, None)
+        entries[str(pgid)] = {'port': port, 'args': list(args), 'leader_start': _start_time(pgid),
+                              'cpus': list(cpus) if cpus is not None else None,
+                              'owner': os.getpid(), 'owner_start': _start_time(os.getpid()),
+                              'started': time.time()}
+
+    _update(add)
+
+
+def unregister(pgid):
+    """
+    :param pgid: process group id, or the key of a reservation
+    """
+    _update(lambda entries: entries.pop(str(pgid), None))
+
+
+def _least_used(entries, cores):
+    used = dict((c, 0) for c in cores)
+    for key, e in entries.items():
+        if _is_reservation(key):
+            if not _exists(e['owner'], e.get('owner_start')):
+                continue
+        elif not _group_exists(int(key)):
+            continue
+        for c in e.get('cpus') or ():
+            if c in used:
+                used[c] += 1
+    return min(cores, key=lambda c: used[c])
+
+
+def least_used_core(cores):
+    """
+    :param list cores: cores to choose from
+    :returns: the one the fewest running (or reserved) instances of the registry are pinned to,
+        whichever process started them, the first one of the least used
+    """
+    cores = list(cores)
+    core = _update(lambda entries: _least_used(entries, cores))
+    return cores[0] if core is None else core
+
+
+def reserve_core(cores):
+    """
+    least_used_core(), counted as used right away (under the same lock), until
+    register() is given the reservation or unregister() drops it.
+
+    :returns: tuple (core, reservation key), the key is None where there is no registry
+    """
+    cores = list(cores)
+    key = '{}{}-{}'.format(RESERVED, os.getpid(), next(_reservations))
+
+    def reserve(entries):
+        core = _least_used(entries, cores)
+        entries[key] = {'cpus': [core], 'owner': os.getpid(), 'owner_start': _start_time(os.getpid()),
+                        'started': time.time()}
+        return core
+
+    core = _update(reserve)
+    if core is None:
+        return cores[0], None
+    return core, key
+
+
+def instances():
+    """
+    :returns: dict of process group id -> entry of the registry
+    """
+    return dict((int(k), v) for k, v in (_update(dict) or {}).items() if not _is_reservation(k))
+
+
+def kill_group(pgid, timeout=5., leader=None):
+    """
+    SIGTERM a process group, then SIGKILL what is left of it after timeout seconds.
+
+    :param leader: subprocess.Popen of the group leader if it is our child, to reap it
+    :returns: True if the group is gone
+    """
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return True
+    deadline = time.time() + timeout
+    while (leader is not None and leader.poll() is None) or _group_exists(pgid):
+        if time.time() > deadline:
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            time.sleep(0.05)
+            return not _group_exists(pgid)
+        time.sleep(0.01)
+    return True
+
+
+def reap_orphans(timeout=5.):
+    """
+    Kill the instances whose owning process is gone, and drop stale entries.
+
+    :returns: list of (pgid, port) of the instances killed
+    """
+    def reap(entries):
+        killed = []
+        for key, e in list(entries.items()):
+            if _exists(e['owner'], e.get('owner_start')):
+                continue
+            del entries[key]
+            if _is_reservation(key):
+                continue
+            pgid = int(key)
+            # a group id is not recycled while the group has members: if the leader's pid
+            # now belongs to another process, the group is long gone
+            if _start_time(pgid) not in (None, e.get('leader_start')) or not _group_exists(pgid):
+                continue
+            kill_group(pgid, timeout)
+            killed.append((pgid, e.get('port')))
+        return killed
+
+    killed = _update(reap) or []
+    for pgid, port in killed:
+        print('(registry) killed orphaned instance, process group', pgid, 'port', port)
+    return killed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='V-REP instances started by vrepper on this machine')
+    parser.add_argument('command', choices=['list', 'reap'])
+    args = parser.parse_args(argv)
+    if args.command == 'list':
+        print('(registry)', registry_path())
+        for pgid, e in sorted(instances().items()):
+            owner = 'alive' if _exists(e['owner'], e.get('owner_start')) else 'gone'
+            print('{:>8} port {} owner {} ({}) {}'.format(pgid, e.get('port'), e['owner'], owner, ' '.join(e['args'])))
+    else:
+        reap_orphans()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
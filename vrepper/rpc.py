@@ -0,0 +1,143 @@
+# Typed calls to script functions, with NumPy arrays packed in the buffer argument
+# of simxCallScriptFunction instead of going through the int/float/string lists.
+#
+#   find_path = env.remote_function('findPath', args=['float32', 'int32'], returns=[('float32', (-1, 6))])
+#   path = find_path(goal_pose, [robot, 300])      # np.ndarray of shape (n, 6)
+#
+# On the V-REP side, load vrepper_rpc.lua (LUA_HELPER) in the script and wrap the
+# function: it gets and returns arrays (see the comments of vrepper_rpc.lua).
+#
+# Buffer layout, everything little-endian: int32 number of arrays, then for each
+# array int32 type (UINT8, INT32, FLOAT32, FLOAT64), int32 ndim, ndim int32
+# dimensions, and the values in C order. No padding.
+
+import os
+import struct
+import weakref
+
+import numpy as np
+
+LUA_HELPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vrepper_rpc.lua')
+
+UINT8 = 0
+INT32 = 1
+FLOAT32 = 2
+FLOAT64 = 3
+
+dtypes = {
+    UINT8: np.dtype('<u1'),
+    INT32: np.dtype('<i4'),
+    FLOAT32: np.dtype('<f4'),
+    FLOAT64: np.dtype('<f8'),
+}
+codes = dict((dtype, code) for code, dtype in dtypes.items())
+
+_int32 = struct.Struct('<i')
+_head = struct.Struct('<ii')
+
+
+def pack_arrays(arrays):
+    """
+    :param list arrays: arrays of uint8, int32, float32 or float64
+    :returns: bytes
+    """
+    parts = [_int32.pack(len(arrays))]
+    for a in arrays:
+        a = np.asarray(a)
+        dtype = a.dtype.newbyteorder('<') if a.dtype.byteorder == '>' else a.dtype
+        if dtype not in codes:
+            raise ValueError('(rpc) cannot send arrays of {}, use uint8, int32, float32 or float64'.format(a.dtype))
+        parts.append(struct.pack('<{}i'.format(a.ndim + 2), codes[dtype], a.ndim, *a.shape))
+        parts.append(np.ascontiguousarray(a, dtype).tobytes())
+    return b''.join(parts)
+
+
+def unpack_arrays(buf):
+    """
+    :param buf: bytes-like, as made by pack_arrays
+    :returns: list of arrays, views of buf
+    """
+    try:
+        count, = _int32.unpack_from(buf)
+        offset = 4
+        arrays = []
+        for _ in range(count):
+            code, ndim = _head.unpack_from(buf, offset)
+            shape = struct.unpack_from('<{}i'.format(ndim), buf, offset + 8)
+            offset += 8 + 4 * ndim
+            dtype = dtypes[code]
+            n = 1
+            for d in shape:
+                n *= d
+            arrays.append(np.frombuffer(buf, dtype, n, offset).reshape(shape))
+            offset += n * dtype.itemsize
+    except (struct.error, KeyError, ValueError):
+        raise ValueError('(rpc) malformed buffer')
+    return arrays
+
+
+class remote_function(object):
+    # only a weak reference to the vrepper, like vrepobject
+    __slots__ = ('_env', 'name', 'args', 'returns', 'script_name', 'lanes')
+
+    def __init__(self, env, name, args=(), returns=(), script_name='remoteApiCommandServer', lanes=1):
+        """
+        :param str name: name of the function in the script
+        :param list args: dtype of each argument ('int32', 'float32', ...)
+        :param list returns: dtype of each result, or (dtype, shape) to reshape it (-1 allowed)
+        :param int lanes: calls of call_async in flight at once (see vrepper.call_script_function_async)
+        """
+        self._env = weakref.ref(env)
+        self.name = name
+        self.args = [np.dtype(a).newbyteorder('<') for a in args]
+        self.returns = [(np.dtype(r), None) if not isinstance(r, tuple) else (np.dtype(r[0]), r[1])
+                        for r in returns]
+        for dtype in self.args + [r[0].newbyteorder('<') for r in self.returns]:
+            if dtype not in codes:
+                raise ValueError('(rpc) {}: {} is not uint8, int32, float32 or float64'.format(name, dtype))
+        self.script_name = script_name
+        self.lanes = lanes
+
+    @property
+    def env(self):
+        env = self._env()
+        if env is None:
+            raise RuntimeError('(rpc) the vrepper of {} no longer exists'.format(self.name))
+        return env
+
+    def __call__(self, *args):
+        """
+        :returns: the result array, a tuple of them if several are declared, None if none
+        """
+        return self._results(self.env.call_script_function(self.name, self._params(args), self.script_name))
+
+    def call_async(self, *args):
+        """
+        Send the call without waiting for the reply (see vrepper.call_script_function_async).
+
+        :returns: script_future, whose result() is what calling the function returns
+        """
+        return self.env.call_script_function_async(self.name, self._params(args), self.script_name,
+                                                   self._results, self.lanes)
+
+    def _params(self, args):
+        if len(args) != len(self.args):
+            raise ValueError('(rpc) {} takes {} arguments, {} given'.format(self.name, len(self.args), len(args)))
+        return [], [], [], pack_arrays([np.asarray(a, dtype) for a, dtype in zip(args, self.args)])
+
+    def _results(self, ret):
+        _, _, _, out = ret
+        results = unpack_arrays(out) if self.returns else []
+        if len(results) != len(self.returns):
+            raise RuntimeError('(rpc) {} returned {} arrays instead of {}'.format(
+                self.name, len(results), len(self.returns)))
+        results = [r.astype(dtype, copy=False) if shape is None else r.astype(dtype, copy=False).reshape(shape)
+                   for r, (dtype, shape) in zip(results, self.returns)]
+        if not results:
+            return None
+        return results[0] if len(results) == 1 else tuple(results)
+
+    def __repr__(self):
+        return 'remote_function({}.{}({}) -> ({}))'.format(
+            self.script_name, self.name, ', '.join(str(a) for a in self.args),
+            ', '.join(str(r[0]) for r in self.returns))
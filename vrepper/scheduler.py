@@ -0,0 +1,448 @@
+# Run vrepper instances on several machines.
+#
+# An agent runs on every node and starts / stops V-REP instances there:
+#   $ export VREPPER_AGENT_TOKEN=...   # the same on every node and where the scheduler runs
+#   $ python -m vrepper.scheduler agent --port 19900 --bind 0.0.0.0 --advertise node1.example.com
+#
+# The scheduler places instances on the agents with the most free cores and
+# hands back endpoints that vrepper connects to:
+#   sched = scheduler(['node1.example.com:19900', 'node2.example.com:19900'])
+#   lease = sched.acquire()
+#   env = vrepper(host=lease.host, port_num=lease.port, launch=False).start()   # or lease.vrepper()
+#   ...
+#   env.end()
+#   lease.release()
+#
+# To try it on one machine, start a few agents with a share of the cores each:
+#   $ python -m vrepper.scheduler local --agents 3 --cores 2
+# or local_agents(3, cores=2) from Python.
+#
+# Agents speak newline-delimited JSON over TCP, one request and one reply per connection.
+# They listen on localhost unless given --bind; an agent reachable from other machines
+# needs a shared token (--token or $VREPPER_AGENT_TOKEN on the agents and where the
+# scheduler runs), since anyone who can reach it can start processes there.
+
+import argparse
+import hmac
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+DEFAULT_AGENT_PORT = 19900
+TOKEN_ENV = 'VREPPER_AGENT_TOKEN'
+
+# an instance that cannot bind its port exits, give it that long to do so
+_BIND_GRACE = 0.5
+_LAUNCH_ATTEMPTS = 3
+
+
+def parse_address(address, default_port=DEFAULT_AGENT_PORT):
+    # 'host:port', 'host' or (host, port) -> (host, port)
+    if isinstance(address, (tuple, list)):
+        return address[0], int(address[1])
+    host, _, port = address.rpartition(':')
+    if not host:
+        return address, default_port
+    return host, int(port)
+
+
+def request(address, message, timeout=10.):
+    """
+    Send one request to an agent.
+
+    :param tuple address: (host, port) of the agent
+    :param dict message: request, with an 'op' key
+    :returns: dict reply
+    """
+    sock = socket.create_connection(address, timeout)
+    try:
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        line = sock.makefile('rb').readline()
+    finally:
+        sock.close()
+    if not line:
+        raise RuntimeError('(scheduler) agent {}:{} closed the connection'.format(*address))
+    reply = json.loads(line.decode('utf-8'))
+    if 'error' in reply:
+        raise RuntimeError('(scheduler) agent {}:{}: {}'.format(address[0], address[1], reply['error']))
+    return reply
+
+
+def _free_port():
+    # free now, another process may still take it before the instance binds it
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
+
+
+def _is_loopback(host):
+    return host == 'localhost' or host.startswith('127.')
+
+
+class agent(object):
+    def __init__(self, port=DEFAULT_AGENT_PORT, cores=None, advertise='127.0.0.1', dir_vrep='', headless=True,
+                 pin=False, nice=None, token=None):
+        """
+        :param int port: port the agent listens to
+        :param int cores: number of instances this node may run. None to use every core,
+            minus what the load average says other processes are using
+        :param str advertise: host name clients should connect to
+        :param bool pin: pin every instance to the least used core
+        :param int nice: niceness increment of the instances
+        :param str token: shared secret every request has to carry, None to accept any request
+        """
+        self.port = port
+        self.cores = cores
+        self.advertise = advertise
+        self.dir_vrep = dir_vrep
+        self.headless = headless
+        self.pin = pin
+        self.nice = nice
+        self.token = token
+        self.instances = {}
+        self.lock = threading.Lock()
+
+    def reap(self):
+        for port, inst in list(self.instances.items()):
+            if not inst.isAlive():
+                print('(agent) instance on port', port, 'exited with', inst.inst.returncode)
+                del self.instances[port]
+
+    def free_cores(self):
+        # every instance is counted as one busy core
+        busy = len(self.instances)
+        if self.cores is None:
+            cores = os.cpu_count() or 1
+            if hasattr(os, 'getloadavg'):
+                busy = max(busy, os.getloadavg()[0])
+            return cores - busy
+        return self.cores - busy
+
+    def status(self):
+        with self.lock:
+            self.reap()
+            return {'host': self.advertise, 'cores': self.cores or os.cpu_count(),
+                    'free_cores': self.free_cores(), 'instances': sorted(self.instances),
+                    'usage': dict((str(port), inst.usage()) for port, inst in self.instances.items())}
+
+    def launch(self):
+        from .vrepper import instance, vrep_args
+
+        for _ in range(_LAUNCH_ATTEMPTS):
+            with self.lock:
+                self.reap()
+                if self.free_cores() < 1:
+                    raise RuntimeError('no free core left on this node')
+                port = _free_port()
+                inst = instance(vrep_args(port, self.dir_vrep, self.headless),
+                                'auto' if self.pin else None, self.nice, port=port).start()
+                self.instances[port] = inst
+
+            # the port may have been taken since _free_port, the instance then exits
+            deadline = time.time() + _BIND_GRACE
+            while inst.isAlive() and time.time() < deadline:
+                time.sleep(0.02)
+            if inst.isAlive():
+                print('(agent) started an instance on port', port)
+                return {'host': self.advertise, 'port': port}
+            with self.lock:
+                self.instances.pop(port, None)
+            print('(agent) instance on port', port, 'exited with', inst.inst.returncode, ', retrying')
+            inst.end()
+        raise RuntimeError('instances exit right after starting')
+
+    def release(self, port):
+        with self.lock:
+            inst = self.instances.pop(port, None)
+        if inst is None:
+            raise KeyError('no instance on port {}'.format(port))
+        inst.end()
+        return {'port': port}
+
+    def shutdown(self):
+        with self.lock:
+            instances, self.instances = list(self.instances.values()), {}
+        for inst in instances:
+            if inst.isAlive():
+                inst.end()
+
+    def handle(self, message):
+        if self.token is not None and not hmac.compare_digest(
+                str(message.get('token', '')).encode('utf-8'), self.token.encode('utf-8')):
+            raise PermissionError('bad token')
+        op = message.get('op')
+        if op == 'status':
+            return self.status()
+        if op == 'launch':
+            return self.launch()
+        if op == 'release':
+            return self.release(int(message['port']))
+        raise ValueError('unknown op {}'.format(op))
+
+    def serve_forever(self, bind='127.0.0.1'):
+        """
+        :param str bind: address to listen on. Listening on other than localhost needs a token
+        """
+        if not _is_loopback(bind) and self.token is None:
+            raise ValueError('(agent) listening on {} needs a token'.format(bind))
+        a = self
+
+        class handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                try:
+                    reply = a.handle(json.loads(line.decode('utf-8')))
+                except Exception as e:
+                    reply = {'error': '{}: {}'.format(type(e).__name__, e)}
+                self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        srv = socketserver.ThreadingTCPServer((bind, self.port), handler)
+        srv.daemon_threads = True
+        print('(agent) listening on port', self.port, 'advertising', self.advertise)
+        try:
+            srv.serve_forever()
+        finally:
+            srv.server_close()
+            self.shutdown()
+
+
+class lease(object):
+    # an instance placed by the scheduler
+    def __init__(self, sched, agent, host, port):
+        self.scheduler = sched
+        self.agent = agent
+        self.host = host
+        self.port = port
+
+    @property
+    def endpoint(self):
+        return self.host, self.port
+
+    def vrepper(self, **kwargs):
+        """
+        :returns: a vrepper (not started yet) connecting to this instance
+        """
+        from .vrepper import vrepper
+        return vrepper(host=self.host, port_num=self.port, launch=False, **kwargs)
+
+    def release(self):
+        self.scheduler.release(self)
+
+    def __repr__(self):
+        return 'lease({}:{} on agent {}:{})'.format(self.host, self.port, self.agent[0], self.agent[1])
+
+
+class scheduler(object):
+    def __init__(self, agents, token=None):
+        """
+        :param list agents: addresses of the agents, as 'host:port' or (host, port)
+        :param str token: shared secret of the agents, by default $VREPPER_AGENT_TOKEN
+        """
+        self.agents = [parse_address(a) for a in agents]
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV)
+        self.leases = []
+
+    def _request(self, a, message):
+        if self.token is not None:
+            message = dict(message, token=self.token)
+        return request(a, message)
+
+    def status(self):
+        """
+        :returns: dict of agent address -> status reply, None for agents that don't answer
+        """
+        statuses = {}
+        for a in self.agents:
+            try:
+                statuses[a] = self._request(a, {'op': 'status'})
+            except (socket.error, RuntimeError, ValueError):
+                statuses[a] = None
+        return statuses
+
+    @staticmethod
+    def _best(statuses, exclude=()):
+        # the agent with the most free cores, if it has at least one
+        candidates = [(s['free_cores'], a) for a, s in statuses.items()
+                      if s is not None and a not in exclude and s['free_cores'] >= 1]
+        return max(candidates)[1] if candidates else None
+
+    def _launch(self, statuses, exclude=()):
+        while True:
+            a = self._best(statuses, exclude)
+            if a is None:
+                return None
+            try:
+                reply = self._request(a, {'op': 'launch'})
+            except RuntimeError as e:
+                # full after all (other schedulers share the agents) or failing, try the next one
+                print(e)
+                statuses[a]['free_cores'] = 0
+                continue
+            statuses[a]['free_cores'] -= 1
+            return a, reply['host'], reply['port']
+
+    def acquire(self, n=None):
+        """
+        Start an instance on the node with the most free cores.
+
+        :param int n: start n instances instead of one
+        :returns: lease (list of leases if n is given)
+        """
+        statuses = self.status()
+        leases = []
+        for _ in range(1 if n is None else n):
+            placed = self._launch(statuses)
+            if placed is None:
+                for l in leases:
+                    l.release()
+                raise RuntimeError('(scheduler) no free core left on any node')
+            leases.append(lease(self, *placed))
+        self.leases.extend(leases)
+        return leases[0] if n is None else leases
+
+    def release(self, l):
+        if l in self.leases:
+            self.leases.remove(l)
+        try:
+            self._request(l.agent, {'op': 'release', 'port': l.port})
+        except (socket.error, RuntimeError):
+            pass  # the agent is gone, and its instances with it
+
+    def rebalance(self):
+        """
+        Move instances away from saturated nodes (more busy than available cores, or
+        not answering) to nodes with free cores. Moved leases get their new endpoint;
+        environments connected to them have to reconnect.
+
+        :returns: list of the moved leases
+        """
+        statuses = self.status()
+        moved = []
+        for l in list(self.leases):
+            s = statuses.get(l.agent)
+            if s is not None and s['free_cores'] >= 0:
+                continue
+            placed = self._launch(statuses, exclude=(l.agent,))
+            if placed is None:
+                print('(scheduler) cannot rebalance, no free core left on any node')
+                break
+            try:
+                self._request(l.agent, {'op': 'release', 'port': l.port})
+            except (socket.error, RuntimeError):
+                pass
+            if s is not None:
+                s['free_cores'] += 1
+            print('(scheduler) moving {}:{} to {}:{}'.format(l.host, l.port, placed[1], placed[2]))
+            l.agent, l.host, l.port = placed
+            moved.append(l)
+        return moved
+
+
+def local_agents(n, cores=1, base_port=None, timeout=10., token=None):
+    """
+    Start n agents on this machine, for testing.
+
+    :param int cores: instances each agent may run
+    :param str token: shared secret of the agents, None for none
+    :returns: list of agent addresses, list of their vrepper.instance
+    """
+    from .vrepper import instance
+
+    addresses, instances = [], []
+    for _ in range(n):
+        port = _free_port() if base_port is None else base_port + len(addresses)
+        args = [sys.executable, '-m', 'vrepper.scheduler', 'agent',
+                '--port', str(port), '--cores', str(cores), '--bind', '127.0.0.1']
+        if token is not None:
+            args += ['--token', token]
+        inst = instance(args).start()
+        addresses.append(('127.0.0.1', port))
+        instances.append(inst)
+
+    # wait until every agent answers
+    deadline = time.time() + timeout
+    for a in addresses:
+        while True:
+            try:
+                request(a, {'op': 'status', 'token': token})
+                break
+            except socket.error:
+                if time.time() > deadline:
+                    raise RuntimeError('(scheduler) agent {}:{} did not start'.format(*a))
+                time.sleep(0.05)
+    return addresses, instances
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run vrepper instances across machines')
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('agent', help='run the agent of this node')
+    p.add_argument('--port', type=int, default=DEFAULT_AGENT_PORT)
+    p.add_argument('--cores', type=int, default=None, help='instances this node may run (default: free cores)')
+    p.add_argument('--advertise', default=None, help='host name clients connect to (default: this host name)')
+    p.add_argument('--bind', default='127.0.0.1',
+                   help='address to listen on (default: localhost only, other addresses need a token)')
+    p.add_argument('--token', default=os.environ.get(TOKEN_ENV),
+                   help='shared secret of the agents (default: ${})'.format(TOKEN_ENV))
+    p.add_argument('--dir-vrep', default='')
+    p.add_argument('--show', action='store_true', help='do not start V-REP headless')
+    p.add_argument('--pin', action='store_true', help='pin each instance to the least used core')
+    p.add_argument('--nice', type=int, default=None, help='niceness increment of the instances')
+    p = sub.add_parser('local', help='run several agents on this machine, for testing')
+    p.add_argument('--agents', type=int, default=2)
+    p.add_argument('--cores', type=int, default=1)
+    p.add_argument('--port', type=int, default=DEFAULT_AGENT_PORT)
+    p.add_argument('--token', default=os.environ.get(TOKEN_ENV))
+    p = sub.add_parser('status', help='show the status of agents')
+    p.add_argument('agents', nargs='+')
+    p.add_argument('--token', default=os.environ.get(TOKEN_ENV))
+    args = parser.parse_args(argv)
+
+    # terminate like on ctrl-c, so that the instances get stopped
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    if args.command == 'agent':
+        local = _is_loopback(args.bind)
+        if not local and args.token is None:
+            parser.error('--bind {} needs a --token (or ${})'.format(args.bind, TOKEN_ENV))
+        advertise = args.advertise or ('127.0.0.1' if local else
+                                       socket.gethostname() if args.bind == '0.0.0.0' else args.bind)
+        if not local:
+            # the instances have to be reachable where the agent is: the stand-in listens on
+            # localhost only unless told otherwise (V-REP listens on every address)
+            os.environ.setdefault('VREPPER_STANDIN_BIND', args.bind)
+        try:
+            agent(args.port, args.cores, advertise, args.dir_vrep, not args.show,
+                  args.pin, args.nice, args.token).serve_forever(args.bind)
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'local':
+        addresses, instances = local_agents(args.agents, args.cores, args.port, token=args.token)
+        print('(scheduler) agents:', ' '.join('{}:{}'.format(*a) for a in addresses))
+        try:
+            while all(i.isAlive() for i in instances):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'status':
+        for a, s in scheduler(args.agents, args.token).status().items():
+            print('{}:{}'.format(*a), json.dumps(s))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+# Message framing for the pure-Python remote API client and the stand-in server.
+#
+# A message is laid out the same way the remote API library lays it out:
+# a SIMX_HEADER_SIZE header (fields at simx_headeroffset_*), followed by any
+# number of commands, each one made of a SIMX_SUBHEADER_SIZE sub-header
+# (fields at simx_cmdheaderoffset_*), the command identification data
+# (pdata_offset0 bytes, used to match replies with requests) and the pure data.
+# On the socket every message is preceded by its length (uint32, little endian).
+#
+# The command ids and payload layouts below are our own: they are only
+# understood by vrepper.standin, not by a real V-REP server.
+
+import binascii
+import struct
+
+from .vrepConst import *
+
+HEADER = struct.Struct('<HBiiiHB')
+SUBHEADER = struct.Struct('<iiHiiHiBB')
+LENGTH = struct.Struct('<I')
+
+assert HEADER.size == SIMX_HEADER_SIZE
+assert SUBHEADER.size == SIMX_SUBHEADER_SIZE
+
+# lower 16 bits of simx_cmdheaderoffset_cmd hold the command id,
+# upper bits hold the operation mode.
+CMD_MASK = 0xffff
+OPMODE_MASK = 0xff0000
+
+# status bits of a reply
+STATUS_ERROR = 1
+
+# field codes used to describe the identification/input/output data:
+#   i: int32, f: float32, B: unsigned byte
+#   s: byte string (uint32 length prefixed)
+#   I: int32 array, F: float32 array (uint32 count prefixed)
+#   S: list of strings (uint32 count, then each as 's')
+_scalars = {'i': struct.Struct('<i'), 'f': struct.Struct('<f'), 'B': struct.Struct('<B')}
+
+# name, identification fields, input fields, output fields.
+# APPEND ONLY: the command id is the position in this list.
+COMMANDS = [
+    ('simxGetJointPosition', 'i', '', 'f'),
+    ('simxSetJointPosition', 'i', 'f', ''),
+    ('simxGetJointMatrix', 'i', '', 'F'),
+    ('simxSetJointTargetVelocity', 'i', 'f', ''),
+    ('simxSetJointTargetPosition', 'i', 'f', ''),
+    ('simxGetJointForce', 'i', '', 'f'),
+    ('simxSetJointForce', 'i', 'f', ''),
+    ('simxReadForceSensor', 'i', '', 'BFF'),
+    ('simxGetObjectHandle', 's', '', 'i'),
+    ('simxGetVisionSensorImage', 'iB', '', 'Is'),
+    ('simxSetVisionSensorImage', 'iB', 's', ''),
+    ('simxGetVisionSensorDepthBuffer', 'i', '', 'IF'),
+    ('simxGetObjectChild', 'ii', '', 'i'),
+    ('simxGetObjectParent', 'i', '', 'i'),
+    ('simxReadProximitySensor', 'i', '', 'BFiF'),
+    ('simxLoadScene', 's', 'B', ''),
+    ('simxStartSimulation', '', '', ''),
+    ('simxPauseSimulation', '', '', ''),
+    ('simxStopSimulation', '', '', ''),
+    ('simxAddStatusbarMessage', '', 's', ''),
+    ('simxGetObjectOrientation', 'ii', '', 'F'),
+    ('simxGetObjectPosition', 'ii', '', 'F'),
+    ('simxSetObjectOrientation', 'ii', 'F', ''),
+    ('simxSetObjectPosition', 'ii', 'F', ''),
+    ('simxSetObjectParent', 'i', 'iB', ''),
+    ('simxGetArrayParameter', 'i', '', 'F'),
+    ('simxSetArrayParameter', 'i', 'F', ''),
+    ('simxGetBooleanParameter', 'i', '', 'B'),
+    ('simxSetBooleanParameter', 'i', 'B', ''),
+    ('simxGetIntegerParameter', 'i', '', 'i'),
+    ('simxSetIntegerParameter', 'i', 'i', ''),
+    ('simxGetFloatingParameter', 'i', '', 'f'),
+    ('simxSetFloatingParameter', 'i', 'f', ''),
+    ('simxGetStringParameter', 'i', '', 's'),
+    ('simxRemoveObject', 'i', '', ''),
+    ('simxCloseScene', '', '', ''),
+    ('simxGetObjects', 'i', '', 'I'),
+    ('simxClearFloatSignal', 's', '', ''),
+    ('simxClearIntegerSignal', 's', '', ''),
+    ('simxClearStringSignal', 's', '', ''),
+    ('simxGetFloatSignal', 's', '', 'f'),
+    ('simxGetIntegerSignal', 's', '', 'i'),
+    ('simxGetStringSignal', 's', '', 's'),
+    ('simxGetAndClearStringSignal', 's', '', 's'),
+    ('simxReadStringStream', 's', '', 's'),
+    ('simxSetFloatSignal', 's', 'f', ''),
+    ('simxSetIntegerSignal', 's', 'i', ''),
+    ('simxSetStringSignal', 's', 's', ''),
+    ('simxAppendStringSignal', 's', 's', ''),
+    ('simxWriteStringStream', 's', 's', ''),
+    ('simxGetObjectFloatParameter', 'ii', '', 'f'),
+    ('simxSetObjectFloatParameter', 'ii', 'f', ''),
+    ('simxGetObjectIntParameter', 'ii', '', 'i'),
+    ('simxSetObjectIntParameter', 'ii', 'i', ''),
+    ('simxGetObjectGroupData', 'ii', '', 'IIFS'),
+    ('simxGetObjectVelocity', 'i', '', 'FF'),
+    ('simxCallScriptFunction', 'sis', 'IFSs', 'IFSs'),
+    ('simxGetPingTime', '', '', ''),
+    ('simxSynchronousTrigger', '', '', ''),
+    ('simxSynchronous', '', 'B', ''),
+    ('simxFinish', '', '', ''),
+]
+
+cmd_ids = dict((c[0], k + 1) for k, c in enumerate(COMMANDS))
+cmd_names = dict((k + 1, c[0]) for k, c in enumerate(COMMANDS))
+cmd_fields = dict((c[0], c[1:]) for c in COMMANDS)
+
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0)
+
+
+def pack_fields(codes, values):
+    out = []
+    for code, value in zip(codes, values):
+        if code in _scalars:
+            out.append(_scalars[code].pack(value))
+        elif code == 's':
+            if isinstance(value, type(u'')):
+                value = value.encode('utf-8')
+            elif not isinstance(value, bytes):
+                # any buffer (bytearray, memoryview, NumPy array...), by its bytes
+                value = memoryview(value).tobytes()
+            out.append(LENGTH.pack(len(value)))
+            out.append(value)
+        elif code == 'I':
+            out.append(LENGTH.pack(len(value)))
+            out.append(struct.pack('<%di' % len(value), *value))
+        elif code == 'F':
+            out.append(LENGTH.pack(len(value)))
+            out.append(struct.pack('<%df' % len(value), *value))
+        elif code == 'S':
+            out.append(LENGTH.pack(len(value)))
+            out.append(pack_fields('s' * len(value), value))
+        else:
+            raise ValueError('unknown field code ' + code)
+    return b''.join(out)
+
+
+def unpack_fields(codes, buf, offset=0):
+    values = []
+    for code in codes:
+        if code in _scalars:
+            s = _scalars[code]
+            values.append(s.unpack_from(buf, offset)[0])
+            offset += s.size
+        else:
+            n, = LENGTH.unpack_from(buf, offset)
+            offset += LENGTH.size
+            if code == 's':
+                values.append(bytes(buf[offset:offset + n]))
+                offset += n
+            elif code == 'I':
+                values.append(list(struct.unpack_from('<%di' % n, buf, offset)))
+                offset += 4 * n
+            elif code == 'F':
+                values.append(list(struct.unpack_from('<%df' % n, buf, offset)))
+                offset += 4 * n
+            elif code == 'S':
+                strings = []
+                for _ in range(n):
+                    m, = LENGTH.unpack_from(buf, offset)
+                    offset += LENGTH.size
+                    strings.append(bytes(buf[offset:offset + m]).decode('utf-8'))
+                    offset += m
+                values.append(strings)
+            else:
+                raise ValueError('unknown field code ' + code)
+    return values
+
+
+def pack_command(cmd, ident, data, sim_time=0, status=0):
+    """
+    Build one command (sub-header + identification + pure data).
+
+    :param int cmd: command id combined with the operation mode
+    :param bytes ident: identification data, used to match replies
+    :param bytes data: pure data
+    """
+    size = SIMX_SUBHEADER_SIZE + len(ident) + len(data)
+    return SUBHEADER.pack(size, size, len(ident), 0, cmd, 0, sim_time, status, 0) + ident + data
+
+
+def pack_message(commands, message_id=0, client_time=0, server_time=0, scene_id=0, server_state=0):
+    body = HEADER.pack(0, SIMX_VERSION, message_id, client_time, server_time, scene_id, server_state)[2:]
+    body += b''.join(commands)
+    return struct.pack('<H', crc16(body)) + body
+
+
+def unpack_message(buf):
+    """
+    Split a message into its header and its commands.
+
+    :returns: tuple (header, commands)
+        WHERE
+        dict header maps header field names to values
+        list commands holds (cmd, ident, data, sim_time, status) tuples
+    """
+    crc, version, message_id, client_time, server_time, scene_id, server_state = HEADER.unpack_from(buf, 0)
+    if crc != crc16(memoryview(buf)[2:]):
+        raise ValueError('CRC mismatch in remote API message')
+    header = {
+        'version': version,
+        'message_id': message_id,
+        'client_time': client_time,
+        'server_time': server_time,
+        'scene_id': scene_id,
+        'server_state': server_state,
+    }
+    commands = []
+    offset = SIMX_HEADER_SIZE
+    while offset < len(buf):
+        size, full_size, ident_size, _, cmd, _, sim_time, status, _ = SUBHEADER.unpack_from(buf, offset)
+        ident_start = offset + SIMX_SUBHEADER_SIZE
+        data_start = ident_start + ident_size
+        commands.append((cmd, bytes(buf[ident_start:data_start]), bytes(buf[data_start:offset + size]),
+                         sim_time, status))
+        offset += size
+    return header, commands
+
+
+# header fields by simx_headeroffset_* value, for simxGetInMessageInfo
+header_fields = {
+    simx_headeroffset_version: 'version',
+    simx_headeroffset_message_id: 'message_id',
+    simx_headeroffset_client_time: 'client_time',
+    simx_headeroffset_server_time: 'server_time',
+    simx_headeroffset_scene_id: 'scene_id',
+    simx_headeroffset_server_state: 'server_state',
+}
+
+
+def split_messages(received):
+    """
+    Take the complete messages out of a receive buffer.
+
+    :param bytearray received: bytes read from the socket so far, consumed in place
+    :returns: list of messages
+    """
+    messages = []
+    while len(received) >= LENGTH.size:
+        n, = LENGTH.unpack_from(received, 0)
+        if len(received) < LENGTH.size + n:
+            break
+        messages.append(bytes(received[LENGTH.size:LENGTH.size + n]))
+        del received[:LENGTH.size + n]
+    return messages
+
+
+def send_message(sock, message):
+    sock.sendall(LENGTH.pack(len(message)) + message)
+
+
+def recv_exactly(sock, n):
+    chunks = []
+    while n > 0:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise EOFError('remote API connection closed')
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    n, = LENGTH.unpack(recv_exactly(sock, LENGTH.size))
+    return recv_exactly(sock, n)
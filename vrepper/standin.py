@@ -0,0 +1,875 @@
+# A local stand-in for a V-REP remote API server.
+#
+# It emulates just enough of V-REP (a few scene presets, joints, vision
+# sensors, signals, synchronous stepping) to drive vrepper without a real
+# simulator, e.g. to benchmark the client side on any CI box.
+#
+# It is started the same way V-REP is:
+#   python -m vrepper.standin -gREMOTEAPISERVERSERVICE_19997_FALSE_TRUE -h
+# and speaks the framing from simxproto, so it can only be reached through
+# the pure-Python client in vrepper.pyvrep (VREPPER_API=standin).
+
+import argparse
+import copy
+import math
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from . import rpc
+from . import simxproto as proto
+from .vrepConst import *
+
+
+class sceneobject(object):
+    def __init__(self, handle, name, objtype, parent=-1, position=(0., 0., 0.)):
+        self.handle = handle
+        self.name = name
+        self.type = objtype
+        self.parent = parent
+
+        # local pose, relative to the parent (translation and euler angles are simply added up)
+        self.position = list(position)
+        self.orientation = [0., 0., 0.]
+
+        # world velocities, computed by finite differences after each step
+        self.linear_velocity = [0., 0., 0.]
+        self.angular_velocity = [0., 0., 0.]
+
+        # joints: 'revolute' rotates children around z, 'prismatic' moves them along x
+        self.joint_kind = None
+        self.joint_position = 0.
+        self.target_velocity = 0.
+        self.target_position = None
+        self.force = 0.
+
+        # pendulums: the object swings around its parent (around y, 0 is straight up),
+        # pushed by gravity and by the acceleration of the parent along x
+        self.pendulum_length = None
+        self.pendulum_angle = 0.
+        self.pendulum_rate = 0.
+        self.parent_velocity = 0.
+
+        # vision sensors
+        self.resolution = None
+        self.image = None
+
+        self.int_params = {}
+        self.float_params = {}
+
+
+class scene(object):
+    def __init__(self):
+        self.objects = {}
+        self.names = {}
+        self.next_handle = 16
+        self.scene_id = 0
+
+        self.int_signals = {}
+        self.float_signals = {}
+        self.string_signals = {}
+
+        self.bool_params = {
+            sim_boolparam_display_enabled: True,
+            sim_boolparam_realtime_simulation: False,
+            sim_boolparam_vision_sensor_handling_enabled: True,
+            sim_boolparam_distance_handling_enabled: True,
+            sim_boolparam_threaded_rendering_enabled: False,
+            sim_boolparam_dynamics_handling_enabled: True,
+        }
+        self.int_params = {sim_intparam_dynamic_engine: 0, sim_intparam_program_version: 30400,
+                           sim_intparam_dynamic_step_divider: 10}
+        self.float_params = {sim_floatparam_simulation_time_step: 0.05}
+        self.array_params = {sim_arrayparam_gravity: [0., 0., -9.81]}
+
+        # 'stopped', 'running', 'paused' or 'stopping'
+        self.state = 'stopped'
+        self.sync = False
+        self.triggers = 0
+        self.sim_time = 0.
+        self.steps = 0
+        self.stop_deadline = 0.
+        self.initial = None
+
+        self.scripts = dict(script_functions)
+        # variables of the scripts, reset when a simulation starts like child scripts are
+        self.script_state = {}
+
+    def add_object(self, name, objtype, parent=-1, position=(0., 0., 0.)):
+        obj = sceneobject(self.next_handle, name, objtype, parent, position)
+        self.next_handle += 1
+        self.objects[obj.handle] = obj
+        self.names[name] = obj.handle
+        return obj
+
+    def add_joint(self, name, kind, parent=-1, position=(0., 0., 0.)):
+        obj = self.add_object(name, sim_object_joint_type, parent, position)
+        obj.joint_kind = kind
+        return obj
+
+    def add_pendulum(self, name, objtype, parent, length, angle=0.):
+        obj = self.add_object(name, objtype, parent)
+        obj.pendulum_length = length
+        obj.pendulum_angle = angle
+        self.place_pendulum(obj)
+        return obj
+
+    def place_pendulum(self, obj):
+        a = obj.pendulum_angle
+        obj.position = [obj.pendulum_length * math.sin(a), 0., obj.pendulum_length * math.cos(a)]
+        obj.orientation = [0., a, 0.]
+
+    def add_vision_sensor(self, name, resolution, parent=-1, position=(0., 0., 0.)):
+        obj = self.add_object(name, sim_object_visionsensor_type, parent, position)
+        obj.resolution = list(resolution)
+        obj.int_params[sim_visionintparam_resolution_x] = resolution[0]
+        obj.int_params[sim_visionintparam_resolution_y] = resolution[1]
+        return obj
+
+    def load(self, path):
+        self.objects = {}
+        self.names = {}
+        self.next_handle = 16
+        self.scene_id = (self.scene_id + 1) & 0xffff
+        self.state = 'stopped'
+
+        if path.startswith('standin:'):
+            build_synthetic_scene(self, path[len('standin:'):])
+        else:
+            name = os.path.basename(path)
+            if name not in scene_presets:
+                raise ValueError('(standin) no preset for scene ' + path)
+            scene_presets[name](self)
+
+    # world pose: translations/angles of the parents and joint offsets are added up
+    def world_position(self, handle):
+        obj = self.objects[handle]
+        pos = list(obj.position)
+        parent = obj.parent
+        while parent != -1:
+            p = self.objects[parent]
+            for i in range(3):
+                pos[i] += p.position[i]
+            if p.joint_kind == 'prismatic':
+                pos[0] += p.joint_position
+            parent = p.parent
+        return pos
+
+    def world_orientation(self, handle):
+        obj = self.objects[handle]
+        ori = list(obj.orientation)
+        parent = obj.parent
+        while parent != -1:
+            p = self.objects[parent]
+            for i in range(3):
+                ori[i] += p.orientation[i]
+            if p.joint_kind == 'revolute':
+                ori[2] += p.joint_position
+            parent = p.parent
+        return ori
+
+    def relative(self, values, reference):
+        return [a - b for a, b in zip(values, reference)]
+
+    def start(self):
+        if self.state == 'stopping':
+            raise RuntimeError('(standin) simulation is still stopping')
+        if self.state == 'stopped':
+            self.initial = copy.deepcopy(self.objects)
+            self.sim_time = 0.
+            self.steps = 0
+            self.script_state.clear()
+        self.state = 'running'
+
+    def stop(self, delay):
+        if self.state in ('running', 'paused'):
+            self.state = 'stopping'
+            self.stop_deadline = time.time() + delay
+
+    def finish_stop(self):
+        # like V-REP, restore the scene as it was before the simulation started
+        if self.initial is not None:
+            self.objects = self.initial
+            self.initial = None
+        self.state = 'stopped'
+        self.sync = False
+        self.triggers = 0
+
+    def server_state(self):
+        state = 0
+        if self.state != 'stopped':
+            state |= 1
+        if self.state == 'paused':
+            state |= 2
+        return state
+
+    def move_joints(self, dt):
+        for obj in self.objects.values():
+            if obj.joint_kind is None:
+                continue
+            if obj.target_position is not None:
+                obj.joint_position = obj.target_position
+            else:
+                obj.joint_position += obj.target_velocity * dt
+
+    def step(self):
+        dt = self.float_params[sim_floatparam_simulation_time_step]
+        before = dict((h, (self.world_position(h), self.world_orientation(h))) for h in self.objects)
+
+        pendulums = [o for o in self.objects.values() if o.pendulum_length is not None]
+        if not pendulums:
+            self.move_joints(dt)
+        else:
+            # dynamics in fixed sub-steps of about 5 ms, like V-REP's default dynamics settings
+            n = max(1, int(round(dt / 0.005)))
+            self.int_params[sim_intparam_dynamic_step_divider] = n
+            h = dt / n
+            g = -self.array_params[sim_arrayparam_gravity][2]
+            for _ in range(n):
+                x0 = [self.world_position(o.parent)[0] for o in pendulums]
+                self.move_joints(h)
+                for o, x in zip(pendulums, x0):
+                    v = (self.world_position(o.parent)[0] - x) / h
+                    a = o.pendulum_angle
+                    # semi-implicit euler, the parent's change of velocity acts as an impulse
+                    o.pendulum_rate += (h * g * math.sin(a) - (v - o.parent_velocity) * math.cos(a)) / o.pendulum_length
+                    o.pendulum_angle += h * o.pendulum_rate
+                    o.parent_velocity = v
+                    self.place_pendulum(o)
+
+        for h, obj in self.objects.items():
+            pos0, ori0 = before[h]
+            pos1, ori1 = self.world_position(h), self.world_orientation(h)
+            obj.linear_velocity = [(b - a) / dt for a, b in zip(pos0, pos1)]
+            obj.angular_velocity = [(b - a) / dt for a, b in zip(ori0, ori1)]
+            if obj.resolution is not None:
+                obj.image = None  # rendered again on demand
+
+        self.sim_time += dt
+        self.steps += 1
+
+    def render(self, obj, grayscale):
+        if obj.image is None:
+            w, h = obj.resolution
+            base = bytes(bytearray(range(256)))
+            n = w * h * 3
+            full = base * (n // 256 + 2)
+            k = self.steps % 256
+            obj.image = full[k:k + n]
+        if grayscale:
+            return obj.image[::3]
+        return obj.image
+
+    def obj(self, handle):
+        if handle not in self.objects:
+            raise KeyError('(standin) no object with handle ' + str(handle))
+        return self.objects[handle]
+
+    # command handlers: take the identification values and the input values,
+    # return the output values.
+
+    def simxGetJointPosition(self, handle):
+        return [self.obj(handle).joint_position]
+
+    def simxSetJointPosition(self, handle, position):
+        self.obj(handle).joint_position = position
+        return []
+
+    def simxGetJointMatrix(self, handle):
+        a = self.obj(handle).joint_position
+        c, s = math.cos(a), math.sin(a)
+        return [[c, -s, 0., 0., s, c, 0., 0., 0., 0., 1., 0.]]
+
+    def simxSetJointTargetVelocity(self, handle, v):
+        obj = self.obj(handle)
+        obj.target_velocity = v
+        obj.target_position = None
+        return []
+
+    def simxSetJointTargetPosition(self, handle, p):
+        self.obj(handle).target_position = p
+        return []
+
+    def simxGetJointForce(self, handle):
+        return [self.obj(handle).force]
+
+    def simxSetJointForce(self, handle, f):
+        self.obj(handle).force = f
+        return []
+
+    def simxReadForceSensor(self, handle):
+        self.obj(handle)
+        return [0, [0., 0., 0.], [0., 0., 0.]]
+
+    def simxGetObjectHandle(self, name):
+        name = name.decode('utf-8')
+        if name not in self.names:
+            raise KeyError('(standin) no object named ' + name)
+        return [self.names[name]]
+
+    def simxGetVisionSensorImage(self, handle, options):
+        obj = self.obj(handle)
+        return [obj.resolution, self.render(obj, options & 1)]
+
+    def simxSetVisionSensorImage(self, handle, options, image):
+        obj = self.obj(handle)
+        w, h = obj.resolution
+        if len(image) != w * h * (1 if options & 1 else 3):
+            raise ValueError('(standin) image of {} bytes for a {}x{} sensor'.format(len(image), w, h))
+        if options & 1:
+            # grayscale: the same value in the 3 channels
+            image = np.repeat(np.frombuffer(image, np.uint8), 3).tobytes()
+        obj.image = image
+        return []
+
+    def simxGetVisionSensorDepthBuffer(self, handle):
+        obj = self.obj(handle)
+        return [obj.resolution, [1.] * (obj.resolution[0] * obj.resolution[1])]
+
+    def simxGetObjectChild(self, handle, index):
+        children = sorted(h for h, o in self.objects.items() if o.parent == handle)
+        return [children[index] if index < len(children) else -1]
+
+    def simxGetObjectParent(self, handle):
+        return [self.obj(handle).parent]
+
+    def simxReadProximitySensor(self, handle):
+        self.obj(handle)
+        return [0, [0., 0., 0.], -1, [0., 0., 1.]]
+
+    def simxLoadScene(self, path, options):
+        self.load(path.decode('utf-8'))
+        return []
+
+    def simxStartSimulation(self):
+        self.start()
+        return []
+
+    def simxPauseSimulation(self):
+        if self.state == 'running':
+            self.state = 'paused'
+        return []
+
+    def simxAddStatusbarMessage(self, message):
+        return []
+
+    def simxGetObjectOrientation(self, handle, relative_to):
+        ori = self.world_orientation(self.obj(handle).handle)
+        if relative_to != -1:
+            ori = self.relative(ori, self.world_orientation(self.obj(relative_to).handle))
+        return [ori]
+
+    def simxGetObjectPosition(self, handle, relative_to):
+        pos = self.world_position(self.obj(handle).handle)
+        if relative_to != -1:
+            pos = self.relative(pos, self.world_position(self.obj(relative_to).handle))
+        return [pos]
+
+    def simxSetObjectOrientation(self, handle, relative_to, angles):
+        obj = self.obj(handle)
+        current = self.world_orientation(handle)
+        target = list(angles)
+        if relative_to != -1:
+            target = [a + b for a, b in zip(target, self.world_orientation(relative_to))]
+        obj.orientation = [o + t - c for o, t, c in zip(obj.orientation, target, current)]
+        return []
+
+    def simxSetObjectPosition(self, handle, relative_to, position):
+        obj = self.obj(handle)
+        current = self.world_position(handle)
+        target = list(position)
+        if relative_to != -1:
+            target = [a + b for a, b in zip(target, self.world_position(relative_to))]
+        obj.position = [o + t - c for o, t, c in zip(obj.position, target, current)]
+        return []
+
+    def simxSetObjectParent(self, handle, parent, keep_in_place):
+        self.obj(handle).parent = parent
+        return []
+
+    def simxGetArrayParameter(self, param):
+        return [self.array_params.get(param, [0., 0., 0.])]
+
+    def simxSetArrayParameter(self, param, values):
+        self.array_params[param] = list(values)
+        return []
+
+    def simxGetBooleanParameter(self, param):
+        return [int(self.bool_params.get(param, False))]
+
+    def simxSetBooleanParameter(self, param, value):
+        self.bool_params[param] = bool(value)
+        return []
+
+    def simxGetIntegerParameter(self, param):
+        return [self.int_params.get(param, 0)]
+
+    def simxSetIntegerParameter(self, param, value):
+        self.int_params[param] = value
+        return []
+
+    def simxGetFloatingParameter(self, param):
+        return [self.float_params.get(param, 0.)]
+
+    def simxSetFloatingParameter(self, param, value):
+        self.float_params[param] = value
+        return []
+
+    def simxGetStringParameter(self, param):
+        return [b'']
+
+    def simxRemoveObject(self, handle):
+        obj = self.objects.pop(handle)
+        self.names.pop(obj.name, None)
+        return []
+
+    def simxCloseScene(self):
+        self.load('standin:')
+        return []
+
+    def simxGetObjects(self, objtype):
+        return [sorted(h for h, o in self.objects.items() if objtype == sim_handle_all or o.type == objtype)]
+
+    def simxClearFloatSignal(self, name):
+        self.float_signals.pop(name, None)
+        return []
+
+    def simxClearIntegerSignal(self, name):
+        self.int_signals.pop(name, None)
+        return []
+
+    def simxClearStringSignal(self, name):
+        self.string_signals.pop(name, None)
+        return []
+
+    def simxGetFloatSignal(self, name):
+        return [self.float_signals[name]]
+
+    def simxGetIntegerSignal(self, name):
+        return [self.int_signals[name]]
+
+    def simxGetStringSignal(self, name):
+        return [self.string_signals[name]]
+
+    def simxGetAndClearStringSignal(self, name):
+        return [self.string_signals.pop(name)]
+
+    def simxReadStringStream(self, name):
+        return [self.string_signals.pop(name, b'')]
+
+    def simxSetFloatSignal(self, name, value):
+        self.float_signals[name] = value
+        return []
+
+    def simxSetIntegerSignal(self, name, value):
+        self.int_signals[name] = value
+        return []
+
+    def simxSetStringSignal(self, name, value):
+        self.string_signals[name] = value
+        return []
+
+    def simxAppendStringSignal(self, name, value):
+        self.string_signals[name] = self.string_signals.get(name, b'') + value
+        return []
+
+    def simxWriteStringStream(self, name, value):
+        return self.simxAppendStringSignal(name, value)
+
+    def simxGetObjectFloatParameter(self, handle, param):
+        return [self.obj(handle).float_params.get(param, 0.)]
+
+    def simxSetObjectFloatParameter(self, handle, param, value):
+        self.obj(handle).float_params[param] = value
+        return []
+
+    def simxGetObjectIntParameter(self, handle, param):
+        return [self.obj(handle).int_params.get(param, 0)]
+
+    def simxSetObjectIntParameter(self, handle, param, value):
+        obj = self.obj(handle)
+        obj.int_params[param] = value
+        if obj.resolution is not None and param in (sim_visionintparam_resolution_x, sim_visionintparam_resolution_y):
+            obj.resolution = [obj.int_params[sim_visionintparam_resolution_x],
+                              obj.int_params[sim_visionintparam_resolution_y]]
+            obj.image = None
+        return []
+
+    def simxGetObjectGroupData(self, objtype, datatype):
+        handles = sorted(h for h, o in self.objects.items() if objtype == sim_handle_all or o.type == objtype)
+        ints, floats, strings = [], [], []
+        for h in handles:
+            o = self.objects[h]
+            if datatype == 0:
+                strings.append(o.name)
+            elif datatype == 1:
+                ints.append(o.type)
+            elif datatype == 2:
+                ints.append(o.parent)
+            elif datatype == 3:
+                floats.extend(self.world_position(h))
+            elif datatype == 5:
+                floats.extend(self.world_orientation(h))
+            elif datatype == 9:
+                floats.extend(self.world_position(h) + self.world_orientation(h))
+            elif datatype == 15:
+                floats.extend([o.joint_position, o.force])
+            elif datatype == 17:
+                floats.extend(o.linear_velocity)
+            elif datatype == 18:
+                floats.extend(o.angular_velocity)
+            elif datatype == 19:
+                floats.extend(o.linear_velocity + o.angular_velocity)
+            else:
+                raise ValueError('(standin) group data type not supported: ' + str(datatype))
+        return [handles, ints, floats, strings]
+
+    def simxGetObjectVelocity(self, handle):
+        obj = self.obj(handle)
+        return [obj.linear_velocity, obj.angular_velocity]
+
+    def simxCallScriptFunction(self, script, options, function, ints, floats, strings, buf):
+        # every function also answers as name#k, as if declared with vrepper_rpc.lanes
+        function = function.decode('utf-8').split('#')[0]
+        if function not in self.scripts:
+            raise KeyError('(standin) no script function ' + function)
+        return list(self.scripts[function](self, ints, floats, strings, buf))
+
+
+# stand-ins for functions a scene would define in its "remoteApiCommandServer" child script.
+# they take (scene, ints, floats, strings, buffer) and return the same 4 things.
+
+def _echo(sc, ints, floats, strings, buf):
+    return ints, floats, strings, buf
+
+
+def _get_object_pose(sc, ints, floats, strings, buf):
+    x, y, z = sc.world_position(ints[0])
+    a = sc.world_orientation(ints[0])[2]
+    c, s = math.cos(a), math.sin(a)
+    return [], [c, -s, 0., x, s, c, 0., y, 0., 0., 1., z], [], b''
+
+
+def _get_robot_state(sc, ints, floats, strings, buf):
+    joints = sorted(h for h, o in sc.objects.items() if o.joint_kind is not None)
+    return [], [sc.objects[h].joint_position for h in joints], [], b''
+
+
+def _display_message(sc, ints, floats, strings, buf):
+    return [], [], [], b''
+
+
+_paths = {}
+
+
+def _path(n):
+    # n states of 6 joint values, a stand-in for what findPath_goalIsPose returns.
+    # computed once: what is measured is getting it across
+    if n not in _paths:
+        _paths[n] = np.sin(0.01 * np.arange(n)[:, None] + 0.5 * np.arange(6)).astype(np.float32)
+    return _paths[n]
+
+
+def _sample_path(sc, ints, floats, strings, buf):
+    return [], _path(ints[0]).ravel().tolist(), [], b''
+
+
+def _packed(func):
+    # what vrepper_rpc.wrap does in Lua: arrays in the buffer, arrays back
+    def call(sc, ints, floats, strings, buf):
+        return [], [], [], rpc.pack_arrays(func(sc, *rpc.unpack_arrays(buf)))
+
+    return call
+
+
+def _sample_path_packed(sc, n):
+    return [_path(int(n[0]))]
+
+
+_frame_head = struct.Struct('<ii')
+
+
+def _channel_loopback(sc, ints, floats, strings, buf):
+    # sends back on a vrepper.channel every frame received on it, like a script doing
+    # vrepper_rpc.channel_send(name, data) for each data of vrepper_rpc.channel_receive(name)
+    # signal names are kept as bytes, like they come in
+    name = strings[0] if isinstance(strings[0], bytes) else strings[0].encode('utf-8')
+    data = sc.string_signals.pop(name + b'.to_sim', b'')
+    sequences = sc.script_state.setdefault('channel_sequence', {})
+    sequence = sequences.get(name, 0)
+    out = [sc.string_signals.get(name + b'.from_sim', b'')]
+    offset = 0
+    while offset + 8 <= len(data):
+        _, n = _frame_head.unpack_from(data, offset)
+        sequence += 1
+        out.append(_frame_head.pack(sequence, n))
+        out.append(data[offset + 8:offset + 8 + n])
+        offset += 8 + n
+    sequences[name] = sequence
+    sc.string_signals[name + b'.from_sim'] = b''.join(out)
+    return [len(out) // 2], [], [], b''
+
+
+def _observe(sc, spec):
+    # what vrepperObserve does in vrepper_rpc.lua
+    out = []
+    for h, code, frame in spec.tolist():
+        if code == 0:
+            out.extend(sc.simxGetObjectPosition(h, frame)[0])
+        elif code == 1:
+            out.extend(sc.simxGetObjectOrientation(h, frame)[0])
+        elif code == 2:
+            linear, angular = sc.simxGetObjectVelocity(h)
+            out.extend(linear + angular)
+        elif code == 3:
+            out.extend(sc.simxGetJointPosition(h))
+        elif code == 4:
+            out.extend(sc.simxGetJointForce(h))
+        elif code == 5:
+            _, force, torque = sc.simxReadForceSensor(h)
+            out.extend(force + torque)
+        elif code == 6:
+            detected, point = sc.simxReadProximitySensor(h)[:2]
+            out.extend([1., math.sqrt(sum(x * x for x in point))] if detected else [0., 0.])
+        else:
+            raise ValueError('(standin) unknown observation quantity ' + str(code))
+    return [np.array(out, np.float32)]
+
+
+script_functions = {
+    'vrepperObserve': _packed(_observe),
+    'echo': _echo,
+    'getObjectPose': _get_object_pose,
+    'getRobotState': _get_robot_state,
+    'displayMessage': _display_message,
+    # the same path, as a list of floats or packed
+    'samplePath': _sample_path,
+    'samplePath_packed': _packed(_sample_path_packed),
+    'echoArrays': _packed(lambda sc, *arrays: arrays),
+    'channelLoopback': _channel_loopback,
+}
+
+
+def _cart_pole(sc):
+    slider = sc.add_joint('slider', 'prismatic')
+    cart = sc.add_object('cart', sim_object_shape_type, slider.handle, (0., 0., 0.1))
+    # the pole starts slightly off balance
+    sc.add_pendulum('mass', sim_object_shape_type, cart.handle, 0.6, 0.05)
+
+
+def _body_joint_wheel(sc):
+    body = sc.add_object('body', sim_object_shape_type, -1, (0., 0., 0.2))
+    joint = sc.add_joint('joint', 'revolute', body.handle, (0.2, 0., 0.))
+    sc.add_object('wheel', sim_object_shape_type, joint.handle)
+
+
+# scene files shipped in /scenes, by file name
+scene_presets = {
+    'cart_pole.ttt': _cart_pole,
+    'body_joint_wheel.ttt': _body_joint_wheel,
+}
+
+
+def build_synthetic_scene(sc, query):
+    """
+    Build a scene from a 'standin:joints=N&cameras=M&resolution=WxH' description.
+    Joint k is named 'jointk' and carries a 'linkk' shape,
+    camera k is a vision sensor named 'camerak'.
+    """
+    opts = dict(kv.split('=', 1) for kv in query.split('&') if '=' in kv)
+    w, h = [int(v) for v in opts.get('resolution', '64x48').split('x')]
+    for k in range(int(opts.get('joints', 0))):
+        joint = sc.add_joint('joint' + str(k), 'revolute', -1, (0.1 * k, 0., 0.))
+        sc.add_object('link' + str(k), sim_object_shape_type, joint.handle, (0., 0., 0.1))
+    for k in range(int(opts.get('cameras', 0))):
+        sc.add_vision_sensor('camera' + str(k), (w, h), -1, (0., 0.1 * k, 1.))
+
+
+class connection(object):
+    def __init__(self, srv, sock):
+        self.server = srv
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        # streaming commands stored on the server side, by (cmd id, ident)
+        self.streams = {}
+
+    def send(self, replies):
+        srv = self.server
+        message = proto.pack_message(
+            replies,
+            server_time=int((time.time() - srv.started_at) * 1000) & 0x7fffffff,
+            scene_id=srv.scene.scene_id,
+            server_state=srv.scene.server_state())
+        with self.send_lock:
+            proto.send_message(self.sock, message)
+
+    def serve(self):
+        srv = self.server
+        try:
+            while True:
+                header, commands = proto.unpack_message(proto.recv_message(self.sock))
+                replies = []
+                finish = False
+                with srv.cond:
+                    # like V-REP, commands are handled between simulation steps: let triggered steps run first
+                    sc = srv.scene
+                    while srv.alive and sc.state == 'running' and sc.sync and sc.triggers > 0:
+                        srv.cond.wait(0.1)
+                    for cmd, ident, data, _, _ in commands:
+                        cmd_id, mode = cmd & proto.CMD_MASK, cmd & proto.OPMODE_MASK
+                        key = (cmd_id, ident)
+                        if mode == simx_opmode_discontinue:
+                            self.streams.pop(key, None)
+                            continue
+                        if mode == simx_opmode_streaming:
+                            self.streams[key] = (cmd, ident, data)
+                        name = proto.cmd_names[cmd_id]
+                        if name == 'simxFinish':
+                            finish = True
+                            continue
+                        replies.append(srv.execute(cmd, ident, data))
+                    if replies:
+                        self.send(replies)
+                if finish:
+                    break
+        except (EOFError, socket.error):
+            pass
+        finally:
+            with srv.cond:
+                if self in srv.connections:
+                    srv.connections.remove(self)
+            self.sock.close()
+
+
+class server(object):
+    def __init__(self, port, step_cost=0., stop_delay=0., bind='127.0.0.1'):
+        """
+        :param int port: port to listen to
+        :param str bind: address to listen on, '0.0.0.0' to accept remote clients like V-REP does
+        :param float step_cost: seconds each simulation step takes (the scene is locked meanwhile)
+        :param float stop_delay: seconds between a stop request and the simulation actually stopping
+        """
+        self.port = port
+        self.bind = bind
+        self.step_cost = step_cost
+        self.stop_delay = stop_delay
+        self.scene = scene()
+        self.cond = threading.Condition(threading.RLock())
+        self.connections = []
+        self.started_at = time.time()
+        self.alive = True
+
+    def execute(self, cmd, ident, data):
+        cmd_id = cmd & proto.CMD_MASK
+        name = proto.cmd_names[cmd_id]
+        ident_codes, in_codes, out_codes = proto.cmd_fields[name]
+        status = 0
+        out = b''
+        try:
+            args = proto.unpack_fields(ident_codes, ident) + proto.unpack_fields(in_codes, data)
+            if name == 'simxStopSimulation':
+                self.scene.stop(self.stop_delay)
+                outputs = []
+            elif name == 'simxSynchronous':
+                self.scene.sync = bool(args[0])
+                outputs = []
+            elif name == 'simxSynchronousTrigger':
+                if self.scene.sync:
+                    self.scene.triggers += 1
+                    self.cond.notify_all()
+                outputs = []
+            elif name == 'simxGetPingTime':
+                outputs = []
+            else:
+                outputs = getattr(self.scene, name)(*args)
+            out = proto.pack_fields(out_codes, outputs)
+        except Exception:
+            status = proto.STATUS_ERROR
+        return proto.pack_command(cmd, ident, out,
+                                  sim_time=int(self.scene.sim_time * 1000) & 0x7fffffff, status=status)
+
+    def publish_streams(self):
+        for conn in list(self.connections):
+            if conn.streams:
+                replies = [self.execute(cmd, ident, data) for cmd, ident, data in conn.streams.values()]
+                try:
+                    conn.send(replies)
+                except socket.error:
+                    pass
+
+    def simulate(self):
+        # the simulation loop, standing in for V-REP's main thread
+        sc = self.scene
+        while self.alive:
+            with self.cond:
+                if sc.state == 'stopping' and time.time() >= sc.stop_deadline:
+                    sc.finish_stop()
+                    self.publish_streams()
+                if sc.state == 'running' and (not sc.sync or sc.triggers > 0):
+                    if sc.sync:
+                        sc.triggers -= 1
+                    if self.step_cost > 0:
+                        time.sleep(self.step_cost)
+                    sc.step()
+                    self.publish_streams()
+                    self.cond.notify_all()
+                    if sc.sync:
+                        continue
+                self.cond.wait(0.005 if sc.state != 'running' or sc.sync else 0.001)
+
+    def serve_forever(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.bind, self.port))
+        listener.listen(16)
+
+        t = threading.Thread(target=self.simulate)
+        t.daemon = True
+        t.start()
+
+        print('(standin) remote API server listening on port', self.port)
+        try:
+            while self.alive:
+                sock, _ = listener.accept()
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn = connection(self, sock)
+                with self.cond:
+                    self.connections.append(conn)
+                t = threading.Thread(target=conn.serve)
+                t.daemon = True
+                t.start()
+        finally:
+            self.alive = False
+            listener.close()
+
+
+def parse_args(argv=None):
+    # accept the same arguments V-REP gets from vrepper
+    parser = argparse.ArgumentParser(description='V-REP remote API stand-in server', add_help=False)
+    parser.add_argument('-g', dest='service', default='REMOTEAPISERVERSERVICE_19997_FALSE_TRUE')
+    parser.add_argument('-h', dest='headless', action='store_true')
+    parser.add_argument('--step-cost-ms', type=float,
+                        default=float(os.environ.get('VREPPER_STANDIN_STEP_COST_MS', 0)))
+    parser.add_argument('--stop-delay-ms', type=float,
+                        default=float(os.environ.get('VREPPER_STANDIN_STOP_DELAY_MS', 0)))
+    parser.add_argument('--bind', default=os.environ.get('VREPPER_STANDIN_BIND', '127.0.0.1'))
+    args, _ = parser.parse_known_args(argv)
+    args.port = int(args.service.split('_')[1])
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    srv = server(args.port, args.step_cost_ms / 1000., args.stop_delay_ms / 1000., args.bind)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+# Record every simx* call made through a vrepper to a compact binary trace,
+# and replay it later (against V-REP or the stand-in server).
+#
+# Record:
+#   env = vrepper(headless=True, trace='run.trace')   # or env.start_trace('run.trace')
+#
+# Inspect / replay:
+#   $ python -m vrepper.trace summary run.trace
+#   $ python -m vrepper.trace replay run.trace --speed max
+#
+# File layout: MAGIC, then records. A name record (tag 0) introduces a function
+# name the first time it is used; a call record (tag 1) holds the function id,
+# the operation mode (-1 if the function has none), start time (relative to the
+# start of the trace) and duration in seconds, the return code, and the marshalled
+# (args, kwargs) without the clientID.
+
+import argparse
+import marshal
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = b'VRTRACE1'
+
+TAG_NAME = 0
+TAG_CALL = 1
+
+_tag = struct.Struct('<B')
+_name_record = struct.Struct('<H')
+_call_record = struct.Struct('<HiddiI')
+
+# connection management is done by vrepper itself, don't replay it
+NOT_REPLAYED = ('simxStart', 'simxFinish')
+
+# NumPy arrays are recorded as (ARRAY, dtype, shape, bytes), and replayed as arrays: images
+# and buffers go back as buffers, not as lists (that the functions would take differently)
+ARRAY = '__ndarray__'
+
+
+def _plain(value):
+    # marshal only knows the builtin types
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, np.ndarray):
+        return ARRAY, value.dtype.str, value.shape, np.ascontiguousarray(value).tobytes()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_plain(v) for v in value)
+    if isinstance(value, dict):
+        return dict((k, _plain(v)) for k, v in value.items())
+    if hasattr(value, 'tolist'):  # numpy scalars
+        return value.tolist()
+    return value
+
+
+def _restore(value):
+    # the inverse of _plain, for arrays
+    if isinstance(value, tuple) and len(value) == 4 and value[0] == ARRAY:
+        return np.frombuffer(value[3], value[1]).reshape(value[2])
+    if isinstance(value, (list, tuple)):
+        return type(value)(_restore(v) for v in value)
+    if isinstance(value, dict):
+        return dict((k, _restore(v)) for k, v in value.items())
+    return value
+
+
+def _retcode(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    return result if isinstance(result, int) else 0
+
+
+class tracewriter(object):
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'wb')
+        self.f.write(MAGIC)
+        self.names = {}
+        self.t0 = time.perf_counter()
+        self.calls = 0
+
+    def _name_id(self, name):
+        if name not in self.names:
+            self.names[name] = len(self.names)
+            encoded = name.encode('utf-8')
+            self.f.write(_tag.pack(TAG_NAME) + _name_record.pack(len(encoded)) + encoded)
+        return self.names[name]
+
+    def call(self, name, func, args, kwargs, opmode_index, cid=None):
+        """
+        Call func and record the call.
+
+        :param str name: name of the simx* function
+        :param tuple args: arguments, without the clientID
+        :param int opmode_index: position of operationMode in args, or None
+        :param cid: clientID to prepend to the arguments, None if the function takes none
+        """
+        t = time.perf_counter()
+        result = func(*args, **kwargs) if cid is None else func(cid, *args, **kwargs)
+        duration = time.perf_counter() - t
+
+        opmode = -1
+        if opmode_index is not None:
+            if len(args) > opmode_index:
+                opmode = args[opmode_index]
+            else:
+                opmode = kwargs.get('operationMode', -1)
+
+        blob = marshal.dumps((_plain(args), _plain(kwargs)))
+        self.f.write(_tag.pack(TAG_CALL) +
+                     _call_record.pack(self._name_id(name), opmode, t - self.t0, duration,
+                                       _retcode(result), len(blob)) +
+                     blob)
+        self.calls += 1
+        return result
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+
+def read_trace(path):
+    """
+    Iterate over the calls of a trace.
+
+    :returns: generator of tuples (name, args, kwargs, opmode, start, duration, retcode)
+    """
+    names = {}
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('(trace) not a vrepper trace: ' + path)
+        while True:
+            tag = f.read(_tag.size)
+            if not tag:
+                break
+            tag, = _tag.unpack(tag)
+            if tag == TAG_NAME:
+                n, = _name_record.unpack(f.read(_name_record.size))
+                names[len(names)] = f.read(n).decode('utf-8')
+            elif tag == TAG_CALL:
+                name_id, opmode, start, duration, retcode, n = _call_record.unpack(f.read(_call_record.size))
+                args, kwargs = _restore(marshal.loads(f.read(n)))
+                yield names[name_id], tuple(args), kwargs, opmode, start, duration, retcode
+            else:
+                raise ValueError('(trace) corrupted trace, unknown record tag ' + str(tag))
+
+
+def summarize(calls):
+    # per function: number of calls, total and mean time
+    stats = {}
+    for name, duration in calls:
+        count, total = stats.get(name, (0, 0.))
+        stats[name] = (count + 1, total + duration)
+    return stats
+
+
+def print_summary(stats, title, out=sys.stdout):
+    out.write('{}\n'.format(title))
+    out.write('  {:<32} {:>8} {:>12} {:>12}\n'.format('function', 'calls', 'total ms', 'mean us'))
+    for name, (count, total) in sorted(stats.items(), key=lambda kv: -kv[1][1]):
+        out.write('  {:<32} {:>8} {:>12.2f} {:>12.1f}\n'.format(name, count, total * 1e3, total / count * 1e6))
+
+
+def replay(path, env, speed='max'):
+    """
+    Issue the calls of a trace again through a started vrepper.
+
+    :param str path: trace file
+    :param vrepper env: started vrepper to replay the calls on
+    :param str speed: 'max' to issue calls back to back, 'recorded' to keep the recorded pacing
+    :returns: list of (name, duration) of the replayed calls
+    """
+    timings = []
+    t0 = time.perf_counter()
+    first = None
+    for name, args, kwargs, opmode, start, duration, retcode in read_trace(path):
+        if name in NOT_REPLAYED:
+            continue
+        if speed == 'recorded':
+            if first is None:
+                first = start
+            delay = (start - first) - (time.perf_counter() - t0)
+            if delay > 0:
+                time.sleep(delay)
+        func = getattr(env, name)
+        t = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append((name, time.perf_counter() - t))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='inspect or replay a vrepper trace')
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('summary', help='per-function statistics of a trace')
+    p.add_argument('trace')
+    p = sub.add_parser('replay', help='replay a trace on a new V-REP (or stand-in) instance')
+    p.add_argument('trace')
+    p.add_argument('--speed', choices=['max', 'recorded'], default='max')
+    p.add_argument('--port', type=int, default=None)
+    p.add_argument('--show', action='store_true', help='do not start V-REP headless')
+    args = parser.parse_args(argv)
+
+    if args.command == 'summary':
+        calls = [(c[0], c[5]) for c in read_trace(args.trace)]
+        print_summary(summarize(calls), '(trace) {} calls recorded in {}'.format(len(calls), args.trace))
+    elif args.command == 'replay':
+        from .vrepper import vrepper
+        recorded = [(c[0], c[5]) for c in read_trace(args.trace) if c[0] not in NOT_REPLAYED]
+        env = vrepper(port_num=args.port, headless=not args.show).start()
+        try:
+            t = time.perf_counter()
+            replayed = replay(args.trace, env, args.speed)
+            elapsed = time.perf_counter() - t
+        finally:
+            env.end()
+        print_summary(summarize(recorded), '(trace) recorded')
+        print_summary(summarize(replayed), '(trace) replayed {} calls in {:.3f} s'.format(len(replayed), elapsed))
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
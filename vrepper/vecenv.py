@@ -0,0 +1,291 @@
+# Vectorized environments: one worker process per environment, observations,
+# rewards and done flags in shared memory.
+#
+#   def make_env():          # must be picklable, e.g. a module level function
+#       return CartPoleVREPEnv(headless=True)
+#
+#   envs = vecenv([make_env] * 16)
+#   obs = envs.reset()                         # (16,) + observation shape
+#   obs, rewards, dones, infos = envs.step(actions)
+#   envs.close()
+#
+# An environment is anything with reset() -> observation, step(action) ->
+# (observation, reward, done, info) and optionally close() (gym style). Each
+# worker builds its environment, reports the observation and action shapes once,
+# then exchanges data through a single shared memory block: the learner writes
+# the actions, posts the worker's semaphore, and waits on the worker's own
+# "done" semaphore. Nothing is pickled per step, except non-empty info dicts.
+#
+# The arrays returned by reset() and step() are views of the shared memory:
+# they are overwritten by the next step. Copy them if you keep them around.
+#
+# With vecenv(..., auto_reset=True), an environment whose episode ends resets in its
+# worker in the background: the step returns its final observation (also in
+# info['final_observation']) with done=True right away, and the worker resets while
+# the learner works on the batch. The next step waits for the reset if it is not
+# over yet, then applies its action to the new episode; its info has the first
+# observation of that episode in info['reset_observation'].
+#
+# An environment whose step raises vrepper.simulator_fault (its simulator crashed
+# or hung, and was restarted by the vrepper watchdog) ends its episode there:
+# done=True, reward 0, the previous observation, and info['TimeLimit.truncated'].
+
+import multiprocessing
+import signal
+import sys
+import traceback
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+# commands to the workers
+CMD_STEP = 0
+CMD_RESET = 1
+CMD_CLOSE = 2
+
+# seconds between checks that a worker is still alive while waiting for it
+_ALIVE_CHECK_INTERVAL = 1.
+
+
+def _layout(n, obs_shape, obs_dtype, act_shape, act_dtype, auto_reset=False):
+    # name -> (offset, shape, dtype) of each array in the shared block, 64-byte aligned
+    arrays = [('obs', (n,) + tuple(obs_shape), obs_dtype),
+              ('actions', (n,) + tuple(act_shape), act_dtype),
+              ('rewards', (n,), 'float64'),
+              ('dones', (n,), 'bool'),
+              ('commands', (n,), 'int32'),
+              ('has_info', (n,), 'bool')]
+    if auto_reset:
+        arrays.append(('final_obs', (n,) + tuple(obs_shape), obs_dtype))
+    layout, offset = {}, 0
+    for name, shape, dtype in arrays:
+        layout[name] = (offset, shape, np.dtype(dtype))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset = (offset + 63) // 64 * 64
+    return layout, max(offset, 1)
+
+
+def _views(buf, layout):
+    return dict((name, np.ndarray(shape, dtype, buf, offset)) for name, (offset, shape, dtype) in layout.items())
+
+
+def _attach(name):
+    # the learner owns (and unlinks) the block. A worker must not track it: a tracker
+    # of its own would unlink the block when the worker exits, under the other workers.
+    # Older pythons always track, in the learner's tracker (started before the workers),
+    # which only cleans up once the learner is gone.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def _space(space, default):
+    if space is None or getattr(space, 'shape', None) is None:
+        return default
+    return tuple(space.shape), str(np.dtype(space.dtype))
+
+
+def _is_fault(e):
+    # only vrepper raises these, no need to import it if it isn't loaded
+    module = sys.modules.get(__package__ + '.vrepper')
+    return module is not None and isinstance(e, module.simulator_fault)
+
+
+def _worker(index, env_fn, conn, go, ready, auto_reset):
+    # exit through the finally below (closing the environment) when the learner terminates us
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    env = None
+    shm = None
+    try:
+        env = env_fn()
+        obs = np.asarray(env.reset())
+        act = _space(getattr(env, 'action_space', None), ((), 'float64'))
+        conn.send(('spec', (obs.shape, str(obs.dtype)) + act))
+
+        name, layout = conn.recv()
+        shm = _attach(name)
+        v = _views(shm.buf, layout)
+        v['obs'][index] = obs
+
+        # observation of an episode reset in the background, handed out with the next command
+        reset_obs = None
+        while True:
+            go.acquire()
+            command = v['commands'][index]
+            if command == CMD_CLOSE:
+                break
+            v['has_info'][index] = False
+            if command == CMD_RESET:
+                v['obs'][index] = env.reset() if reset_obs is None else reset_obs
+                reset_obs = None
+            else:
+                try:
+                    obs, reward, done, info = env.step(v['actions'][index])
+                except Exception as e:
+                    if not _is_fault(e):
+                        raise
+                    obs, reward, done = v['obs'][index].copy(), 0., True
+                    info = {'TimeLimit.truncated': True, 'simulator_fault': str(e)}
+                if reset_obs is not None:
+                    info = dict(info, reset_observation=reset_obs)
+                    reset_obs = None
+                v['obs'][index] = obs
+                v['rewards'][index] = reward
+                v['dones'][index] = done
+                v['has_info'][index] = bool(info)
+                if info:
+                    conn.send(('info', info))
+                if done and auto_reset:
+                    v['final_obs'][index] = obs
+                    ready.release()
+                    reset_obs = np.asarray(env.reset())
+                    continue
+            ready.release()
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+        ready.release()
+    finally:
+        if env is not None and hasattr(env, 'close'):
+            env.close()
+        if shm is not None:
+            del v
+            shm.close()
+
+
+class vecenv(object):
+    def __init__(self, env_fns, context=None, auto_reset=False):
+        """
+        :param list env_fns: one picklable function per environment, returning the environment
+        :param str context: multiprocessing start method ('fork', 'spawn', ...), None for the default
+        :param bool auto_reset: reset finished environments in the background (see above)
+        """
+        if shared_memory is None:
+            raise RuntimeError('(vecenv) multiprocessing.shared_memory requires python 3.8+')
+        ctx = multiprocessing.get_context(context)
+        # started now, the workers inherit it instead of starting their own
+        resource_tracker.ensure_running()
+        self.n = len(env_fns)
+        self.auto_reset = auto_reset
+        self.closed = False
+        self.shm = None
+        self.go = [ctx.Semaphore(0) for _ in env_fns]
+        self.ready = [ctx.Semaphore(0) for _ in env_fns]
+        self.conns, self.procs = [], []
+        for i, env_fn in enumerate(env_fns):
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=_worker, args=(i, env_fn, child, self.go[i], self.ready[i], auto_reset))
+            p.daemon = True
+            p.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(p)
+
+        try:
+            specs = [self._receive(i, 'spec') for i in range(self.n)]
+            if any(s != specs[0] for s in specs):
+                raise RuntimeError('(vecenv) environments have different observation or action shapes')
+            obs_shape, obs_dtype, act_shape, act_dtype = specs[0]
+            layout, size = _layout(self.n, obs_shape, obs_dtype, act_shape, act_dtype, auto_reset)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.views = _views(self.shm.buf, layout)
+            for conn in self.conns:
+                conn.send((self.shm.name, layout))
+        except Exception:
+            self.close()
+            raise
+
+        self.observation_shape, self.action_shape = tuple(obs_shape), tuple(act_shape)
+        self.waiting = False
+
+    def _receive(self, i, expected):
+        # next message of worker i, raising its error if it failed
+        while not self.conns[i].poll(_ALIVE_CHECK_INTERVAL):
+            if not self.procs[i].is_alive():
+                raise RuntimeError('(vecenv) worker {} died'.format(i))
+        kind, payload = self.conns[i].recv()
+        if kind == 'error':
+            raise RuntimeError('(vecenv) worker {} failed:\n{}'.format(i, payload))
+        if kind != expected:
+            raise RuntimeError('(vecenv) worker {} sent {} instead of {}'.format(i, kind, expected))
+        return payload
+
+    def _wait(self, i):
+        while not self.ready[i].acquire(timeout=_ALIVE_CHECK_INTERVAL):
+            if not self.procs[i].is_alive():
+                raise RuntimeError('(vecenv) worker {} died'.format(i))
+        if self.conns[i].poll():
+            # an error is the only message sent without a has_info flag
+            if not self.views['has_info'][i]:
+                self._receive(i, 'info')
+
+    def _send(self, command, indices):
+        for i in indices:
+            self.views['commands'][i] = command
+            self.go[i].release()
+
+    def reset(self):
+        """
+        :returns: observations, an array of shape (n,) + observation shape
+        """
+        self._send(CMD_RESET, range(self.n))
+        for i in range(self.n):
+            self._wait(i)
+        return self.views['obs']
+
+    def step_async(self, actions):
+        """
+        Start stepping every environment, get the results with step_wait().
+
+        :param actions: array-like of shape (n,) + action shape
+        """
+        self.views['actions'][:] = actions
+        self._send(CMD_STEP, range(self.n))
+        self.waiting = True
+
+    def step_wait(self):
+        """
+        :returns: tuple (observations, rewards, dones, infos)
+        """
+        infos = [{} for _ in range(self.n)]
+        for i in range(self.n):
+            self._wait(i)
+            if self.views['has_info'][i]:
+                infos[i] = self._receive(i, 'info')
+            if self.auto_reset and self.views['dones'][i]:
+                infos[i]['final_observation'] = self.views['final_obs'][i]
+        self.waiting = False
+        return self.views['obs'], self.views['rewards'], self.views['dones'], infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.shm is not None:
+            self._send(CMD_CLOSE, [i for i in range(self.n) if self.procs[i].is_alive()])
+        for p in self.procs:
+            p.join(30)
+            if p.is_alive():
+                p.terminate()
+        for conn in self.conns:
+            conn.close()
+        if self.shm is not None:
+            self.views = None
+            self.shm.close()
+            self.shm.unlink()
+
+    def __len__(self):
+        return self.n
+
+    def __del__(self):
+        self.close()
@@ -27,13 +27,12 @@
 # This file was automatically created for V-REP release V3.4.0 rev. 1 on April 5th 2017
 
 import platform
-import struct
 import sys
 import os
 import ctypes as ct
 from .vrepConst import *
 
-from version import VERSION, ARCH
+from .version import VERSION, ARCH
 
 #load library
 libsimx = None
@@ -166,6 +165,28 @@ c_GetObjectVelocity         = ct.CFUNCTYPE(ct.c_int32,ct.c_int32, ct.c_int32, ct
 c_CallScriptFunction        = ct.CFUNCTYPE(ct.c_int32,ct.c_int32,ct.POINTER(ct.c_char),ct.c_int32,ct.POINTER(ct.c_char),ct.c_int32,ct.POINTER(ct.c_int32),ct.c_int32,ct.POINTER(ct.c_float),ct.c_int32,ct.POINTER(ct.c_char),ct.c_int32,ct.POINTER(ct.c_ubyte),ct.POINTER(ct.c_int32), ct.POINTER(ct.POINTER(ct.c_int32)),ct.POINTER(ct.c_int32), ct.POINTER(ct.POINTER(ct.c_float)),ct.POINTER(ct.c_int32), ct.POINTER(ct.POINTER(ct.c_char)),ct.POINTER(ct.c_int32), ct.POINTER(ct.POINTER(ct.c_ubyte)),ct.c_int32)(("simxCallScriptFunction", libsimx))
 
 #API functions
+def _ubyte_buffer(value):
+    # (ctypes object, size in bytes) of a str or of any buffer (bytes, bytearray, NumPy array,
+    # memoryview...), sharing its memory when it can instead of passing one argument per byte
+    if type(value) is str:
+        value=value.encode('utf-8')
+    if type(value) is bytes:
+        return ct.c_char_p(value), len(value)
+    m=memoryview(value)
+    if not m.c_contiguous:
+        m=memoryview(m.tobytes())
+    m=m.cast('B')
+    if m.readonly:
+        return (ct.c_ubyte*m.nbytes).from_buffer_copy(m), m.nbytes
+    return (ct.c_ubyte*m.nbytes).from_buffer(m), m.nbytes
+
+def _bytearray_at(pointer, length):
+    # one bulk copy of length bytes of library memory (instead of a loop over the pointer)
+    a = bytearray(length)
+    if length > 0:
+        ct.memmove((ct.c_ubyte*length).from_buffer(a), pointer, length)
+    return a
+
 def simxGetJointPosition(clientID, jointHandle, operationMode):
     '''
     Please have a look at the function description/documentation in the V-REP user manual
@@ -298,26 +319,43 @@ def simxGetVisionSensorImage(clientID, sensorHandle, options, operationMode):
     resolution = (ct.c_int*2)()
     c_image  = ct.POINTER(ct.c_byte)()
     bytesPerPixel = 3
-    if (options and 1) != 0:
+    if (options & 1) != 0:
         bytesPerPixel = 1
     ret = c_GetVisionSensorImage(clientID, sensorHandle, resolution, ct.byref(c_image), options, operationMode)
 
     reso = []
     image = []
     if (ret == 0):
-        image = [None]*resolution[0]*resolution[1]*bytesPerPixel
-        for i in range(resolution[0] * resolution[1] * bytesPerPixel):
-            image[i] = c_image[i]
+        image = c_image[:resolution[0]*resolution[1]*bytesPerPixel]
         for i in range(2):
             reso.append(resolution[i])
     return ret, reso, image
 
+def _vision_sensor_image(clientID, sensorHandle, options, operationMode):
+    # simxGetVisionSensorImage with the image as a bytearray of unsigned bytes, copied
+    # in one go, instead of a list (for vrepper.camerarig)
+    resolution = (ct.c_int*2)()
+    c_image  = ct.POINTER(ct.c_byte)()
+    ret = c_GetVisionSensorImage(clientID, sensorHandle, resolution, ct.byref(c_image), options, operationMode)
+    if ret != 0:
+        return ret, [], bytearray()
+    bytesPerPixel = 1 if options & 1 else 3
+    return ret, [resolution[0], resolution[1]], _bytearray_at(c_image, resolution[0]*resolution[1]*bytesPerPixel)
+
 def simxSetVisionSensorImage(clientID, sensorHandle, image, options, operationMode):
     '''
     Please have a look at the function description/documentation in the V-REP user manual
     '''
-    size = len(image)
-    image_bytes  = (ct.c_byte*size)(*image)
+    if (sys.version_info[0] == 3) and not isinstance(image, (list, tuple)):
+        # bytes, bytearray, NumPy array...: passed as they are, not pixel by pixel
+        itemsize = memoryview(image).itemsize
+        if itemsize != 1:
+            raise TypeError('image buffers must have one byte per value, not {} (convert to uint8)'.format(itemsize))
+        image_bytes, size = _ubyte_buffer(image)
+        image_bytes = ct.cast(image_bytes, ct.POINTER(ct.c_byte))
+    else:
+        size = len(image)
+        image_bytes  = (ct.c_byte*size)(*image)
     return c_SetVisionSensorImage(clientID, sensorHandle, image_bytes, size, options, operationMode)
 
 def simxGetVisionSensorDepthBuffer(clientID, sensorHandle, operationMode):
@@ -964,8 +1002,7 @@ def simxGetStringSignal(clientID, signalName, operationMode):
 
     a = bytearray()
     if ret == 0:
-        for i in range(signalLength.value):
-            a.append(signalValue[i])
+        a = _bytearray_at(signalValue, signalLength.value)
     if sys.version_info[0] != 3:
         a=str(a)
 
@@ -984,8 +1021,7 @@ def simxGetAndClearStringSignal(clientID, signalName, operationMode):
 
     a = bytearray()
     if ret == 0:
-        for i in range(signalLength.value):
-            a.append(signalValue[i])
+        a = _bytearray_at(signalValue, signalLength.value)
     if sys.version_info[0] != 3:
         a=str(a)
 
@@ -1004,8 +1040,7 @@ def simxReadStringStream(clientID, signalName, operationMode):
 
     a = bytearray()
     if ret == 0:
-        for i in range(signalLength.value):
-            a.append(signalValue[i])
+        a = _bytearray_at(signalValue, signalLength.value)
     if sys.version_info[0] != 3:
         a=str(a)
 
@@ -1038,19 +1073,16 @@ def simxSetStringSignal(clientID, signalName, signalValue, operationMode):
     if sys.version_info[0] == 3:
         if type(signalName) is str:
             signalName=signalName.encode('utf-8')
-        if type(signalValue) is bytearray:
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
-        if type(signalValue) is str:
-            signalValue=signalValue.encode('utf-8')
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigV, sigL = _ubyte_buffer(signalValue)
     else:
         if type(signalValue) is bytearray:
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
         if type(signalValue) is str:
             signalValue=bytearray(signalValue)
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigL = len(signalValue)
     sigV=ct.cast(sigV,ct.POINTER(ct.c_ubyte)) # IronPython needs this
-    return c_SetStringSignal(clientID, signalName, sigV, len(signalValue), operationMode)
+    return c_SetStringSignal(clientID, signalName, sigV, sigL, operationMode)
 
 def simxAppendStringSignal(clientID, signalName, signalValue, operationMode):
     '''
@@ -1061,19 +1093,16 @@ def simxAppendStringSignal(clientID, signalName, signalValue, operationMode):
     if sys.version_info[0] == 3:
         if type(signalName) is str:
             signalName=signalName.encode('utf-8')
-        if type(signalValue) is bytearray:
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
-        if type(signalValue) is str:
-            signalValue=signalValue.encode('utf-8')
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigV, sigL = _ubyte_buffer(signalValue)
     else:
         if type(signalValue) is bytearray:
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
         if type(signalValue) is str:
             signalValue=bytearray(signalValue)
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigL = len(signalValue)
     sigV=ct.cast(sigV,ct.POINTER(ct.c_ubyte)) # IronPython needs this
-    return c_AppendStringSignal(clientID, signalName, sigV, len(signalValue), operationMode)
+    return c_AppendStringSignal(clientID, signalName, sigV, sigL, operationMode)
 
 def simxWriteStringStream(clientID, signalName, signalValue, operationMode):
     '''
@@ -1084,19 +1113,16 @@ def simxWriteStringStream(clientID, signalName, signalValue, operationMode):
     if sys.version_info[0] == 3:
         if type(signalName) is str:
             signalName=signalName.encode('utf-8')
-        if type(signalValue) is bytearray:
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
-        if type(signalValue) is str:
-            signalValue=signalValue.encode('utf-8')
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigV, sigL = _ubyte_buffer(signalValue)
     else:
         if type(signalValue) is bytearray:
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
         if type(signalValue) is str:
             signalValue=bytearray(signalValue)
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigL = len(signalValue)
     sigV=ct.cast(sigV,ct.POINTER(ct.c_ubyte)) # IronPython needs this
-    return c_WriteStringStream(clientID, signalName, sigV, len(signalValue), operationMode)
+    return c_WriteStringStream(clientID, signalName, sigV, sigL, operationMode)
 
 def simxGetObjectFloatParameter(clientID, objectHandle, parameterID, operationMode):
     '''
@@ -1272,25 +1298,21 @@ def simxQuery(clientID, signalName, signalValue, retSignalName, timeOutInMs):
             signalName=signalName.encode('utf-8')
         if type(retSignalName) is str:
             retSignalName=retSignalName.encode('utf-8')
-        if type(signalValue) is bytearray:
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
-        if type(signalValue) is str:
-            signalValue=signalValue.encode('utf-8')
-            sigV  = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigV, sigL = _ubyte_buffer(signalValue)
     else:
         if type(signalValue) is bytearray:
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
         if type(signalValue) is str:
             signalValue=bytearray(signalValue)
             sigV = (ct.c_ubyte*len(signalValue))(*signalValue)
+        sigL = len(signalValue)
     sigV=ct.cast(sigV,ct.POINTER(ct.c_ubyte)) # IronPython needs this
 
-    ret = c_Query(clientID, signalName, sigV, len(signalValue), retSignalName, ct.byref(retSignalValue), ct.byref(retSignalLength), timeOutInMs)
+    ret = c_Query(clientID, signalName, sigV, sigL, retSignalName, ct.byref(retSignalValue), ct.byref(retSignalLength), timeOutInMs)
 
     a = bytearray()
     if ret == 0:
-        for i in range(retSignalLength.value):
-            a.append(retSignalValue[i])
+        a = _bytearray_at(retSignalValue, retSignalLength.value)
     if sys.version_info[0] != 3:
         a=str(a)
 
@@ -1351,17 +1373,14 @@ def simxCallScriptFunction(clientID, scriptDescription, options, functionName, i
             scriptDescription=scriptDescription.encode('utf-8')
         if type(functionName) is str:
             functionName=functionName.encode('utf-8')
-        if type(inputBuffer) is bytearray:
-            inputBufferV  = (ct.c_ubyte*len(inputBuffer))(*inputBuffer)
-        if type(inputBuffer) is str:
-            inputBuffer=inputBuffer.encode('utf-8')
-            inputBufferV  = (ct.c_ubyte*len(inputBuffer))(*inputBuffer)
+        inputBufferV, inputBufferL = _ubyte_buffer(inputBuffer)
     else:
         if type(inputBuffer) is bytearray:
             inputBufferV = (ct.c_ubyte*len(inputBuffer))(*inputBuffer)
         if type(inputBuffer) is str:
             inputBuffer=bytearray(inputBuffer)
             inputBufferV = (ct.c_ubyte*len(inputBuffer))(*inputBuffer)
+        inputBufferL = len(inputBuffer)
     inputBufferV=ct.cast(inputBufferV,ct.POINTER(ct.c_ubyte)) # IronPython needs this
 
     c_inInts  = (ct.c_int*len(inputInts))(*inputInts)
@@ -1392,7 +1411,7 @@ def simxCallScriptFunction(clientID, scriptDescription, options, functionName, i
     bufferS = ct.c_int()
     bufferP = ct.POINTER(ct.c_ubyte)()
 
-    ret = c_CallScriptFunction(clientID,scriptDescription,options,functionName,len(inputInts),c_inInts,len(inputFloats),c_inFloats,len(inputStrings),c_inStrings,len(inputBuffer),inputBufferV,ct.byref(intDataC),ct.byref(intDataP),ct.byref(floatDataC),ct.byref(floatDataP),ct.byref(stringDataC),ct.byref(stringDataP),ct.byref(bufferS),ct.byref(bufferP),operationMode)
+    ret = c_CallScriptFunction(clientID,scriptDescription,options,functionName,len(inputInts),c_inInts,len(inputFloats),c_inFloats,len(inputStrings),c_inStrings,inputBufferL,inputBufferV,ct.byref(intDataC),ct.byref(intDataP),ct.byref(floatDataC),ct.byref(floatDataP),ct.byref(stringDataC),ct.byref(stringDataP),ct.byref(bufferS),ct.byref(bufferP),operationMode)
 
     if ret == 0:
         for i in range(intDataC.value):
@@ -1414,8 +1433,7 @@ def simxCallScriptFunction(clientID, scriptDescription, options, functionName, i
             else:
                 a=str(a)
             stringDataOut.append(a)
-        for i in range(bufferS.value):
-            bufferOut.append(bufferP[i])
+        bufferOut=_bytearray_at(bufferP, bufferS.value)
     if sys.version_info[0] != 3:
         bufferOut=str(bufferOut)
 
@@ -1436,52 +1454,5 @@ def simxGetObjectVelocity(clientID, objectHandle, operationMode):
         arr2.append(angularVel[i])
     return ret, arr1, arr2
 
-def simxPackInts(intList):
-    '''
-    Please have a look at the function description/documentation in the V-REP user manual
-    '''
-
-    if sys.version_info[0] == 3:
-        s=bytes()
-        for i in range(len(intList)):
-            s=s+struct.pack('<i',intList[i])
-        s=bytearray(s)
-    else:
-        s=''
-        for i in range(len(intList)):
-            s+=struct.pack('<i',intList[i])
-    return s
-
-def simxUnpackInts(intsPackedInString):
-    '''
-    Please have a look at the function description/documentation in the V-REP user manual
-    '''
-    b=[]
-    for i in range(int(len(intsPackedInString)/4)):
-        b.append(struct.unpack('<i',intsPackedInString[4*i:4*(i+1)])[0])
-    return b
-
-def simxPackFloats(floatList):
-    '''
-    Please have a look at the function description/documentation in the V-REP user manual
-    '''
-
-    if sys.version_info[0] == 3:
-        s=bytes()
-        for i in range(len(floatList)):
-            s=s+struct.pack('<f',floatList[i])
-        s=bytearray(s)
-    else:
-        s=''
-        for i in range(len(floatList)):
-            s+=struct.pack('<f',floatList[i])
-    return s
-
-def simxUnpackFloats(floatsPackedInString):
-    '''
-    Please have a look at the function description/documentation in the V-REP user manual
-    '''
-    b=[]
-    for i in range(int(len(floatsPackedInString)/4)):
-        b.append(struct.unpack('<f',floatsPackedInString[4*i:4*(i+1)])[0])
-    return b
+# vectorized, see packing.py
+from .packing import simxPackInts, simxUnpackInts, simxPackFloats, simxUnpackFloats
@@ -2,35 +2,56 @@
 # Python Wrapper
 # Qin Yongliang 20170410
 
+import os
+import sys
+
 # import the vrep library
-try:
-    print('trying to import vrep...')
-    from . import vrep
-
-    print('vrep imported.')
-except:
-    print ('--------------------------------------------------------------')
-    print ('"vrep.py" could not be imported. This means very probably that')
-    print ('either "vrep.py" or the remoteApi library could not be found.')
-    print ('Make sure both are in the same folder as this file,')
-    print ('or appropriately adjust the file "vrep.py"')
-    print ('--------------------------------------------------------------')
-    print ('')
-    raise
+# (VREPPER_API=standin selects the pure-Python client and the local stand-in
+# server instead, so that vrepper can run without V-REP installed)
+USING_STANDIN = os.environ.get('VREPPER_API', 'native') == 'standin'
+
+if USING_STANDIN:
+    from . import pyvrep as vrep
+else:
+    try:
+        print('trying to import vrep...')
+        from . import vrep
+
+        print('vrep imported.')
+    except:
+        print ('--------------------------------------------------------------')
+        print ('"vrep.py" could not be imported. This means very probably that')
+        print ('either "vrep.py" or the remoteApi library could not be found.')
+        print ('Make sure both are in the same folder as this file,')
+        print ('or appropriately adjust the file "vrep.py"')
+        print ('--------------------------------------------------------------')
+        print ('')
+        raise
 
 import functools
+import struct
 import subprocess as sp
+import time
 import warnings
-from inspect import getargspec
+import weakref
+
+try:
+    from inspect import getfullargspec as getargspec
+except ImportError:  # python 2
+    from inspect import getargspec
 
 from numpy import deg2rad, rad2deg
 
+from . import registry, rpc, simxproto
+
 list_of_instances = []
+# orphans of crashed sessions are killed before the first instance starts
+_reaped = [False]
 import atexit
 
 
 def cleanup():  # kill all spawned subprocesses on exit
-    for i in list_of_instances:
+    for i in list(list_of_instances):
         i.end()
 
 
@@ -58,36 +79,216 @@ def deprecated(msg=''):
     return deprecated
 
 
+# cores given to instances started with cpus='auto': the one with the fewest instances
+# pinned to it, counting those started by other processes (see registry).
+# None for every core this process may run on.
+instance_cores = None
+
+
+def _auto_core():
+    # (core, reservation in the registry, to hand to registry.register)
+    cores = instance_cores
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else range(os.cpu_count() or 1)
+    return registry.reserve_core(cores)
+
+
+def _read_proc(path):
+    try:
+        with open('/proc/' + path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _group_processes(pgid):
+    # (stat fields after the command name, status) of every process of a process group
+    try:
+        pids = [p for p in os.listdir('/proc') if p.isdigit()]
+    except OSError:
+        return []
+    processes = []
+    for pid in pids:
+        stat = _read_proc(pid + '/stat')
+        if stat is None:
+            continue
+        fields = stat.rsplit(')', 1)[1].split()
+        if int(fields[2]) != pgid:
+            continue
+        status = _read_proc(pid + '/status')
+        if status is not None:
+            processes.append((fields, status))
+    return processes
+
+
 # the class holding a subprocess instance.
 class instance():
-    def __init__(self, args):
+    def __init__(self, args, cpus=None, nice=None, memory_limit=None, cpu_time_limit=None, port=None):
+        """
+        :param int port: remote API port of the instance, recorded in the registry
+        :param cpus: cores the instance may run on: a core number, a list of them, 'auto'
+            for the least used core of instance_cores (chosen on start), or None for no pinning
+        :param int nice: niceness increment of the instance
+        :param int memory_limit: address space limit (RLIMIT_AS) of the instance, in bytes
+        :param int cpu_time_limit: CPU time limit (RLIMIT_CPU) of the instance, in seconds
+        """
         self.args = args
-        list_of_instances.append(self)
+        # 'auto': a core is chosen by start(), when the other instances are known
+        self.auto_pin = cpus == 'auto'
+        if self.auto_pin:
+            cpus = None
+        elif isinstance(cpus, int):
+            cpus = [cpus]
+        self.cpus = cpus
+        self.nice = nice
+        self.memory_limit = memory_limit
+        self.cpu_time_limit = cpu_time_limit
+        self.port = port
+        self.inst = None
+        self.last_usage = None
+
+    def _preexec(self):
+        # runs in the child, between fork and exec
+        import resource
+        if self.cpus is not None:
+            os.sched_setaffinity(0, self.cpus)
+        if self.nice:
+            os.nice(self.nice)
+        if self.memory_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+        if self.cpu_time_limit is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_time_limit, self.cpu_time_limit))
 
     def start(self):
+        if os.name == 'posix' and not _reaped[0]:
+            _reaped[0] = True
+            registry.reap_orphans()
         print('(instance) starting...')
+        reservation = None
+        if self.auto_pin:
+            core, reservation = _auto_core()
+            self.cpus = [core]
         try:
-            self.inst = sp.Popen(self.args)
-        except EnvironmentError:
-            print('(instance) Error: cannot find executable at', self.args[0])
+            preexec = None
+            if any(x is not None for x in (self.cpus, self.nice, self.memory_limit, self.cpu_time_limit)):
+                if os.name != 'posix' or (self.cpus is not None and not hasattr(os, 'sched_setaffinity')):
+                    raise RuntimeError('(instance) CPU pinning and resource limits are only supported on Linux')
+                preexec = self._preexec
+                if self.cpus is not None:
+                    print('(instance) pinned to cores', ','.join(str(c) for c in self.cpus))
+            try:
+                # in a process group of its own, so that end() kills V-REP and not just vrep.sh
+                self.inst = sp.Popen(self.args, preexec_fn=preexec, start_new_session=os.name == 'posix')
+            except EnvironmentError:
+                print('(instance) Error: cannot find executable at', self.args[0])
+                raise
+        except Exception:
+            if reservation is not None:
+                registry.unregister(reservation)
             raise
+        list_of_instances.append(self)
+        if os.name == 'posix':
+            registry.register(self.inst.pid, self.port, self.args, self.cpus, reservation)
 
         return self
 
     def isAlive(self):
-        return True if self.inst.poll() is None else False
+        return self.inst is not None and self.inst.poll() is None
 
-    def end(self):
+    def usage(self):
+        """
+        CPU and memory used by the instance, read from /proc (Linux only): V-REP and
+        everything in its process group, not only the vrep.sh wrapper.
+
+        :returns: dict with 'cpu_time' (seconds, including the children they waited for),
+            'cpu' (cores used since the previous call, or since start) and 'rss' (bytes),
+            None if unavailable
+        """
+        if self.inst is None or os.name != 'posix':
+            return None
+        processes = _group_processes(self.inst.pid)
+        if not processes:
+            return None
+        ticks = float(os.sysconf('SC_CLK_TCK'))
+        cpu_time, rss = 0., 0
+        for fields, status in processes:
+            # utime, stime, cutime, cstime
+            cpu_time += sum(int(x) for x in fields[11:15]) / ticks
+            for line in status.splitlines():
+                if line.startswith('VmRSS:'):
+                    rss += int(line.split()[1]) * 1024
+        # the process start time is in ticks since boot
+        now = time.time()
+        if self.last_usage is None:
+            uptime = float(_read_proc('uptime').split()[0])
+            since = (now - uptime + min(int(fields[19]) for fields, _ in processes) / ticks, 0.)
+        else:
+            since = self.last_usage
+        self.last_usage = (now, cpu_time)
+        elapsed = now - since[0]
+        # a process that exited without being waited for by the group takes its time with it
+        cpu = max(cpu_time - since[1], 0.) / elapsed if elapsed > 0 else 0.
+        return {'cpu_time': cpu_time, 'cpu': cpu, 'rss': rss}
+
+    def end(self, timeout=5.):
+        """
+        Terminate the instance and everything it started, killing what is still
+        running after timeout seconds.
+        """
+        if self.inst is None or self not in list_of_instances:
+            return self
+        list_of_instances.remove(self)
         print('(instance) terminating...')
-        if self.isAlive():
+        if os.name == 'posix':
+            # the wrapper may be gone already, not necessarily its children
+            registry.kill_group(self.inst.pid, timeout, self.inst)
+            registry.unregister(self.inst.pid)
+        elif self.isAlive():
             self.inst.terminate()
+        try:
+            retcode = self.inst.wait(timeout)
+        except sp.TimeoutExpired:
+            self.inst.kill()
             retcode = self.inst.wait()
-        else:
-            retcode = self.inst.returncode
         print('(instance) retcode:', retcode)
         return self
 
 
+def vrep_args(port_num, dir_vrep='', headless=False):
+    """
+    Command line that starts V-REP (or the stand-in server) with the remote API server on port_num.
+
+    :returns: list of arguments for subprocess
+    """
+    if USING_STANDIN:
+        print('(vrepper) using the local stand-in server instead of V-REP')
+        path_vrep = None
+    elif dir_vrep == '':
+        print('(vrepper) trying to find V-REP executable in your PATH')
+        import distutils.spawn as dsp
+        path_vrep = dsp.find_executable('vrep.sh')  # fix for linux
+        if path_vrep == None:
+            path_vrep = dsp.find_executable('vrep')
+    else:
+        path_vrep = dir_vrep + 'vrep'
+    print('(vrepper) path to your V-REP executable is:', path_vrep)
+
+    # start V-REP in a sub process
+    # vrep.exe -gREMOTEAPISERVERSERVICE_PORT_DEBUG_PREENABLESYNC
+    # where PORT -> 19997, DEBUG -> FALSE, PREENABLESYNC -> TRUE
+    # by default the server will start at 19997,
+    # use the -g argument if you want to start the server on a different port.
+    if USING_STANDIN:
+        args = [sys.executable, '-m', 'vrepper.standin']
+    else:
+        args = [path_vrep]
+    args.append('-gREMOTEAPISERVERSERVICE_' + str(port_num) + '_FALSE_TRUE')
+
+    if headless:
+        args.append('-h')
+    return args
+
+
 # class holding a v-rep simulation environment.
 import types, random
 import numpy as np
@@ -95,36 +296,95 @@ import numpy as np
 blocking = vrep.simx_opmode_blocking
 oneshot = vrep.simx_opmode_oneshot
 
+# communication settings, chosen with vrepper(latency=...)
+#   comm_thread_cycle: commThreadCycleInMs of simxStart, how often the remoteApi thread
+#                      exchanges data. Blocking calls (and so stepping) wait on it: 0 spins,
+#                      larger values sleep between cycles.
+#   timeout: timeOutInMs of simxStart
+#   poll_interval: sleep (in seconds) between two checks of the server state while
+#                  start_simulation waits for the previous simulation to stop
+latency_profiles = {
+    'low-latency': {'comm_thread_cycle': 0, 'timeout': 1000, 'poll_interval': 0.},
+    'balanced': {'comm_thread_cycle': 1, 'timeout': 2000, 'poll_interval': 0.001},
+    'low-cpu': {'comm_thread_cycle': 5, 'timeout': 5000, 'poll_interval': 0.01},
+}
+
+# values of sim_intparam_dynamic_engine
+physics_engines = {'bullet': 0, 'ode': 1, 'vortex': 2, 'newton': 3}
+
+# server side features switched by vrepper.set_performance_profile(...), as sim_boolparam_* values
+performance_profiles = {
+    # nothing but the simulation itself, as fast as possible
+    'turbo': {
+        vrep.sim_boolparam_display_enabled: False,
+        vrep.sim_boolparam_realtime_simulation: False,
+        vrep.sim_boolparam_vision_sensor_handling_enabled: False,
+        vrep.sim_boolparam_distance_handling_enabled: False,
+        vrep.sim_boolparam_threaded_rendering_enabled: False,
+    },
+    # same, but vision sensors still work (for image observations)
+    'vision': {
+        vrep.sim_boolparam_display_enabled: False,
+        vrep.sim_boolparam_realtime_simulation: False,
+        vrep.sim_boolparam_vision_sensor_handling_enabled: True,
+        vrep.sim_boolparam_distance_handling_enabled: False,
+        vrep.sim_boolparam_threaded_rendering_enabled: False,
+    },
+}
+
+
+class simulator_fault(RuntimeError):
+    # raised by a vrepper with a watchdog when the simulator crashed or hung during a
+    # call. The simulator has been restarted: the episode in progress is lost, treat it
+    # as truncated and reset.
+    pass
+
 
 class vrepper():
-    def __init__(self, port_num=None, dir_vrep='', headless=False):
+    def __init__(self, port_num=None, dir_vrep='', headless=False, trace=None, latency='low-latency',
+                 host='127.0.0.1', launch=True, read_cache=False, write_tolerance=None,
+                 cpus=None, nice=None, memory_limit=None, cpu_time_limit=None, watchdog=None):
+        """
+        :param str latency: name of a latency profile (see latency_profiles), or a dict
+            overriding some of the settings of 'low-latency'
+        :param str host: address of the remote API server
+        :param bool launch: start V-REP ourselves. False to connect to a server started
+            elsewhere, e.g. an endpoint handed out by vrepper.scheduler
+        :param bool read_cache: remember what the vrepobject getters read until the next
+            simulation step (see invalidate_read_cache)
+        :param float write_tolerance: None to send every vrepobject setter call. Otherwise,
+            skip calls whose value differs from the last one sent by at most this much
+        :param cpus, nice, memory_limit, cpu_time_limit: CPU pinning ('auto' for the least used core),
+            niceness and resource limits of the V-REP process, see instance
+        :param float watchdog: None to let failed calls fail. Otherwise, when a call fails,
+            check the simulator (see check_health, a ping may take this many seconds), and
+            if it crashed or hung, restart it and raise simulator_fault
+        """
+        if not launch and port_num is None:
+            raise ValueError('(vrepper) port_num is required when not launching V-REP')
+
+        if isinstance(latency, dict):
+            profile = dict(latency_profiles['low-latency'])
+            profile.update(latency)
+            latency = profile
+        elif latency in latency_profiles:
+            latency = latency_profiles[latency]
+        else:
+            raise ValueError('(vrepper) unknown latency profile {}, use one of {}'.format(
+                latency, ', '.join(sorted(latency_profiles))))
+        self.latency = latency
+
         if port_num is None:
             port_num = int(random.random() * 1000 + 19999)
 
         self.port_num = port_num
 
-        if dir_vrep == '':
-            print('(vrepper) trying to find V-REP executable in your PATH')
-            import distutils.spawn as dsp
-            path_vrep = dsp.find_executable('vrep.sh')  # fix for linux
-            if path_vrep == None:
-                path_vrep = dsp.find_executable('vrep')
-        else:
-            path_vrep = dir_vrep + 'vrep'
-        print('(vrepper) path to your V-REP executable is:', path_vrep)
+        self.host = host
+        self.launch = launch
 
-        # start V-REP in a sub process
-        # vrep.exe -gREMOTEAPISERVERSERVICE_PORT_DEBUG_PREENABLESYNC
-        # where PORT -> 19997, DEBUG -> FALSE, PREENABLESYNC -> TRUE
-        # by default the server will start at 19997,
-        # use the -g argument if you want to start the server on a different port.
-        args = [path_vrep, '-gREMOTEAPISERVERSERVICE_' + str(self.port_num) + '_FALSE_TRUE']
-
-        if headless:
-            args.append('-h')
-
-        # instance created but not started.
-        self.instance = instance(args)
+        # instance created but not started (None when connecting to a server started elsewhere)
+        self.instance = instance(vrep_args(self.port_num, dir_vrep, headless), cpus, nice,
+                                 memory_limit, cpu_time_limit, self.port_num) if launch else None
 
         self.cid = -1
         # clientID of the instance when connected to server,
@@ -132,46 +392,88 @@ class vrepper():
 
         self.started = False
 
-        # is the simulation currently running (as far as we know)
+        # is the simulation currently running (as far as we know), and in synchronous mode
         self.sim_running = False
+        self.sim_sync = False
 
-        # assign every API function call from vrep to self
-        vrep_methods = [a for a in dir(vrep) if
-                        not a.startswith('__') and isinstance(getattr(vrep, a), types.FunctionType)]
+        # values read by vrepobject getters in this step, by (handle, quantity, relative_to)
+        self.read_cache = {} if read_cache else None
 
-        def assign_from_vrep_to_self(name):
-            wrapee = getattr(vrep, name)
-            arg0 = getargspec(wrapee)[0][0]
-            if arg0 == 'clientID':
-                def func(*args, **kwargs):
-                    return wrapee(self.cid, *args, **kwargs)
-            else:
-                def func(*args, **kwargs):
-                    return wrapee(*args, **kwargs)
-            setattr(self, name, func)
+        # last value sent by vrepobject setters, by (handle, quantity)
+        self.write_tolerance = write_tolerance
+        self.last_writes = {}
+
+        # performance profile in use, and the parameter values it replaced
+        self.performance_profile = None
+        self.performance_params = None
+        self.saved_bool_params = {}
+
+        # counters reported by stats()
+        self.counters = {'read_cache_hits': 0, 'read_cache_misses': 0, 'writes_sent': 0, 'writes_suppressed': 0,
+                         'restarts': 0, 'camera_resubscribes': 0}
+
+        # last scene loaded, reloaded by restart()
+        self.scene = None
+
+        self.watchdog = watchdog
+        # checking or restarting the simulator, don't watch the calls made meanwhile
+        self.watching = False
+
+        # records every simx* call when tracing (see trace.py)
+        self.tracer = None
+        if trace is not None:
+            self.start_trace(trace)
+
+        # one wrapper per object handle, as long as someone uses it
+        self.objects = weakref.WeakValueDictionary()
+        # handles of the objects looked up by name, until the next scene load
+        self.handles_by_name = {}
+
+        # streaming commands started through this vrepper, (args, kwargs) of the
+        # last call by (function name, identification arguments)
+        self.streams = {}
+
+        # script function calls waiting for their reply, by (script name, function name)
+        self.script_calls = {}
+
+    def start_trace(self, path):
+        """
+        Record every simx* call made through this vrepper to a binary trace file.
+        Replay it with "python -m vrepper.trace replay <path>".
+
+        :param str path: trace file to write
+        """
+        from .trace import tracewriter
+        self.stop_trace()
+        self.tracer = tracewriter(path)
+        print('(vrepper) tracing simx* calls to', path)
 
-        for name in vrep_methods:
-            assign_from_vrep_to_self(name)
+    def stop_trace(self):
+        if self.tracer is not None:
+            self.tracer.close()
+            print('(vrepper) trace closed,', self.tracer.calls, 'calls recorded')
+            self.tracer = None
 
     # start everything
     def start(self):
         if self.started == True:
             raise RuntimeError('you should not call start() more than once')
 
-        print('(vrepper)starting an instance of V-REP...')
-        self.instance.start()
+        if self.instance is not None:
+            print('(vrepper)starting an instance of V-REP...')
+            self.instance.start()
 
         # try to connect to V-REP instance via socket
         retries = 0
         while True:
-            print ('(vrepper)trying to connect to server on port', self.port_num, 'retry:', retries)
+            print ('(vrepper)trying to connect to server on', self.host, 'port', self.port_num, 'retry:', retries)
             # vrep.simxFinish(-1) # just in case, close all opened connections
             self.cid = self.simxStart(
-                '127.0.0.1', self.port_num,
+                self.host, self.port_num,
                 waitUntilConnected=True,
                 doNotReconnectOnceDisconnected=True,
-                timeOutInMs=1000,
-                commThreadCycleInMs=0)  # Connect to V-REP
+                timeOutInMs=self.latency['timeout'],
+                commThreadCycleInMs=self.latency['comm_thread_cycle'])  # Connect to V-REP
 
             if self.cid != -1:
                 print ('(vrepper)Connected to remote API server!')
@@ -205,19 +507,30 @@ class vrepper():
     # kill everything, clean up
     def end(self):
         print('(vrepper) shutting things down...')
+        # from now on failed calls are expected, the watchdog stays out of the way
+        self.started = False
         # Before closing the connection to V-REP, make sure that the last command sent out had time to arrive. You can guarantee this with (for example):
         # vrep.simxGetPingTime(clientID)
 
         # Now close the connection to V-REP:
         if self.sim_running:
             self.stop_simulation()
+        self.stop_streams()
         self.simxFinish()
-        self.instance.end()
+        self.stop_trace()
+        if self.instance is not None:
+            self.instance.end()
         print('(vrepper) everything shut down.')
         return self
 
     def load_scene(self, fullpathname):
         print('(vrepper) loading scene from', fullpathname)
+        self.stop_streams()
+        self.invalidate_read_cache()
+        self.last_writes.clear()
+        self.handles_by_name.clear()
+        self.script_calls.clear()
+        self.scene = fullpathname
         try:
             check_ret(self.simxLoadScene(fullpathname,
                                          0,  # assume file is at server side
@@ -237,6 +550,21 @@ class vrepper():
         # IMPORTANT
         # you should poll the server state to make sure
         # the simulation completely stops before starting a new one
+        self.wait_until_stopped()
+
+        # enter sync mode
+        check_ret(self.simxSynchronous(is_sync))
+        check_ret(self.simxStartSimulation(blocking))
+        self.sim_running = True
+        self.sim_sync = is_sync
+        self.invalidate_read_cache()
+        # the scene was restored when the last simulation stopped, resend everything
+        self.last_writes.clear()
+
+    def wait_until_stopped(self):
+        """
+        Wait until the previous simulation is completely stopped (stopping takes a while).
+        """
         while True:
             # poll the useless signal (to receive a message from server)
             check_ret(self.simxGetIntegerSignal(
@@ -252,10 +580,8 @@ class vrepper():
             if not not_stopped:
                 break
 
-        # enter sync mode
-        check_ret(self.simxSynchronous(is_sync))
-        check_ret(self.simxStartSimulation(blocking))
-        self.sim_running = True
+            if self.latency['poll_interval'] > 0:
+                time.sleep(self.latency['poll_interval'])
 
     def make_simulation_synchronous(self, sync):
         if not self.sim_running:
@@ -263,10 +589,14 @@ class vrepper():
             self.start_simulation(sync)
         else:
             check_ret(self.simxSynchronous(sync))
+            self.sim_sync = sync
 
     def stop_simulation(self):
+        self.stop_streams()
         check_ret(self.simxStopSimulation(oneshot), ignore_one=True)
         self.sim_running = False
+        self.invalidate_read_cache()
+        self.last_writes.clear()
 
     @deprecated('Please use method "stop_simulation" instead.')
     def stop_blocking_simulation(self):
@@ -274,9 +604,241 @@ class vrepper():
 
     def step_blocking_simulation(self):
         check_ret(self.simxSynchronousTrigger())
+        self.invalidate_read_cache()
+
+    def invalidate_read_cache(self, handle=None):
+        """
+        Forget cached reads (all of them, or those of one object). Steps, simulation
+        start/stop, scene loads and vrepobject setters do this already; call it after
+        changing the scene through the simx* functions directly.
+
+        :param int handle: only forget the reads of this object
+        """
+        if not self.read_cache:
+            return
+        if handle is None:
+            self.read_cache.clear()
+        else:
+            for key in [k for k in self.read_cache if k[0] == handle]:
+                del self.read_cache[key]
+
+    def stop_streams(self):
+        """
+        Discontinue every streaming command started through this vrepper and drop
+        their replies from the inbox. Done on stop_simulation, load_scene and end.
+        """
+        streams, self.streams = self.streams, {}
+        for (name, _), (args, kwargs) in streams.items():
+            func = getattr(self, name)
+            index = _opmode_indices[name]
+            for opmode in (vrep.simx_opmode_discontinue, vrep.simx_opmode_remove):
+                if len(args) > index:
+                    args = args[:index] + (opmode,) + args[index + 1:]
+                else:
+                    kwargs = dict(kwargs, operationMode=opmode)
+                func(*args, **kwargs)
+
+    def inbox_stats(self):
+        """
+        :returns: dict with the number of active streaming commands, and the number and
+            size in bytes of the replies stored in the inbox (None when the remoteApi
+            library doesn't tell)
+        """
+        stored, size = None, None
+        if hasattr(vrep, '_inbox_stats'):
+            stored, size = vrep._inbox_stats(self.cid)
+        return {'streams': len(self.streams), 'stored_replies': stored, 'inbox_bytes': size}
+
+    def _check_stopped(self, what):
+        if self.sim_running:
+            raise RuntimeError('(vrepper) {} can only be changed while the simulation is stopped'.format(what))
+
+    def set_time_step(self, dt):
+        """
+        Set the simulation time step. In V-REP the scene must use a custom time step
+        (simulation settings dialog) for this to have an effect.
+
+        :param float dt: seconds per simulation step
+        """
+        self._check_stopped('the time step')
+        check_ret(self.simxSetFloatingParameter(vrep.sim_floatparam_simulation_time_step, dt, blocking))
+
+    def get_time_step(self):
+        dt, = check_ret(self.simxGetFloatingParameter(vrep.sim_floatparam_simulation_time_step, blocking))
+        return dt
+
+    def set_physics_engine(self, engine):
+        """
+        :param str engine: 'bullet', 'ode', 'vortex' or 'newton'
+        """
+        if engine not in physics_engines:
+            raise ValueError('(vrepper) unknown physics engine {}, use one of {}'.format(
+                engine, ', '.join(sorted(physics_engines))))
+        self._check_stopped('the physics engine')
+        check_ret(self.simxSetIntegerParameter(vrep.sim_intparam_dynamic_engine, physics_engines[engine], blocking))
+
+    def get_physics_engine(self):
+        value, = check_ret(self.simxGetIntegerParameter(vrep.sim_intparam_dynamic_engine, blocking))
+        for name, v in physics_engines.items():
+            if v == value:
+                return name
+        return value
+
+    def get_dynamics_substeps(self):
+        """
+        :returns: number of dynamics steps per simulation step (set in V-REP's dynamics
+            settings, the remote API can only read it)
+        """
+        n, = check_ret(self.simxGetIntegerParameter(vrep.sim_intparam_dynamic_step_divider, blocking))
+        return n
+
+    def set_gravity(self, gravity):
+        """
+        :param gravity: vector (x, y, z) in m/s^2
+        """
+        self._check_stopped('gravity')
+        check_ret(self.simxSetArrayParameter(vrep.sim_arrayparam_gravity, list(gravity), blocking))
+
+    def get_gravity(self):
+        gravity, = check_ret(self.simxGetArrayParameter(vrep.sim_arrayparam_gravity, blocking))
+        return gravity
+
+    def set_dynamics_enabled(self, enabled):
+        check_ret(self.simxSetBooleanParameter(vrep.sim_boolparam_dynamics_handling_enabled, enabled, blocking))
+
+    def _set_bool_params(self, params):
+        # one message of oneshot commands, then wait until the server has handled it
+        check_ret(self.simxPauseCommunication(True))
+        try:
+            for param, value in params.items():
+                self.simxSetBooleanParameter(param, value, oneshot)
+        finally:
+            check_ret(self.simxPauseCommunication(False))
+        self.simxGetPingTime()
+
+    def set_performance_profile(self, profile='turbo'):
+        """
+        Switch off server side features we don't need (display, real-time pacing,
+        vision sensors, distance calculations, threaded rendering).
+
+        :param profile: name of a profile in performance_profiles, or a dict of
+            sim_boolparam_* -> bool
+        """
+        if isinstance(profile, dict):
+            name, params = 'custom', profile
+        elif profile in performance_profiles:
+            name, params = profile, performance_profiles[profile]
+        else:
+            raise ValueError('(vrepper) unknown performance profile {}, use one of {}'.format(
+                profile, ', '.join(sorted(performance_profiles))))
+
+        # remember the original values, once, so that restore goes back to them
+        for param in params:
+            if param not in self.saved_bool_params:
+                value, = check_ret(self.simxGetBooleanParameter(param, blocking))
+                self.saved_bool_params[param] = value
+
+        self._set_bool_params(params)
+        self.performance_profile = name
+        self.performance_params = params
+        print('(vrepper) performance profile:', name)
+
+    def restore_performance_profile(self):
+        """
+        Set the parameters changed by set_performance_profile back to what they were.
+        """
+        if self.saved_bool_params:
+            self._set_bool_params(self.saved_bool_params)
+        self.saved_bool_params = {}
+        self.performance_profile = None
+        self.performance_params = None
+
+    def stats(self):
+        """
+        :returns: dict of counters (read cache hits and misses, setter calls sent and
+            suppressed, simulator restarts, cameras a camerarig had to stream again),
+            and the performance profile in use
+        """
+        stats = dict(self.counters)
+        stats['performance_profile'] = self.performance_profile
+        return stats
+
+    def check_health(self):
+        """
+        :returns: None if the simulator is fine, otherwise what is wrong with it
+            (not started, exited, connection lost, not answering a ping within watchdog
+            seconds, 5 without a watchdog)
+        """
+        watching, self.watching = self.watching, True
+        try:
+            if self.instance is not None and self.instance.inst is None:
+                return 'the simulator was not started'
+            if self.instance is not None and not self.instance.isAlive():
+                return 'the simulator exited with code {}'.format(self.instance.inst.returncode)
+            if self.simxGetConnectionId() == -1:
+                return 'the connection to the simulator was lost'
+            # a ping of our own rather than simxGetPingTime, which would wait for the
+            # timeout of the connection: any reply to the useless signal will do
+            deadline = time.time() + (self.watchdog or 5.)
+            self.simxGetIntegerSignal('asdf', vrep.simx_opmode_remove)
+            self.simxGetIntegerSignal('asdf', oneshot)
+            while self.simxGetIntegerSignal('asdf', vrep.simx_opmode_buffer)[0] & vrep.simx_return_novalue_flag:
+                if time.time() > deadline:
+                    return 'the simulator is not responding'
+                time.sleep(0.001)
+            return None
+        finally:
+            self.watching = watching
+
+    def restart(self, reason='restart requested'):
+        """
+        Restart the simulator (or reconnect to it, if started elsewhere), reload the last
+        scene and apply the performance profile again. The simulation is left stopped.
+        Object handles stay valid: reloading a scene gives its objects the same handles.
+        Other settings changed through the remote API (time step, ...) are lost.
+        """
+        print('(vrepper) restarting the simulator:', reason)
+        self.counters['restarts'] += 1
+        self.watching = True
+        try:
+            self.simxFinish()
+            if self.instance is not None:
+                self.instance.end()
+            self.started = False
+            self.sim_running = False
+            self.sim_sync = False
+            # the streams and the pending script calls died with the connection
+            self.streams.clear()
+            self.script_calls.clear()
+            self.invalidate_read_cache()
+            self.last_writes.clear()
+
+            self.start()
+            if self.scene is not None:
+                self.load_scene(self.scene)
+            # the scene is back to the values saved by set_performance_profile
+            if self.performance_params is not None:
+                self._set_bool_params(self.performance_params)
+        finally:
+            self.watching = False
+        return self
+
+    def _watch(self, name, result):
+        # after each simx* call when there is a watchdog
+        ret = result[0] if isinstance(result, tuple) else result
+        if self.watching or not self.started or not ret & _FAULT_FLAGS:
+            return
+        reason = self.check_health()
+        if reason is None:
+            return
+        self.restart(reason)
+        raise simulator_fault('(vrepper) {} failed: {}. It was restarted, the episode is lost.'.format(name, reason))
 
     def get_object_handle(self, name):
-        handle, = check_ret(self.simxGetObjectHandle(name, blocking))
+        handle = self.handles_by_name.get(name)
+        if handle is None:
+            handle, = check_ret(self.simxGetObjectHandle(name, blocking))
+            self.handles_by_name[name] = handle
         return handle
 
     def get_object_by_handle(self, handle, is_joint=True):
@@ -287,7 +849,11 @@ class vrepper():
         :param bool is_joint: True if the object is a joint that can be moved
         :returns: vrepobject
         """
-        return vrepobject(self, handle, is_joint)
+        key = (handle, is_joint)
+        obj = self.objects.get(key)
+        if obj is None:
+            obj = self.objects[key] = vrepobject(self, handle, is_joint)
+        return obj
 
     def get_object_by_name(self, name, is_joint=True):
         """
@@ -299,6 +865,49 @@ class vrepper():
         """
         return self.get_object_by_handle(self.get_object_handle(name), is_joint)
 
+    def group(self, objects, is_joint=True):
+        """
+        Get a group of objects, to read or write all of them in one message
+
+        :param list objects: names, handles or vrepobjects
+        :param bool is_joint: True if all the objects are joints that can be moved
+        :returns: objectgroup
+        """
+        return objectgroup(self, [self._handle(o) for o in objects], is_joint)
+
+    def _handle(self, o):
+        # handle of a name, handle or vrepobject
+        if isinstance(o, vrepobject):
+            return o.handle
+        if isinstance(o, str):
+            return self.get_object_handle(o)
+        return int(o)
+
+    def observation(self, spec, script_name="remoteApiCommandServer"):
+        """
+        Compile an observation spec: everything it lists is then read with a single
+        script call per step (vrepperObserve, defined by vrepper_rpc.lua), into one
+        float32 array.
+
+        :param list spec: (object, quantity) or (object, quantity, frame) tuples. objects
+            and frames are names, handles or vrepobjects, frame None for the world.
+            quantities are those of observation_quantities
+        :returns: observation, call read() every step
+        """
+        return observation(self, spec, script_name)
+
+    def camera_rig(self, cameras, grayscale=False, resolution=None):
+        """
+        Read several vision sensors together (see camerarig).
+
+        :param list cameras: names, handles or vrepobjects of vision sensors
+        :param bool grayscale: one channel instead of three (options=1)
+        :param tuple resolution: (width, height) to set on every camera, e.g. lower than
+            the one of the scene to downsample, restored by camerarig.close()
+        :returns: camerarig, call capture() every step
+        """
+        return camerarig(self, [self._handle(c) for c in cameras], grayscale, resolution)
+
     @staticmethod
     def create_params(ints=[], floats=[], strings=[], bytes=''):
         if bytes == '':
@@ -336,6 +945,183 @@ class vrepper():
             blocking
         ))
 
+    def call_script_function_async(self, function_name, params, script_name="remoteApiCommandServer",
+                                   convert=None, lanes=1):
+        """
+        Same as call_script_function, without waiting for the reply: the call is sent
+        right away and its reply collected later, so that calls made one after the other
+        share the round trip.
+
+        The remote API keeps one reply per script and function name: a call to a function
+        waiting for a reply first waits for it. To have several calls of the same function
+        in flight, the script answers it under more names (vrepper_rpc.lanes(name, n) in
+        vrepper_rpc.lua gives it name#1 ... name#(n-1)), and calls go to a free one.
+
+        :param convert: function applied to the result tuple (res_ints, res_floats,
+            res_strs, res_bytes) before result() returns it
+        :param int lanes: number of names the script answers the function under
+        :returns: script_future
+        """
+        assert type(params) is tuple
+        assert len(params) == 4
+
+        keys = [(script_name, function_name)] + [
+            (script_name, '{}#{}'.format(function_name, k)) for k in range(1, lanes)]
+        free = [key for key in keys if key not in self.script_calls]
+        if free:
+            key = free[0]
+        else:
+            # the oldest call on these names (script_calls is in the order of sending)
+            key = next(k for k in self.script_calls if k in keys)
+            self.script_calls[key].wait()
+        name = key[1]
+        # no stale reply of an earlier call
+        self.simxCallScriptFunction(script_name, vrep.sim_scripttype_childscript, name,
+                                    [], [], [], bytearray(), vrep.simx_opmode_remove)
+        self.simxCallScriptFunction(script_name, vrep.sim_scripttype_childscript, name,
+                                    params[0], params[1], params[2], params[3], oneshot)
+        future = script_future(self, key, convert)
+        self.script_calls[key] = future
+        return future
+
+    def gather(self, futures, timeout=10.):
+        """
+        :param list futures: script_futures
+        :returns: list of their results, in the same order
+        """
+        # replies come back in order: once one is in, the earlier ones are too
+        return [f.result(timeout) for f in futures]
+
+    def remote_function(self, function_name, args=(), returns=(), script_name="remoteApiCommandServer", lanes=1):
+        """
+        Declare a script function taking and returning NumPy arrays, packed in the buffer
+        argument (see rpc.py; the script wraps the function with vrepper_rpc.lua).
+
+        :param list args: dtype of each argument ('uint8', 'int32', 'float32' or 'float64')
+        :param list returns: dtype, or (dtype, shape), of each result
+        :param int lanes: calls of call_async in flight at once, see call_script_function_async
+        :returns: rpc.remote_function, call it with the arguments
+        """
+        return rpc.remote_function(self, function_name, args, returns, script_name, lanes)
+
+    def get_signal_array(self, signal_name, dtype='float32', shape=None, clear=False):
+        """
+        Read a string signal holding packed values (e.g. written with simPackFloatTable)
+        as a NumPy array, without going through a list.
+
+        :param dtype: type of the values, little-endian
+        :param tuple shape: shape of one item, the array is then (n,) + shape
+        :param bool clear: clear the signal once read (simxGetAndClearStringSignal)
+        :returns: array, a view of the received bytes
+        """
+        func = self.simxGetAndClearStringSignal if clear else self.simxGetStringSignal
+        data, = check_ret(func(signal_name, blocking))
+        return _as_array(data, dtype, shape)
+
+    def read_stream_array(self, signal_name, dtype='float32', shape=None):
+        """
+        Read what was written to a string stream (simxWriteStringStream / simAppendStringSignal
+        on the server) since the previous read, as a NumPy array. The first call starts
+        streaming the signal and returns an empty array, later ones read what the last
+        reply brought without a round trip. The server sends a reply after every step
+        (it is in once e.g. simxGetPingTime returns): read each one, a reply replaces
+        the previous one.
+
+        :param dtype: type of the values, little-endian
+        :param tuple shape: shape of one item, the array is then (n,) + shape
+        :returns: array, a view of the received bytes
+        """
+        streaming = ('simxReadStringStream', (signal_name,)) in self.streams
+        opmode = vrep.simx_opmode_buffer if streaming else vrep.simx_opmode_streaming
+        data, = check_ret(self.simxReadStringStream(signal_name, opmode), ignore_one=True)
+        return _as_array(data, dtype, shape)
+
+    def channel(self, name):
+        """
+        Open a channel of framed messages to and from the scripts of the simulation,
+        on string streams (see channel; the scripts use vrepper_rpc.lua).
+
+        :param str name: name of the channel, the same in the script
+        :returns: channel
+        """
+        return channel(self, name)
+
+
+def _as_array(data, dtype, shape):
+    # packed little-endian values -> array of (n,) + shape, trailing partial items ignored
+    dtype = np.dtype(dtype).newbyteorder('<')
+    shape = tuple(shape) if shape is not None else ()
+    size = dtype.itemsize * int(np.prod(shape))
+    n = len(data) // size if size else 0
+    return np.frombuffer(data, dtype, n * size // dtype.itemsize).reshape((n,) + shape)
+
+
+# position of operationMode in the arguments of each bound function (without clientID)
+_opmode_indices = {}
+
+# return codes that the watchdog looks into, and the functions that don't return one
+_FAULT_FLAGS = vrep.simx_return_timeout_flag | vrep.simx_return_local_error_flag | vrep.simx_return_initialize_error_flag
+_NO_RETURN_CODE = ('simxGetConnectionId', 'simxGetLastCmdTime', 'simxGetInMessageInfo', 'simxGetOutMessageInfo',
+                   'simxFinish')
+
+
+def _track_stream(env, name, opmode_index, args, kwargs):
+    # remember streaming commands so that stop_streams() can discontinue them
+    opmode = args[opmode_index] if len(args) > opmode_index else kwargs.get('operationMode')
+    if opmode is None:
+        return
+    mode = opmode & simxproto.OPMODE_MASK
+    if mode != vrep.simx_opmode_streaming and mode != vrep.simx_opmode_discontinue:
+        return
+    # the command is identified by its leading arguments (a handle, a signal name...)
+    n = len(simxproto.cmd_fields[name][0]) if name in simxproto.cmd_fields else opmode_index
+    key = (name, args[:min(n, opmode_index)])
+    if mode == vrep.simx_opmode_streaming:
+        env.streams[key] = (args, kwargs)
+    else:
+        env.streams.pop(key, None)
+
+
+# assign every API function call from vrep to the vrepper class, with the clientID filled in.
+# (methods of the class rather than closures stored on each instance, which would make
+# every vrepper part of a reference cycle and delay its collection)
+def _bind_vrep_function(name):
+    wrapee = getattr(vrep, name)
+    argnames = getargspec(wrapee)[0]
+    takes_cid = argnames[0] == 'clientID'
+    if takes_cid:
+        argnames = argnames[1:]
+    opmode_index = argnames.index('operationMode') if 'operationMode' in argnames else None
+    _opmode_indices[name] = opmode_index
+
+    watched = name not in _NO_RETURN_CODE
+
+    if takes_cid:
+        def method(self, *args, **kwargs):
+            if opmode_index is not None:
+                _track_stream(self, name, opmode_index, args, kwargs)
+            if self.tracer is not None:
+                result = self.tracer.call(name, wrapee, args, kwargs, opmode_index, self.cid)
+            else:
+                result = wrapee(self.cid, *args, **kwargs)
+            if self.watchdog is not None and watched:
+                self._watch(name, result)
+            return result
+    else:
+        def method(self, *args, **kwargs):
+            if self.tracer is not None:
+                return self.tracer.call(name, wrapee, args, kwargs, opmode_index)
+            return wrapee(*args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = wrapee.__doc__
+    return method
+
+
+for _name in [a for a in dir(vrep) if not a.startswith('_') and isinstance(getattr(vrep, a), types.FunctionType)]:
+    setattr(vrepper, _name, _bind_vrep_function(_name))
+# simxGetVisionSensorImage with the image in a bytearray rather than a list, for camerarig
+vrepper._vision_sensor_image = _bind_vrep_function('_vision_sensor_image')
+
 
 # check return tuple, raise error if retcode is not OK,
 # return remaining data otherwise
@@ -352,46 +1138,115 @@ def check_ret(ret_tuple, ignore_one=False):
     return ret_tuple[1:] if istuple else None
 
 
-class vrepobject():
+def _copied(value):
+    # the read cache hands out copies, so that changing a result doesn't change the cache
+    if isinstance(value, tuple):
+        return tuple(_copied(v) for v in value)
+    if isinstance(value, (list, bytearray)):
+        return type(value)(value)
+    return value
+
+
+class _envbound(object):
+    # objects working on a vrepper (vrepobject, objectgroup, channel...) only keep a weak
+    # reference to it, so that objects kept around don't keep a dead vrepper alive
+    __slots__ = ('_env',)
+
+    def __init__(self, env):
+        self._env = weakref.ref(env)
+
+    @property
+    def env(self):
+        env = self._env()
+        if env is None:
+            raise RuntimeError('(vrepper) the vrepper of this object no longer exists')
+        return env
+
+
+class vrepobject(_envbound):
+    # many of these exist in big scenes: no __dict__
+    __slots__ = ('handle', 'is_joint', '__weakref__')
+
     def __init__(self, env, handle, is_joint=True):
-        self.env = env
+        _envbound.__init__(self, env)
         self.handle = handle
         self.is_joint = is_joint
 
+    def _cached(self, quantity, relative_to, read):
+        # read() once per simulation step when the read cache of env is on
+        env = self.env
+        cache = env.read_cache
+        if cache is None or (env.sim_running and not env.sim_sync):
+            return read()  # free running simulation, every read is different
+        key = (self.handle, quantity, relative_to)
+        if key in cache:
+            env.counters['read_cache_hits'] += 1
+            return _copied(cache[key])
+        env.counters['read_cache_misses'] += 1
+        value = read()
+        cache[key] = _copied(value)
+        return value
+
     def get_orientation(self, relative_to=None):
-        eulerAngles, = check_ret(self.env.simxGetObjectOrientation(
-            self.handle,
-            -1 if relative_to is None else relative_to.handle,
-            blocking))
-        return eulerAngles
+        relative_to = -1 if relative_to is None else relative_to.handle
+
+        def read():
+            eulerAngles, = check_ret(self.env.simxGetObjectOrientation(
+                self.handle,
+                relative_to,
+                blocking))
+            return eulerAngles
+
+        return self._cached('orientation', relative_to, read)
 
     def get_position(self, relative_to=None):
-        position, = check_ret(self.env.simxGetObjectPosition(
-            self.handle,
-            -1 if relative_to is None else relative_to.handle,
-            blocking))
-        return position
+        relative_to = -1 if relative_to is None else relative_to.handle
+
+        def read():
+            position, = check_ret(self.env.simxGetObjectPosition(
+                self.handle,
+                relative_to,
+                blocking))
+            return position
+
+        return self._cached('position', relative_to, read)
 
     def get_velocity(self):
-        return check_ret(self.env.simxGetObjectVelocity(
+        return self._cached('velocity', -1, lambda: check_ret(self.env.simxGetObjectVelocity(
             self.handle,
             # -1 if relative_to is None else relative_to.handle,
-            blocking))
+            blocking)))
         # linearVel, angularVel
 
+    def _write(self, quantity, value, write):
+        # write(), unless value is what we last sent (within env.write_tolerance)
+        env = self.env
+        key = (self.handle, quantity)
+        if env.write_tolerance is not None:
+            last = env.last_writes.get(key)
+            if last is not None and abs(value - last) <= env.write_tolerance:
+                env.counters['writes_suppressed'] += 1
+                return None
+        env.invalidate_read_cache(self.handle)
+        result = write()
+        env.counters['writes_sent'] += 1
+        if env.write_tolerance is not None:
+            env.last_writes[key] = value
+        return result
+
     def set_velocity(self, v):
         self._check_joint()
-        return check_ret(self.env.simxSetJointTargetVelocity(
+        return self._write('target_velocity', v, lambda: check_ret(self.env.simxSetJointTargetVelocity(
             self.handle,
             v,
-            blocking))
+            blocking)))
 
     def set_force(self, f):
         self._check_joint()
-        return check_ret(self.env.simxSetJointForce(
+        return self._write('force', f, lambda: check_ret(self.env.simxSetJointForce(
             self.handle,
             f,
-            blocking))
+            blocking)))
 
     def set_position_target(self, angle):
         """
@@ -401,35 +1256,36 @@ class vrepobject():
         :return: None if successful, otherwise raises exception
         """
         self._check_joint()
-        return check_ret(self.env.simxSetJointTargetPosition(
+        return self._write('target_position', angle, lambda: check_ret(self.env.simxSetJointTargetPosition(
             self.handle,
             -deg2rad(angle),
-            blocking))
+            blocking)))
 
     def get_joint_angle(self):
         self._check_joint()
-        angle = check_ret(
+        angle = self._cached('joint_position', -1, lambda: check_ret(
             self.env.simxGetJointPosition(
                 self.handle,
                 blocking
             )
-        )
+        ))
         return -rad2deg(angle[0])
 
     def get_joint_force(self):
         self._check_joint()
-        force = check_ret(
+        force = self._cached('joint_force', -1, lambda: check_ret(
             self.env.simxGetJointForce(
                 self.handle,
                 blocking
             )
-        )
+        ))
         return force
 
     def read_force_sensor(self):
-        state, forceVector, torqueVector = check_ret(self.env.simxReadForceSensor(
-            self.handle,
-            blocking))
+        state, forceVector, torqueVector = self._cached('force_sensor', -1, lambda: check_ret(
+            self.env.simxReadForceSensor(
+                self.handle,
+                blocking)))
 
         if state & 1 == 1:
             return None  # sensor data not ready
@@ -437,18 +1293,459 @@ class vrepobject():
             return forceVector, torqueVector
 
     def get_vision_image(self):
-        resolution, image = check_ret(self.env.simxGetVisionSensorImage(
+        resolution, image = self._cached('vision_image', -1, lambda: check_ret(self.env.simxGetVisionSensorImage(
             self.handle,
             0,  # options=0 -> RGB
             blocking,
-        ))
+        )))
         dim, im = resolution, image
-        nim = np.array(im, dtype='uint8')
+        nim = np.array(im, dtype='int8').view('uint8')  # image comes as signed bytes
         nim = np.reshape(nim, (dim[1], dim[0], 3))
         nim = np.flip(nim, 0)  # LR flip
         nim = np.flip(nim, 2)  # RGB -> BGR
         return nim
 
+    def set_vision_image(self, image):
+        """
+        Set the image of a vision sensor (the inverse of get_vision_image)
+
+        :param image: uint8 array of shape (height, width, 3) in BGR, or (height, width)
+            for a grayscale image, oriented like get_vision_image returns them
+        """
+        image = np.asarray(image)
+        if image.dtype != np.uint8:
+            raise ValueError('(vrepper) images are arrays of uint8, not ' + str(image.dtype))
+        if image.ndim == 3 and image.shape[2] == 3:
+            image, options = image[::-1, :, ::-1], 0  # flip, BGR -> RGB
+        elif image.ndim == 2:
+            image, options = image[::-1], 1  # flip, grayscale
+        else:
+            raise ValueError('(vrepper) images are (height, width, 3) or (height, width), not ' + str(image.shape))
+        env = self.env
+        env.invalidate_read_cache(self.handle)
+        check_ret(env.simxSetVisionSensorImage(
+            self.handle,
+            np.ascontiguousarray(image),
+            options,
+            blocking))
+        env.counters['writes_sent'] += 1
+
     def _check_joint(self):
         if not self.is_joint:
             raise Exception("Trying to call a joint function on a non-joint object.")
+
+
+# quantities an observation can read: code (shared with vrepper_rpc.lua and the stand-in),
+# number of values. joint_angle is in degrees with the sign of vrepobject.get_joint_angle,
+# velocity is linear then angular, force_sensor is force then torque, proximity is
+# (1 if something is detected else 0, distance).
+observation_quantities = {
+    'position': (0, 3),
+    'orientation': (1, 3),
+    'velocity': (2, 6),
+    'joint_angle': (3, 1),
+    'joint_force': (4, 1),
+    'force_sensor': (5, 6),
+    'proximity': (6, 2),
+}
+
+
+class observation(_envbound):
+    """
+    Quantities of many objects read with one script call: see vrepper.observation.
+    """
+    __slots__ = ('spec', 'script_name', 'request', 'scale', 'out', 'slices')
+
+    def __init__(self, env, spec, script_name="remoteApiCommandServer"):
+        _envbound.__init__(self, env)
+        self.spec = list(spec)
+        self.script_name = script_name
+        codes, scale, self.slices = [], [], []
+        for entry in self.spec:
+            o, quantity = entry[:2]
+            frame = entry[2] if len(entry) > 2 else None
+            if quantity not in observation_quantities:
+                raise ValueError('(vrepper) unknown observation quantity {}, use one of {}'.format(
+                    quantity, ', '.join(sorted(observation_quantities))))
+            code, size = observation_quantities[quantity]
+            codes.extend([env._handle(o), code, -1 if frame is None else env._handle(frame)])
+            self.slices.append(slice(len(scale), len(scale) + size))
+            scale.extend([-rad2deg(1.) if quantity == 'joint_angle' else 1.] * size)
+        # the request never changes, pack it once
+        self.request = ([], [], [], rpc.pack_arrays([np.array(codes, np.int32).reshape(-1, 3)]))
+        self.scale = np.array(scale, np.float32)
+        self.out = np.empty(len(scale), np.float32)
+
+    def __len__(self):
+        return len(self.out)
+
+    def read(self):
+        """
+        :returns: float32 array with the values of every entry of the spec, one after
+            the other (slices[i] is where entry i is). It is overwritten by the next read
+        """
+        _, _, _, out = self.env.call_script_function('vrepperObserve', self.request, self.script_name)
+        values, = rpc.unpack_arrays(out)
+        if values.size != len(self.out):
+            raise RuntimeError('(vrepper) observation: got {} values instead of {}'.format(values.size, len(self.out)))
+        np.multiply(values, self.scale, out=self.out)
+        return self.out
+
+
+class script_future(_envbound):
+    # reply of a call_script_function_async call
+    __slots__ = ('key', 'convert', 'ret')
+
+    def __init__(self, env, key, convert=None):
+        _envbound.__init__(self, env)
+        self.key = key
+        self.convert = convert
+        # the return tuple of simxCallScriptFunction, once the reply is in
+        self.ret = None
+
+    def _poll(self):
+        env = self.env
+        script_name, function_name = self.key
+        ret = env.simxCallScriptFunction(script_name, vrep.sim_scripttype_childscript, function_name,
+                                         [], [], [], bytearray(), vrep.simx_opmode_buffer)
+        if ret[0] == vrep.simx_return_novalue_flag:
+            return False
+        self.ret = ret
+        env.simxCallScriptFunction(script_name, vrep.sim_scripttype_childscript, function_name,
+                                   [], [], [], bytearray(), vrep.simx_opmode_remove)
+        if env.script_calls.get(self.key) is self:
+            del env.script_calls[self.key]
+        return True
+
+    def done(self):
+        return self.ret is not None or self._poll()
+
+    def wait(self, timeout=10.):
+        deadline = time.time() + timeout
+        while not self.done():
+            if time.time() > deadline:
+                raise RuntimeError('(vrepper) no reply from script function {1} of {0}'.format(*self.key))
+            # one round trip: the replies to everything sent before it are in afterwards
+            self.env.simxGetPingTime()
+
+    def result(self, timeout=10.):
+        """
+        Wait for the reply.
+
+        :returns: tuple (res_ints, res_floats, res_strs, res_bytes), see call_script_function,
+            or what convert made of it
+        """
+        self.wait(timeout)
+        result = check_ret(self.ret)
+        return self.convert(result) if self.convert is not None else result
+
+
+# header of the frames of a channel: sequence number, length of the data
+_frame_head = struct.Struct('<ii')
+
+
+class channel(_envbound):
+    """
+    Framed messages between the client and the scripts of the simulation, to move
+    large data (point clouds, batches of sensor readings) in one message per step.
+
+        ch = env.channel('cloud')
+        ch.send(targets)                  # any buffer: bytes, NumPy array...
+        env.step_blocking_simulation()
+        env.simxGetPingTime()             # the reply of the step is in
+        for frame in ch.receive():        # frames the scripts sent since the last call
+            cloud = np.frombuffer(frame, np.float32).reshape(-1, 3)
+
+    Frames go to the simulation on the string stream '<name>.to_sim' and come back on
+    '<name>.from_sim': int32 sequence number, int32 length and the data, little-endian.
+    The client streams '<name>.from_sim', so the server sends what was written to it
+    after every step. A reply replaces the previous one: frames of a reply that was
+    not received in time are lost, stats() counts them.
+    """
+
+    def __init__(self, env, name):
+        _envbound.__init__(self, env)
+        self.name = name
+        self.to_sim = name + '.to_sim'
+        self.from_sim = name + '.from_sim'
+        # sequence numbers of the last frame sent and received (None: not streaming yet)
+        self.sent = 0
+        self.received = None
+        self.counters = {'frames_sent': 0, 'bytes_sent': 0, 'frames_received': 0, 'bytes_received': 0,
+                         'frames_lost': 0, 'largest_reply': 0}
+
+    def send(self, *frames):
+        """
+        Send frames to the simulation, in one message.
+
+        :param frames: bytes-like objects (bytes, bytearray, NumPy arrays, memoryview)
+        """
+        # one write per message: a batch of writes with the same identification may keep only the last
+        parts = []
+        for data in frames:
+            data = memoryview(data)
+            if not data.c_contiguous:
+                data = memoryview(data.tobytes())
+            data = data.cast('B')
+            self.sent += 1
+            parts.append(_frame_head.pack(self.sent, data.nbytes))
+            parts.append(data)
+            self.counters['bytes_sent'] += data.nbytes
+        self.counters['frames_sent'] += len(frames)
+        check_ret(self.env.simxWriteStringStream(self.to_sim, b''.join(parts), oneshot), ignore_one=True)
+
+    def receive(self):
+        """
+        :returns: list of the frames sent by the simulation since the previous call,
+            as memoryviews of the received message
+        """
+        if ('simxReadStringStream', (self.from_sim,)) not in self.env.streams:
+            # (re)start streaming: the numbering may start again (a new simulation)
+            self.received = None
+            opmode = vrep.simx_opmode_streaming
+        else:
+            opmode = vrep.simx_opmode_buffer
+        data, = check_ret(self.env.simxReadStringStream(self.from_sim, opmode), ignore_one=True)
+        data = memoryview(data)
+        frames = []
+        offset = 0
+        while offset + _frame_head.size <= len(data):
+            sequence, n = _frame_head.unpack_from(data, offset)
+            offset += _frame_head.size
+            if self.received is None:
+                self.received = sequence - 1
+            # the buffer keeps the last reply: skip the frames already received
+            if sequence > self.received:
+                self.counters['frames_lost'] += sequence - self.received - 1
+                self.received = sequence
+                frames.append(data[offset:offset + n])
+                self.counters['bytes_received'] += n
+            offset += n
+        self.counters['frames_received'] += len(frames)
+        self.counters['largest_reply'] = max(self.counters['largest_reply'], len(data))
+        return frames
+
+    def stats(self):
+        """
+        :returns: dict of counters: frames and bytes sent and received, frames lost
+            (sent by the simulation but replaced by a later reply before receive()
+            got them), and the size in bytes of the largest reply
+        """
+        return dict(self.counters)
+
+    def __repr__(self):
+        return 'channel({!r})'.format(self.name)
+
+
+class objectgroup(_envbound):
+    """
+    Several objects read and written together. Reads fetch the data of every object
+    of the scene with one simxGetObjectGroupData call, writes are sent as a single
+    message (paused communication, oneshot commands, so their errors are not reported).
+    """
+    __slots__ = ('handles', 'is_joint')
+
+    def __init__(self, env, handles, is_joint=True):
+        _envbound.__init__(self, env)
+        self.handles = np.ascontiguousarray(handles, dtype=np.int32)
+        self.is_joint = is_joint
+
+    def __len__(self):
+        return len(self.handles)
+
+    def objects(self):
+        return [self.env.get_object_by_handle(int(h), self.is_joint) for h in self.handles]
+
+    def _group_data(self, object_type, data_type, width):
+        # rows of group data for our handles, an array of shape (len(self), width)
+        handles, ints, floats, strings = check_ret(self.env.simxGetObjectGroupData(
+            object_type, data_type, blocking))
+        handles = np.asarray(handles, dtype=np.int32)
+        values = np.asarray(floats, dtype=np.float64).reshape(len(handles), width)
+        order = np.argsort(handles)
+        found = np.searchsorted(handles, self.handles, sorter=order)
+        found = order[np.minimum(found, len(handles) - 1)]
+        if len(handles) == 0 or np.any(handles[found] != self.handles):
+            missing = self.handles[handles[found] != self.handles] if len(handles) else self.handles
+            raise RuntimeError('(vrepper) objects not found in group data: ' + str(missing.tolist()))
+        return values[found]
+
+    def _write(self, quantity, values, func):
+        # one paused batch of oneshot commands, skipping unchanged values like vrepobject setters
+        env = self.env
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), self.handles.shape)
+        check_ret(env.simxPauseCommunication(True))
+        try:
+            for h, v in zip(self.handles.tolist(), values.tolist()):
+                key = (h, quantity)
+                if env.write_tolerance is not None:
+                    last = env.last_writes.get(key)
+                    if last is not None and abs(v - last) <= env.write_tolerance:
+                        env.counters['writes_suppressed'] += 1
+                        continue
+                    env.last_writes[key] = v
+                env.invalidate_read_cache(h)
+                func(h, v)
+                env.counters['writes_sent'] += 1
+        finally:
+            check_ret(env.simxPauseCommunication(False))
+
+    def _check_joint(self):
+        if not self.is_joint:
+            raise Exception("Trying to call a joint function on a non-joint group.")
+
+    def get_positions(self):
+        """
+        :returns: array of shape (N, 3), absolute positions
+        """
+        return self._group_data(vrep.sim_handle_all, 3, 3)
+
+    def get_orientations(self):
+        """
+        :returns: array of shape (N, 3), absolute euler angles
+        """
+        return self._group_data(vrep.sim_handle_all, 5, 3)
+
+    def get_velocities(self):
+        """
+        :returns: tuple of arrays of shape (N, 3), (linear velocities, angular velocities)
+        """
+        v = self._group_data(vrep.sim_handle_all, 19, 6)
+        return v[:, :3], v[:, 3:]
+
+    def get_joint_angles(self):
+        """
+        :returns: array of shape (N,), in degrees, same sign as vrepobject.get_joint_angle
+        """
+        self._check_joint()
+        return -rad2deg(self._group_data(vrep.sim_object_joint_type, 15, 2)[:, 0])
+
+    def get_joint_forces(self):
+        """
+        :returns: array of shape (N,)
+        """
+        self._check_joint()
+        return self._group_data(vrep.sim_object_joint_type, 15, 2)[:, 1]
+
+    def set_velocities(self, v):
+        """
+        :param v: array of shape (N,) (or a scalar), target velocities
+        """
+        self._check_joint()
+        self._write('target_velocity', v, lambda h, x: self.env.simxSetJointTargetVelocity(h, x, oneshot))
+
+    def set_forces(self, f):
+        self._check_joint()
+        self._write('force', f, lambda h, x: self.env.simxSetJointForce(h, x, oneshot))
+
+    def set_position_targets(self, angles):
+        """
+        :param angles: array of shape (N,) (or a scalar), target servo angles in degrees
+        """
+        self._check_joint()
+        self._write('target_position', angles,
+                    lambda h, x: self.env.simxSetJointTargetPosition(h, -deg2rad(x), oneshot))
+
+
+class camerarig(_envbound):
+    """
+    Several vision sensors read together: their images are streamed, so that after a
+    step capture() has all of them with a single round trip, into an array of shape
+    (cameras, height, width, channels), oriented like get_vision_image returns them.
+
+    Captures alternate between two arrays: the one capture() returns stays untouched
+    until the capture after the next one, so it can be used while the next is taken.
+    """
+
+    def __init__(self, env, handles, grayscale=False, resolution=None):
+        _envbound.__init__(self, env)
+        self.handles = list(handles)
+        self.options = 1 if grayscale else 0
+        # resolutions to restore on close(), if changed
+        self.original_resolutions = None
+        if resolution is not None:
+            self.original_resolutions = [self._resolution(h) for h in self.handles]
+            for h in self.handles:
+                self._set_resolution(h, resolution)
+        resolutions = set(tuple(self._resolution(h)) for h in self.handles)
+        if len(resolutions) != 1:
+            raise ValueError('(vrepper) the cameras of a rig must have the same resolution, not ' +
+                             ', '.join('{}x{}'.format(*r) for r in sorted(resolutions)))
+        w, h = resolutions.pop()
+        self.buffers = np.zeros((2, len(self.handles), h, w, 1 if grayscale else 3), np.uint8)
+        self.next = 0
+        self._subscribe()
+
+    def __len__(self):
+        return len(self.handles)
+
+    def _resolution(self, handle):
+        return [check_ret(self.env.simxGetObjectIntParameter(handle, param, blocking))[0]
+                for param in (vrep.sim_visionintparam_resolution_x, vrep.sim_visionintparam_resolution_y)]
+
+    def _set_resolution(self, handle, resolution):
+        for param, value in zip((vrep.sim_visionintparam_resolution_x, vrep.sim_visionintparam_resolution_y),
+                                resolution):
+            check_ret(self.env.simxSetObjectIntParameter(handle, param, int(value), blocking))
+
+    def _subscribe(self):
+        # (re)start the streams, stop_streams() ends them with every simulation
+        for h in self.handles:
+            if ('simxGetVisionSensorImage', (h, self.options)) not in self.env.streams:
+                self.env.simxGetVisionSensorImage(h, self.options, vrep.simx_opmode_streaming)
+
+    def capture(self):
+        """
+        :returns: uint8 array of shape (cameras, height, width, 3), BGR, or (cameras,
+            height, width, 1) in grayscale, valid until the capture after the next one
+        """
+        env = self.env
+        self._subscribe()
+        out = self.buffers[self.next]
+        # one round trip: the images of the steps done before it are in afterwards
+        env.simxGetPingTime()
+        missing = [k for k in range(len(self.handles)) if not self._read(k, out)]
+        if missing:
+            # no reply stored (a blocking read of the same camera took it): stream these
+            # cameras again, the server answers right away, one round trip for all of them
+            env.counters['camera_resubscribes'] += len(missing)
+            check_ret(env.simxPauseCommunication(True))
+            try:
+                for k in missing:
+                    for opmode in (vrep.simx_opmode_discontinue, vrep.simx_opmode_streaming):
+                        env.simxGetVisionSensorImage(self.handles[k], self.options, opmode)
+            finally:
+                check_ret(env.simxPauseCommunication(False))
+            env.simxGetPingTime()
+            for k in missing:
+                if not self._read(k, out):
+                    raise RuntimeError('(vrepper) no image from camera {}'.format(self.handles[k]))
+        self.next = 1 - self.next
+        return out
+
+    def _read(self, k, out):
+        # image of camera k from the last reply (no round trip) into out[k], False if there is none
+        _, h, w, c = out.shape
+        handle = self.handles[k]
+        ret, resolution, image = self.env._vision_sensor_image(handle, self.options, vrep.simx_opmode_buffer)
+        if ret == vrep.simx_return_novalue_flag:
+            return False
+        check_ret(ret)
+        if resolution != [w, h]:
+            raise RuntimeError('(vrepper) camera {} is {}x{}, the rig {}x{}'.format(
+                handle, resolution[0], resolution[1], w, h))
+        out[k] = np.frombuffer(image, np.uint8).reshape(h, w, c)[::-1, :, ::-1]  # flip, RGB -> BGR
+        return True
+
+    def close(self):
+        """
+        Stop streaming the images, and put back the resolutions the rig changed.
+        """
+        env = self.env
+        for h in self.handles:
+            for opmode in (vrep.simx_opmode_discontinue, vrep.simx_opmode_remove):
+                env.simxGetVisionSensorImage(h, self.options, opmode)
+        if self.original_resolutions is not None:
+            for h, resolution in zip(self.handles, self.original_resolutions):
+                self._set_resolution(h, resolution)
+            self.original_resolutions = None
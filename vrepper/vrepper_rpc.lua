@@ -0,0 +1,173 @@
+-- Counterpart of vrepper/rpc.py, for the script that receives the calls
+-- (V-REP 3.4, Lua 5.1).
+--
+-- In the child script (e.g. remoteApiCommandServer):
+--   dofile('/path/to/vrepper/vrepper_rpc.lua')     -- vrepper.rpc.LUA_HELPER
+--
+--   findPath = vrepper_rpc.wrap(function(goal, options)
+--       -- goal.data is a flat table of the values, goal.dims the shape
+--       local path = {}   -- 6 joint values per state
+--       ...
+--       return vrepper_rpc.array(vrepper_rpc.FLOAT32, path, {#path / 6, 6})
+--   end)
+--
+-- Python calls it with:
+--   env.remote_function('findPath', args=['float32', 'int32'], returns=[('float32', (-1, 6))])
+--
+-- Buffer layout (little-endian): int32 number of arrays, then for each array
+-- int32 type, int32 ndim, ndim int32 dimensions, and the values. No padding.
+--
+-- Loading this file also defines vrepperObserve, which reads the observations
+-- compiled by vrepper.observation (see observation_quantities in vrepper.py),
+-- and the script side of vrepper.channel:
+--   for _, data in ipairs(vrepper_rpc.channel_receive('cloud')) do ... end
+--   vrepper_rpc.channel_send('cloud', simPackFloatTable(points))
+
+vrepper_rpc = {}
+
+vrepper_rpc.UINT8 = 0
+vrepper_rpc.INT32 = 1
+vrepper_rpc.FLOAT32 = 2
+vrepper_rpc.FLOAT64 = 3
+
+local item_size = {[0] = 1, 4, 4, 8}
+local unpackers = {[0] = simUnpackUInt8Table, simUnpackInt32Table, simUnpackFloatTable, simUnpackDoubleTable}
+local packers = {[0] = simPackUInt8Table, simPackInt32Table, simPackFloatTable, simPackDoubleTable}
+
+function vrepper_rpc.array(type, data, dims)
+    return {type = type, data = data, dims = dims or {#data}}
+end
+
+-- buffer -> list of arrays {type =, dims = {...}, data = {flat values}}
+function vrepper_rpc.unpack(buffer)
+    local count = simUnpackInt32Table(buffer, 0, 1, 0)[1]
+    local offset = 4
+    local arrays = {}
+    for i = 1, count do
+        local head = simUnpackInt32Table(buffer, 0, 2, offset)
+        local type, ndim = head[1], head[2]
+        offset = offset + 8
+        local dims = {}
+        local n = 1
+        if ndim > 0 then
+            dims = simUnpackInt32Table(buffer, 0, ndim, offset)
+            offset = offset + 4 * ndim
+            for k = 1, ndim do
+                n = n * dims[k]
+            end
+        end
+        local data = {}
+        -- a count of 0 would unpack everything up to the end of the buffer
+        if n > 0 then
+            data = unpackers[type](buffer, 0, n, offset)
+        end
+        offset = offset + n * item_size[type]
+        arrays[i] = {type = type, dims = dims, data = data}
+    end
+    return arrays
+end
+
+-- list of arrays (see vrepper_rpc.array) -> buffer
+function vrepper_rpc.pack(arrays)
+    local parts = {simPackInt32Table({#arrays})}
+    for i = 1, #arrays do
+        local a = arrays[i]
+        local dims = a.dims or {#a.data}
+        local head = {a.type, #dims}
+        for k = 1, #dims do
+            head[#head + 1] = dims[k]
+        end
+        parts[#parts + 1] = simPackInt32Table(head)
+        if #a.data > 0 then
+            parts[#parts + 1] = packers[a.type](a.data)
+        end
+    end
+    return table.concat(parts)
+end
+
+-- answer calls to the global function name under n names: name, name#1 ... name#(n-1),
+-- so that vrepper can have n calls of it in flight (call_script_function_async(..., lanes=n))
+function vrepper_rpc.lanes(name, n)
+    for k = 1, n - 1 do
+        _G[name .. '#' .. k] = _G[name]
+    end
+end
+
+-- f(arrays...) -> arrays... as a function callable by simxCallScriptFunction
+function vrepper_rpc.wrap(f)
+    return function(inInts, inFloats, inStrings, inBuffer)
+        local results = {f(unpack(vrepper_rpc.unpack(inBuffer)))}
+        return {}, {}, {}, vrepper_rpc.pack(results)
+    end
+end
+
+-- readers of vrepper.observation_quantities, by code: (handle, frame) -> values
+local observation_readers = {
+    [0] = function(h, frame) return simGetObjectPosition(h, frame) end,
+    [1] = function(h, frame) return simGetObjectOrientation(h, frame) end,
+    [2] = function(h, frame)
+        local l, a = simGetObjectVelocity(h)
+        return {l[1], l[2], l[3], a[1], a[2], a[3]}
+    end,
+    [3] = function(h, frame) return {simGetJointPosition(h)} end,
+    [4] = function(h, frame) return {simGetJointForce(h) or 0} end,
+    [5] = function(h, frame)
+        local state, force, torque = simReadForceSensor(h)
+        if not force then
+            return {0, 0, 0, 0, 0, 0}
+        end
+        return {force[1], force[2], force[3], torque[1], torque[2], torque[3]}
+    end,
+    [6] = function(h, frame)
+        local detected, distance = simReadProximitySensor(h)
+        if detected == 1 then
+            return {1, distance}
+        end
+        return {0, 0}
+    end,
+}
+
+-- spec: int32 array of (handle, quantity code, frame) rows -> float32 array of the values
+function vrepper_rpc.observe(spec)
+    local s = spec.data
+    local out = {}
+    for i = 1, #s, 3 do
+        local values = observation_readers[s[i + 1]](s[i], s[i + 2])
+        for k = 1, #values do
+            out[#out + 1] = values[k]
+        end
+    end
+    return vrepper_rpc.array(vrepper_rpc.FLOAT32, out)
+end
+
+vrepperObserve = vrepper_rpc.wrap(vrepper_rpc.observe)
+
+-- channels of vrepper.channel: frames of int32 sequence number, int32 length and the
+-- data, on the string signals '<name>.to_sim' (from the client) and '<name>.from_sim'
+local channel_sequence = {}
+
+-- name -> list of the frames sent by the client since the previous call, as strings
+function vrepper_rpc.channel_receive(name)
+    local signal = name .. '.to_sim'
+    local buffer = simGetStringSignal(signal)
+    local frames = {}
+    if not buffer then
+        return frames
+    end
+    simClearStringSignal(signal)
+    local offset = 0
+    while offset + 8 <= #buffer do
+        local n = simUnpackInt32Table(buffer, 1, 1, offset)[1]
+        frames[#frames + 1] = string.sub(buffer, offset + 9, offset + 8 + n)
+        offset = offset + 8 + n
+    end
+    return frames
+end
+
+-- queue a frame for the client, which gets it after the current simulation step
+function vrepper_rpc.channel_send(name, data)
+    local signal = name .. '.from_sim'
+    local sequence = (channel_sequence[name] or 0) + 1
+    channel_sequence[name] = sequence
+    simSetStringSignal(signal, (simGetStringSignal(signal) or '') .. simPackInt32Table({sequence, #data}) .. data)
+end